@@ -4,7 +4,6 @@ import hmac
 import json
 import os
 import time
-import secrets
 from typing import Dict, Optional, Tuple
 
 from ._kv import kv_get_json, kv_set_json, kv_del, USERS_KEY, INVITE_PREFIX, KvError
@@ -61,6 +60,7 @@ def verify_jwt(token: str) -> dict:
 # Password hashing (PBKDF2-HMAC-SHA256)
 def hash_password(password: str, salt: Optional[str] = None, rounds: int = 200_000) -> Tuple[str, str]:
     if salt is None:
+        import secrets
         salt = _b64url_encode(secrets.token_bytes(16))
     dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _b64url_decode(salt), rounds)
     return _b64url_encode(dk), salt
@@ -104,6 +104,7 @@ def get_role(username: str) -> Optional[str]:
 
 # Invitations
 def create_invite(role: str = "user") -> str:
+    import secrets
     token = secrets.token_urlsafe(24)
     kv_set_json(f"{INVITE_PREFIX}{token}", {
         "role": role,
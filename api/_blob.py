@@ -1,10 +1,12 @@
 import json
 import os
-import urllib.request
-import urllib.error
 import urllib.parse
 from typing import Any, Optional, Tuple
 
+from . import _http
+from ._metrics import blob_put_attempt, observe_payload
+from ._timing import phase
+
 # Configuration for Vercel Blob (simple REST usage)
 # Provide the public/read URL base for your blob store and a read/write token.
 # Examples:
@@ -15,6 +17,9 @@ BLOB_BASE_URL = (os.getenv("BLOB_BASE_URL") or "").rstrip("/")
 BLOB_READ_WRITE_TOKEN = os.getenv("BLOB_READ_WRITE_TOKEN") or ""
 BLOB_JSON_KEY = os.getenv("BLOB_JSON_KEY") or "birthdays.json"
 
+# PUT strategy that last succeeded in this process ("auth", "query" or "upload").
+# set_json() tries it first and falls back to the others only when it stops working.
+_PUT_STRATEGY: Optional[str] = None
 
 
 class BlobError(RuntimeError):
@@ -37,6 +42,9 @@ def _headers_json(write: bool = False) -> dict:
 
 
 def _request(method: str, url: str, body: Optional[bytes] = None, write: bool = False) -> Tuple[int, bytes]:
+    # Imported lazily: urllib.request (and ssl) is only needed once a request is actually made
+    import urllib.error
+    import urllib.request
     req = urllib.request.Request(url, data=body, method=method)
     for k, v in _headers_json(write=write).items():
         req.add_header(k, v)
@@ -57,11 +65,16 @@ def get_json(key: Optional[str] = None, default: Any = None) -> Any:
         return default
     k = key or BLOB_JSON_KEY
     url = f"{BLOB_BASE_URL}/{urllib.parse.quote(k, safe='')}"
-    status, data = _request("GET", url)
+    try:
+        status, data, _ = _http.get(url, headers=_headers_json(), backend="blob", op="blob-get")
+    except Exception as e:
+        raise BlobError(f"Blob request error: {e}")
     if status == 200:
+        observe_payload("blob-get", len(data))
         try:
-            text = data.decode("utf-8")
-            return json.loads(text)
+            with phase("blob-parse"):
+                text = data.decode("utf-8")
+                return json.loads(text)
         except Exception:
             return default
     if status in (404, 403):
@@ -70,44 +83,57 @@ def get_json(key: Optional[str] = None, default: Any = None) -> Any:
     raise BlobError(f"Blob GET failed: {status} {data.decode('utf-8', 'ignore')}")
 
 
+def _put_strategies(path: str) -> list:
+    """
+    [(name, url, send_auth_header)] in default order.
+    """
+    url = f"{BLOB_BASE_URL}/{path}"
+    token = urllib.parse.quote(BLOB_READ_WRITE_TOKEN, safe="")
+    return [
+        # PUT with Authorization header to the public bucket URL
+        ("auth", url, True),
+        # PUT with token as query parameter (some setups accept ?token=)
+        ("query", f"{url}?token={token}", False),
+        # PUT to generic upload host (compat fallback)
+        ("upload", f"https://blob.vercel-storage.com/{path}?token={token}", False),
+    ]
+
+
 def set_json(value: Any, key: Optional[str] = None) -> None:
     """
     Write JSON document to Blob.
-    Tries multiple strategies for compatibility with different Blob configurations.
+    Tries multiple strategies for compatibility with different Blob configurations,
+    starting with the one that last succeeded in this process.
     """
+    global _PUT_STRATEGY
     if not is_blob_configured():
         raise BlobError("Blob is not configured (BLOB_BASE_URL, BLOB_READ_WRITE_TOKEN, BLOB_JSON_KEY)")
     k = key or BLOB_JSON_KEY
-    base = BLOB_BASE_URL.rstrip("/")
     path = urllib.parse.quote(k, safe="")
-    payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    with phase("blob-serialize"):
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    observe_payload("blob-put", len(payload))
 
-    attempts = []
+    strategies = _put_strategies(path)
+    preferred = _PUT_STRATEGY
+    strategies.sort(key=lambda s: s[0] != preferred)  # stable: remembered strategy first
 
-    # Attempt 1: PUT with Authorization header to the public bucket URL
-    url1 = f"{base}/{path}"
-    status1, data1 = _request("PUT", url1, body=payload, write=True)
-    if status1 in (200, 201):
-        return
-    attempts.append(f"{status1} @ {url1}: {data1.decode('utf-8', 'ignore')}")
-
-    # Attempt 2: PUT with token as query parameter (some setups accept ?token=)
-    if BLOB_READ_WRITE_TOKEN:
-        url2 = f"{url1}?token={urllib.parse.quote(BLOB_READ_WRITE_TOKEN, safe='')}"
-        status2, data2 = _request("PUT", url2, body=payload, write=False)  # no auth header
-        if status2 in (200, 201):
+    attempts = []
+    for name, url, write in strategies:
+        shown = url.split("?", 1)[0]  # never echo the token
+        try:
+            with phase(f"blob-put-{name}", backend="blob"):
+                status, data = _request("PUT", url, body=payload, write=write)
+        except Exception as e:
+            blob_put_attempt(name, "error")
+            attempts.append(f"{name} error @ {shown}: {e}")
+            continue
+        if status in (200, 201):
+            blob_put_attempt(name, "ok")
+            _PUT_STRATEGY = name
             return
-        attempts.append(f"{status2} @ {url2}: {data2.decode('utf-8', 'ignore')}")
-
-    # Attempt 3: PUT to generic upload host (compat fallback)
-    try:
-        if BLOB_READ_WRITE_TOKEN:
-            url3 = f"https://blob.vercel-storage.com/{path}?token={urllib.parse.quote(BLOB_READ_WRITE_TOKEN, safe='')}"
-            status3, data3 = _request("PUT", url3, body=payload, write=False)
-            if status3 in (200, 201):
-                return
-            attempts.append(f"{status3} @ https://blob.vercel-storage.com/{path}: {data3.decode('utf-8', 'ignore')}")
-    except Exception as e:
-        attempts.append(f"fallback error: {e}")
+        blob_put_attempt(name, "rejected")
+        attempts.append(f"{name} {status} @ {shown}: {data.decode('utf-8', 'ignore')}")
 
+    _PUT_STRATEGY = None
     raise BlobError("Blob PUT failed; attempts: " + " | ".join(attempts))
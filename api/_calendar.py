@@ -0,0 +1,43 @@
+from datetime import date
+from typing import Optional, Tuple
+
+
+def _to_int(v) -> Optional[int]:
+    try:
+        return int(str(v).strip())
+    except Exception:
+        return None
+
+
+def birth_parts(row: dict) -> Optional[Tuple[Optional[int], int, int]]:
+    """
+    (year, month, day) of a row, or None when month/day are missing or invalid.
+    The year may be None (unknown).
+    """
+    if not isinstance(row, dict):
+        return None
+    month, day = _to_int(row.get("month")), _to_int(row.get("day"))
+    if month is None or day is None or not (1 <= month <= 12) or not (1 <= day <= 31):
+        return None
+    try:
+        date(2000, month, day)  # leap year: accepts Feb 29, rejects Apr 31
+    except ValueError:
+        return None
+    year = _to_int(row.get("year"))
+    return (year if year and year > 0 else None), month, day
+
+
+def occurrence(year: int, month: int, day: int) -> date:
+    """
+    The birthday in `year`; Feb 29 falls on Feb 28 in non-leap years.
+    """
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return date(year, month, day - 1)
+
+
+def next_occurrence(month: int, day: int, today: date) -> date:
+    d = occurrence(today.year, month, day)
+    return d if d >= today else occurrence(today.year + 1, month, day)
+
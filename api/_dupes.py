@@ -0,0 +1,154 @@
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+# Duplicate detection by a normalized key: accent/case-folded "first last" plus the birth date.
+# DuplicateIndex keeps key -> ids for the current dataset and follows the storage engine's
+# change notifications, so a single add is an O(1) lookup; bulk imports are checked in one
+# linear pass with find_duplicates()/merge_duplicates().
+
+
+def fold_name(first_name: str, last_name: str) -> str:
+    """
+    Case- and accent-insensitive "first last" key used for name lookups.
+    """
+    text = f"{first_name or ''} {last_name or ''}"
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().split())
+
+
+def _int_or_text(v) -> str:
+    text = str(v if v is not None else "").strip()
+    try:
+        return str(int(text))
+    except ValueError:
+        return text
+
+
+def dupe_key(row: dict) -> Optional[str]:
+    """
+    Normalized identity of a row, or None when it has no name.
+    "03" and "3" are the same day; a missing year only matches a missing year.
+    """
+    if not isinstance(row, dict):
+        return None
+    name = fold_name(row.get("first_name"), row.get("last_name"))
+    if not name:
+        return None
+    return "|".join((name, _int_or_text(row.get("day")), _int_or_text(row.get("month")), _int_or_text(row.get("year"))))
+
+
+def find_duplicates(rows: list) -> List[dict]:
+    """
+    Groups of rows sharing a key, in first-seen order: [{"key", "indexes", "ids"}].
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, r in enumerate(rows):
+        key = dupe_key(r)
+        if key is not None:
+            groups.setdefault(key, []).append(i)
+    return [
+        {"key": key, "indexes": idx, "ids": [(rows[i].get("id") or "") for i in idx]}
+        for key, idx in groups.items() if len(idx) > 1
+    ]
+
+
+def merge_duplicates(rows: list) -> Tuple[list, List[dict]]:
+    """
+    Collapse each duplicate group into its first row; empty fields of the kept row are
+    filled from the later ones. Returns (rows, groups).
+    """
+    groups = find_duplicates(rows)
+    if not groups:
+        return list(rows), groups
+    drop = set()
+    merged = {}
+    for g in groups:
+        first, *rest = g["indexes"]
+        keep = dict(rows[first])
+        for i in rest:
+            for k, v in rows[i].items():
+                if v not in (None, "") and keep.get(k) in (None, ""):
+                    keep[k] = v
+            drop.add(i)
+        merged[first] = keep
+    out = [merged.get(i, r) for i, r in enumerate(rows) if i not in drop]
+    return out, groups
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, Set[str]] = {}
+        self._by_id: Dict[str, str] = {}
+        self.version: Optional[int] = None
+
+    def _add(self, row: dict) -> None:
+        row_id = (row.get("id") or "").strip() if isinstance(row, dict) else ""
+        if not row_id:
+            return
+        self._remove(row_id)
+        key = dupe_key(row)
+        if key is None:
+            return
+        self._by_key.setdefault(key, set()).add(row_id)
+        self._by_id[row_id] = key
+
+    def _remove(self, row_id: str) -> None:
+        key = self._by_id.pop(row_id, None)
+        if key is not None:
+            ids = self._by_key.get(key)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del self._by_key[key]
+
+    def rebuild(self, rows: list, version: Optional[int] = None) -> None:
+        with self._lock:
+            self._by_key, self._by_id = {}, {}
+            for r in rows:
+                self._add(r)
+            self.version = version
+
+    def on_change(self, diff: dict, version: int) -> None:
+        """
+        store_subscribe() callback: O(k) for a diff of k rows.
+        """
+        with self._lock:
+            for r in diff["added"] + diff["changed"]:
+                self._add(r)
+            for row_id in diff["removed"]:
+                self._remove(row_id)
+            self.version = version
+
+    def lookup(self, row: dict) -> List[str]:
+        """
+        Ids of existing rows with the same key as `row` (excluding `row` itself).
+        """
+        key = dupe_key(row)
+        if key is None:
+            return []
+        own = (row.get("id") or "").strip()
+        with self._lock:
+            return sorted(i for i in self._by_key.get(key, ()) if i != own)
+
+
+_LOCK = threading.Lock()
+_INDEX: Optional[DuplicateIndex] = None
+
+
+def get_index() -> DuplicateIndex:
+    """
+    The process-wide index, built from the current dataset and kept current via store_subscribe.
+    """
+    global _INDEX
+    if _INDEX is None:
+        from ._store import store_get_rows, store_subscribe, store_version
+        with _LOCK:
+            if _INDEX is None:
+                index = DuplicateIndex()
+                store_subscribe(index.on_change)
+                index.rebuild(store_get_rows(), store_version())
+                _INDEX = index
+    return _INDEX
@@ -1,12 +1,12 @@
-import base64
 import json
 import os
 import time
-import urllib.request
-import urllib.error
 import urllib.parse
 from typing import Optional, Tuple
 
+from . import _http
+from ._timing import phase
+
 # Environment configuration with sensible defaults
 GITHUB_OWNER = os.getenv("GITHUB_REPO_OWNER", "grinwi")
 GITHUB_REPO = os.getenv("GITHUB_REPO", "birth-app")
@@ -31,6 +31,8 @@ def _headers_json() -> dict:
 
 
 def github_request(url: str, method: str = "GET", data: Optional[dict] = None, headers: Optional[dict] = None):
+    import urllib.error
+    import urllib.request
     body = None
     if data is not None:
         body = json.dumps(data).encode("utf-8")
@@ -90,6 +92,7 @@ def get_file_sha(owner: str, repo: str, path: str, ref: str) -> Optional[str]:
 
 
 def put_file(owner: str, repo: str, path: str, branch: str, content_utf8: str, message: str, sha: Optional[str]) -> None:
+    import base64
     url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents/{urllib.parse.quote(path)}"
     payload = {
         "message": message,
@@ -118,17 +121,30 @@ def open_pr(owner: str, repo: str, head: str, base: str, title: str, body: str)
 
 
 def fetch_raw_json(owner: str, repo: str, branch: str, path: str) -> str:
+    return fetch_raw_json_conditional(owner, repo, branch, path)[1]
+
+
+def fetch_raw_json_conditional(owner: str, repo: str, branch: str, path: str, etag: Optional[str] = None) -> Tuple[int, str, Optional[str]]:
+    """
+    GET the raw file, sending If-None-Match when `etag` is given.
+    Returns (status, text, etag): 200 with the content, 304 when unchanged (empty text),
+    or 404 when the file does not exist (empty text).
+    """
     url = f"{RAW_BASE}/{owner}/{repo}/{branch}/{path}"
-    req = urllib.request.Request(url, method="GET", headers={"User-Agent": "birthdays-app-python"})
+    headers = {"User-Agent": "birthdays-app-python"}
+    if etag:
+        headers["If-None-Match"] = etag
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            return resp.read().decode("utf-8")
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            return ""
-        raise
-    except urllib.error.URLError as e:
+        status, data, resp_headers = _http.get(url, headers=headers, backend="github", op="gh-raw")
+    except Exception as e:
         raise RuntimeError(f"Network error fetching raw JSON: {e}")
+    if status == 200:
+        return 200, data.decode("utf-8"), resp_headers.get("ETag")
+    if status == 304:
+        return 304, "", resp_headers.get("ETag") or etag
+    if status == 404:
+        return 404, "", None
+    raise RuntimeError(f"GitHub raw fetch failed: {status} {data.decode('utf-8', 'ignore')[:200]}")
 
 
 def create_pr_with_json(rows, title: str, body: str = "") -> Tuple[int, str]:
@@ -141,19 +157,33 @@ def create_pr_with_json(rows, title: str, body: str = "") -> Tuple[int, str]:
     base = GITHUB_BRANCH
     json_path = GITHUB_JSON_FILE_PATH
 
-    # Serialize JSON payload
-    json_text = json.dumps(rows, ensure_ascii=False, indent=2) + "\n"
+    # Independent steps run concurrently: resolving the base ref, looking up the file's sha on
+    # the base branch (the new branch starts from it, so the sha is the same) and serializing
+    # the payload here. The remaining chain is branch -> put -> PR.
+    with phase("gh-ref-sha", backend="github"):
+        json_text, base_sha, json_sha = _http.gather(
+            lambda: json.dumps(rows, ensure_ascii=False, indent=2) + "\n",
+            lambda: get_base_sha(owner, repo, base),
+            lambda: get_file_sha(owner, repo, json_path, base),
+        )
 
     # Prepare branch
-    base_sha = get_base_sha(owner, repo, base)
-    branch_name = create_branch(owner, repo, base_sha, preferred_name=f"update-birthdays-{time.strftime('%Y%m%d%H%M%S')}")
-
-    # Get current SHA (if existing)
-    json_sha = get_file_sha(owner, repo, json_path, branch_name)
+    with phase("gh-branch", backend="github"):
+        branch_name = create_branch(owner, repo, base_sha, preferred_name=f"update-birthdays-{time.strftime('%Y%m%d%H%M%S')}")
 
     # Update JSON file
-    put_file(owner, repo, json_path, branch_name, json_text, message=title, sha=json_sha)
+    with phase("gh-put", backend="github"):
+        try:
+            put_file(owner, repo, json_path, branch_name, json_text, message=title, sha=json_sha)
+        except RuntimeError:
+            # The base branch may have moved between the two lookups: retry once with the
+            # sha on the new branch itself
+            branch_sha = get_file_sha(owner, repo, json_path, branch_name)
+            if branch_sha == json_sha:
+                raise
+            put_file(owner, repo, json_path, branch_name, json_text, message=title, sha=branch_sha)
 
     # Open PR
-    pr_number, pr_url = open_pr(owner, repo, branch_name, base, title=title, body=body or "Automated update of birthdays JSON")
+    with phase("gh-pr", backend="github"):
+        pr_number, pr_url = open_pr(owner, repo, branch_name, base, title=title, body=body or "Automated update of birthdays JSON")
     return pr_number, pr_url
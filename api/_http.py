@@ -0,0 +1,168 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from ._metrics import inc
+from ._timing import phase
+
+# Resilient GETs for the Blob and GitHub raw reads.
+# Each attempt gets a short timeout; timeouts, connection errors, 429 and 5xx are retried
+# with jittered exponential backoff. Optionally a duplicate ("hedged") request is sent when
+# the first one is slower than HTTP_HEDGE_MS, and whichever answers first wins.
+# Only idempotent GETs go through here; writes keep their single attempt.
+#
+#   HTTP_TIMEOUT_SECONDS  per-attempt timeout (default 5)
+#   HTTP_RETRIES          extra attempts after the first (default 2)
+#   HTTP_BACKOFF_MS       base backoff, doubled per retry, full jitter (default 100)
+#   HTTP_HEDGE_MS         hedge delay in ms, or "auto" for the backend's observed p95 (default: off)
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS") or "5")
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES") or "2")
+HTTP_BACKOFF_MS = float(os.getenv("HTTP_BACKOFF_MS") or "100")
+HTTP_HEDGE_MS = (os.getenv("HTTP_HEDGE_MS") or "").strip().lower()
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# "auto" hedging needs this many samples before it trusts the p95
+_HEDGE_MIN_SAMPLES = 20
+
+_LOCK = threading.Lock()
+_LATENCIES: Dict[str, deque] = {}
+_EXECUTOR = None  # ThreadPoolExecutor shared by hedged requests and gather(), created on first use
+
+
+def _executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
+        with _LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="http")
+    return _EXECUTOR
+
+
+def gather(*calls) -> list:
+    """
+    Run independent blocking calls (zero-argument callables) concurrently and return their
+    results in order. The first call runs on the calling thread, the rest on the shared
+    outbound pool; once all have finished, the first exception (in call order) is re-raised.
+    Callers stay synchronous: this is the only concurrency they see.
+    """
+    if len(calls) <= 1:
+        return [c() for c in calls]
+    futures = [_executor().submit(c) for c in calls[1:]]
+    outcomes = []
+    try:
+        outcomes.append((True, calls[0]()))
+    except Exception as e:
+        outcomes.append((False, e))
+    for f in futures:
+        try:
+            outcomes.append((True, f.result()))
+        except Exception as e:
+            outcomes.append((False, e))
+    for ok, value in outcomes:
+        if not ok:
+            raise value
+    return [value for _, value in outcomes]
+
+
+def _record_latency(backend: str, seconds: float) -> None:
+    with _LOCK:
+        samples = _LATENCIES.get(backend)
+        if samples is None:
+            samples = _LATENCIES[backend] = deque(maxlen=200)
+        samples.append(seconds)
+
+
+def hedge_delay(backend: str) -> Optional[float]:
+    """
+    Seconds to wait before sending a hedged duplicate, or None when hedging is off.
+    """
+    if not HTTP_HEDGE_MS or HTTP_HEDGE_MS in ("0", "off"):
+        return None
+    if HTTP_HEDGE_MS != "auto":
+        try:
+            return float(HTTP_HEDGE_MS) / 1000.0
+        except ValueError:
+            return None
+    with _LOCK:
+        samples = sorted(_LATENCIES.get(backend) or ())
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        return None
+    return samples[int(len(samples) * 0.95) - 1]
+
+
+def _attempt(url: str, headers: dict, backend: str, timeout: float) -> Tuple[int, bytes, Any]:
+    import urllib.error
+    import urllib.request
+    req = urllib.request.Request(url, method="GET", headers=headers)
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            out = (resp.getcode(), resp.read(), resp.headers)
+    except urllib.error.HTTPError as e:
+        out = (e.code, e.read(), e.headers)
+    _record_latency(backend, time.perf_counter() - t0)
+    return out
+
+
+def _hedged(url: str, headers: dict, backend: str, timeout: float, delay: float) -> Tuple[int, bytes, Any]:
+    from concurrent.futures import FIRST_COMPLETED, wait
+    pool = _executor()
+    first = pool.submit(_attempt, url, headers, backend, timeout)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    inc("birthapp_http_hedges_total", {"backend": backend}, help="Hedged duplicate GETs sent, by backend.")
+    second = pool.submit(_attempt, url, headers, backend, timeout)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                # The slower request is left to finish in the background (urllib cannot cancel it)
+                return f.result()
+            error = f.exception()
+    raise error
+
+
+def get(url: str, headers: Optional[dict] = None, backend: str = "http", op: str = "http-get",
+        timeout: Optional[float] = None) -> Tuple[int, bytes, Any]:
+    """
+    GET `url` with retries (and hedging when enabled). Returns (status, body, headers), where
+    headers is the response's case-insensitive message object;
+    HTTP error statuses are returned, not raised. Network errors are raised after the last retry.
+    """
+    headers = dict(headers or {})
+    timeout = timeout or HTTP_TIMEOUT_SECONDS
+    retries = max(0, HTTP_RETRIES)
+    with phase(op, backend=backend):
+        for attempt in range(retries + 1):
+            if attempt:
+                # Full jitter: sleep uniformly in [0, base * 2^(attempt-1)]
+                time.sleep(random.uniform(0, HTTP_BACKOFF_MS * (2 ** (attempt - 1))) / 1000.0)
+            try:
+                delay = hedge_delay(backend)
+                if delay is None:
+                    status, body, resp_headers = _attempt(url, headers, backend, timeout)
+                else:
+                    status, body, resp_headers = _hedged(url, headers, backend, timeout, delay)
+            except Exception:
+                if attempt >= retries:
+                    _outcome(backend, "error")
+                    raise
+                _outcome(backend, "retry")
+                continue
+            if status in RETRY_STATUSES and attempt < retries:
+                _outcome(backend, "retry")
+                continue
+            _outcome(backend, "ok" if status < 500 else "error")
+            return status, body, resp_headers
+
+
+def _outcome(backend: str, outcome: str) -> None:
+    inc("birthapp_http_attempts_total", {"backend": backend, "outcome": outcome},
+        help="Resilient GET attempts by backend and outcome (ok/retry/error).")
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+from . import _timing
+
+# Idempotency keys for mutation routes.
+# A client that may retry (timeouts, flaky mobile networks) sends `Idempotency-Key: <uuid>`.
+# The first request claims the key in KV; a compact form of its response (status, row, id,
+# version, pr_url; never the dataset) is stored under the key with a TTL and every retry gets
+# it back without re-running the Blob write or the GitHub PR. A response that carried the whole
+# dataset under "data" is replayed with the current rows. Keys are scoped per route and user,
+# and bound to the request body: reusing a key for a different payload is rejected with 422.
+# Only 2xx responses are kept; after an error, or when the result cannot be saved, the key is
+# released and the retry runs normally.
+#
+#   IDEMPOTENCY_TTL_SECONDS   how long a completed response is kept for replay (default 86400)
+#   IDEMPOTENCY_LOCK_SECONDS  how long an in-flight claim blocks retries if the
+#                             instance dies before answering (default 60)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS") or "86400")
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS") or "60")
+
+KEY_PREFIX = "idem:"       # idem:<route>:<user>:<sha256(key)> -> {"state", "fp", "status", "payload", "rows"}
+MAX_KEY_LENGTH = 255
+MAX_STORED_BYTES = 8192    # larger results are cut down to SUMMARY_FIELDS
+
+SUMMARY_FIELDS = ("ok", "op", "id", "index", "version", "count", "touched", "pr_url", "warning")
+
+_local = threading.local()
+
+
+class _Claim:
+    __slots__ = ("kv_key", "fingerprint", "timer")
+
+    def __init__(self, kv_key: str, fingerprint: str):
+        self.kv_key = kv_key
+        self.fingerprint = fingerprint
+        self.timer = _timing.current()
+
+
+def _read_body(handler) -> bytes:
+    """
+    Read the request body once and put it back, so the handler can still read rfile.
+    """
+    import io
+    try:
+        length = int(handler.headers.get("Content-Length", "0"))
+    except Exception:
+        length = 0
+    body = handler.rfile.read(length) if length > 0 else b""
+    handler.rfile = io.BytesIO(body)
+    return body
+
+
+def _fingerprint(path: str, body: bytes) -> str:
+    """
+    Query parameters (minus method-override hints, which proxies add or drop) and body.
+    """
+    from urllib.parse import parse_qsl, urlencode, urlparse
+    params = sorted((k, v) for k, v in parse_qsl(urlparse(path).query) if k not in ("method", "_method"))
+    return hashlib.sha256(urlencode(params).encode("utf-8") + b"\n" + body).hexdigest()
+
+
+def begin(handler, route: str, user: Optional[dict]) -> Optional[Tuple[int, dict, dict]]:
+    """
+    Call after auth, before any work. Returns None to proceed (the response is recorded
+    by complete()), or (status, payload, headers) to send as-is: the stored response of an
+    earlier attempt, or an error for a key that is in flight or was used for another payload.
+    """
+    _local.claim = None
+    key = (handler.headers.get("Idempotency-Key") or "").strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        return 400, {"error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}, {}
+
+    from ._kv import kv_get_json, kv_set_json
+    body = _read_body(handler)
+    fingerprint = _fingerprint(handler.path, body)
+    subject = ((user or {}).get("sub") or "anonymous")
+    kv_key = f"{KEY_PREFIX}{route}:{subject}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    with _timing.phase("idempotency"):
+        pending = {"state": "pending", "fp": fingerprint, "at": time.time()}
+        if kv_set_json(kv_key, pending, nx=True, ex=IDEMPOTENCY_LOCK_SECONDS):
+            _local.claim = _Claim(kv_key, fingerprint)
+            return None
+        stored = kv_get_json(kv_key)
+
+    if not isinstance(stored, dict):
+        # Claim expired between SET NX and GET; let the client retry rather than guess
+        return 409, {"error": "Idempotency-Key is being processed; retry shortly"}, {"Retry-After": "1"}
+    if stored.get("fp") != fingerprint:
+        return 422, {"error": "Idempotency-Key was already used for a different request"}, {}
+    if stored.get("state") != "done":
+        return 409, {"error": "A request with this Idempotency-Key is still in progress"}, {"Retry-After": "1"}
+    payload = dict(stored.get("payload") or {})
+    if stored.get("rows"):
+        from ._store import store_get_rows
+        rows = store_get_rows()
+        payload["data"] = rows
+        payload["count"] = len(rows)
+    return int(stored.get("status") or 200), payload, {"Idempotent-Replayed": "true"}
+
+
+def _compact(payload: dict) -> dict:
+    """
+    The stored form of a response: everything but the dataset, or only SUMMARY_FIELDS when
+    that is still larger than MAX_STORED_BYTES.
+    """
+    import json
+    out = {k: v for k, v in (payload or {}).items() if k != "data"}
+    if len(json.dumps(out, separators=(",", ":"))) > MAX_STORED_BYTES:
+        out = {k: out[k] for k in SUMMARY_FIELDS if k in out}
+    return out
+
+
+def complete(status: int, payload: dict) -> None:
+    """
+    Record the response for the claimed key (called from the handlers' response helper).
+    Only successes are stored for replay; any other outcome had no side effects worth
+    protecting, so the claim is released and a retry runs again.
+    """
+    claim = getattr(_local, "claim", None)
+    if claim is None:
+        return
+    _local.claim = None
+    if claim.timer is not _timing.current():
+        return  # left over from an earlier request on this thread
+    from ._kv import kv_del, kv_set_json
+    with _timing.phase("idempotency"):
+        try:
+            if 200 <= status < 300:
+                kv_set_json(claim.kv_key, {
+                    "state": "done",
+                    "fp": claim.fingerprint,
+                    "status": status,
+                    "payload": _compact(payload),
+                    "rows": "data" in (payload or {}),
+                }, ex=IDEMPOTENCY_TTL_SECONDS)
+                return
+        except Exception:
+            pass  # not recorded: release the claim instead of blocking retries until it expires
+        try:
+            kv_del(claim.kv_key)
+        except Exception:
+            pass  # the claim still expires after IDEMPOTENCY_LOCK_SECONDS
+
@@ -0,0 +1,82 @@
+import json
+import time
+from typing import List, Optional, Tuple
+
+# Durable mutation journal for write-behind mode (STORE_WRITE_BEHIND=1, see _store.py).
+# Each entry is the keyed delta {"v", "seq", "at", "upserts": [rows], "removed": [ids]} that
+# takes the dataset from version v - 1 to v. Appending an entry is the acknowledgement of a
+# mutation; a flush writes the pending entries to the backend and drops them, keeping the
+# newest one so the journal always tells which version comes next.
+#
+# The journal is a KV list shared by every instance: a conditional RPUSH (only when the newest
+# entry is the version the mutation was based on) appends atomically, LRANGE reads the pending
+# entries in order and LTRIM drops the ones a flush has written, so no instance ever rewrites
+# entries appended by another, and two instances can never both publish the same version.
+# A local file is not an option: serverless instances have their own ephemeral /tmp, so an
+# acknowledged mutation would be lost (or never seen by the other instances) with the instance
+# that journaled it.
+
+JOURNAL_KV_KEY = "store:journal"
+
+# Entries are serialized with "v" first, so the script reads the newest version without
+# decoding the entry. Returns -1 when appended, else the newest version in the journal.
+_APPEND_SCRIPT = """
+local last = redis.call('LINDEX', KEYS[1], -1)
+if last then
+  local v = tonumber(string.match(last, '^{"v":(%d+)'))
+  if v ~= tonumber(ARGV[2]) then return v or 0 end
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+return -1
+"""
+
+
+def journal_available() -> bool:
+    """
+    True when a real (shared, durable) KV is configured; the in-memory development fallback
+    lives and dies with the process, so write-behind stays off without it.
+    """
+    from ._kv import USE_DEV_KV
+    return not USE_DEV_KV
+
+
+class KvJournal:
+    name = "kv"
+
+    def append(self, entry: dict, after: int) -> Tuple[bool, Optional[int]]:
+        """
+        Append `entry` only while the newest entry is version `after` (or the journal is empty).
+        Returns (appended, newest version in the journal when it was not).
+        """
+        from ._kv import kv_eval
+        raw = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        result = int(kv_eval(_APPEND_SCRIPT, [JOURNAL_KV_KEY], [raw, after]))
+        return (True, None) if result < 0 else (False, result)
+
+    def entries(self) -> List[dict]:
+        from ._kv import kv_lrange
+        out = []
+        for raw in kv_lrange(JOURNAL_KV_KEY, 0, -1):
+            try:
+                out.append(json.loads(raw))
+            except Exception:
+                out.append({})  # unreadable entry: keep the position so clear() counts it
+        return out
+
+    def clear(self, count: int) -> None:
+        """
+        Drop the first `count` entries (the ones a flush has just written); entries appended
+        after the flush read the journal stay in place.
+        """
+        from ._kv import kv_ltrim
+        if count > 0:
+            kv_ltrim(JOURNAL_KV_KEY, count, -1)
+
+
+def new_entry(version: int, upserts: list, removed: list) -> dict:
+    # "v" must stay the first key (see _APPEND_SCRIPT)
+    return {"v": version, "seq": time.time_ns(), "at": time.time(), "upserts": upserts, "removed": removed}
+
+
+def get_journal():
+    return KvJournal()
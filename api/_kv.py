@@ -1,15 +1,25 @@
 import json
 import os
-import urllib.request
-import urllib.error
+import time
 import urllib.parse
 from typing import Any, Optional, Tuple
 
+from ._timing import phase
+
 KV_URL = os.getenv("KV_REST_API_URL", "").rstrip("/")
 KV_TOKEN = os.getenv("KV_REST_API_TOKEN", "")
 # Development fallback: if KV is not configured, use an in-memory store to avoid hard failures.
 USE_DEV_KV = not (KV_URL and KV_TOKEN)
 _DEV_STORE: dict[str, str] = {}
+_DEV_EXPIRY: dict[str, float] = {}   # key -> monotonic deadline, for values set with ex=
+_DEV_LISTS: dict[str, list] = {}     # list keys (RPUSH/LRANGE/LTRIM)
+
+
+def _dev_expire(key: str) -> None:
+    deadline = _DEV_EXPIRY.get(key)
+    if deadline is not None and time.monotonic() >= deadline:
+        _DEV_STORE.pop(key, None)
+        _DEV_EXPIRY.pop(key, None)
 
 
 class KvError(RuntimeError):
@@ -34,11 +44,13 @@ def _headers_json():
 
 
 def _request(method: str, url: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+    import urllib.error
+    import urllib.request
     req = urllib.request.Request(url, data=body, method=method)
     for k, v in _headers_json().items():
         req.add_header(k, v)
     try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
+        with phase(f"kv-{method.lower()}", backend="kv"), urllib.request.urlopen(req, timeout=20) as resp:
             return resp.getcode(), resp.read()
     except urllib.error.HTTPError as e:
         return e.code, e.read()
@@ -53,6 +65,7 @@ def kv_get_raw(key: str) -> Optional[str]:
     In dev/fallback mode (no KV env), reads from _DEV_STORE.
     """
     if USE_DEV_KV:
+        _dev_expire(key)
         return _DEV_STORE.get(key)
     _require_kv()
     url = f"{KV_URL}/get/{urllib.parse.quote(key, safe='')}"
@@ -63,26 +76,47 @@ def kv_get_raw(key: str) -> Optional[str]:
     return j.get("result")
 
 
-def kv_set_raw(key: str, value: str, nx: bool = False) -> bool:
+def _command(*args) -> Any:
     """
-    SET raw string value. Returns True if OK.
-    POST {KV_URL}/set/{key}/{value}?nx=true|false
+    Run one Redis command through the Upstash REST API: POST {KV_URL} with the command as a
+    JSON array in the body (values travel in the body, so their size is not bound by URL limits).
+    Returns the "result" field.
+    """
+    _require_kv()
+    body = json.dumps([str(a) if not isinstance(a, str) else a for a in args]).encode("utf-8")
+    status, data = _request("POST", KV_URL, body=body)
+    if status != 200:
+        raise KvError(f"KV {args[0]} failed: {status} {data.decode('utf-8', 'ignore')}")
+    j = json.loads(data.decode("utf-8"))
+    if isinstance(j, dict) and j.get("error"):
+        raise KvError(f"KV {args[0]} failed: {j['error']}")
+    return j.get("result") if isinstance(j, dict) else None
+
+
+def kv_set_raw(key: str, value: str, nx: bool = False, ex: Optional[int] = None) -> bool:
+    """
+    SET raw string value. Returns True if OK (False when nx=True and the key exists).
+    POST {KV_URL} ["SET", key, value, "NX", "EX", <seconds>]
+    `ex` makes the key expire after that many seconds.
     In dev/fallback mode (no KV env), writes to _DEV_STORE.
     """
     if USE_DEV_KV:
+        _dev_expire(key)
         if nx and key in _DEV_STORE:
             return False
         _DEV_STORE[key] = value
+        if ex:
+            _DEV_EXPIRY[key] = time.monotonic() + ex
+        else:
+            _DEV_EXPIRY.pop(key, None)
         return True
-    _require_kv()
-    q = "?nx=true" if nx else ""
-    url = f"{KV_URL}/set/{urllib.parse.quote(key, safe='')}/{urllib.parse.quote(value, safe='')}{q}"
-    status, data = _request("POST", url)
-    if status != 200:
-        raise KvError(f"KV SET failed: {status} {data.decode('utf-8', 'ignore')}")
-    j = json.loads(data.decode("utf-8"))
-    # Upstash returns {"result":"OK"} or similar
-    return (j.get("result") or "").upper() == "OK"
+    args = ["SET", key, value]
+    if nx:
+        args.append("NX")
+    if ex:
+        args += ["EX", int(ex)]
+    # Upstash returns {"result":"OK"}, or {"result":null} when NX did not set the key
+    return (_command(*args) or "").upper() == "OK"
 
 
 def kv_del(key: str) -> int:
@@ -91,6 +125,8 @@ def kv_del(key: str) -> int:
     In dev/fallback mode (no KV env), deletes from _DEV_STORE.
     """
     if USE_DEV_KV:
+        _dev_expire(key)
+        _DEV_EXPIRY.pop(key, None)
         if key in _DEV_STORE:
             del _DEV_STORE[key]
             return 1
@@ -107,6 +143,74 @@ def kv_del(key: str) -> int:
         return 0
 
 
+def kv_del_if_equal(key: str, value: str) -> bool:
+    """
+    DEL key only while it still holds `value` (atomic, via a Lua script), e.g. to release
+    a lock without deleting one that expired and was claimed by someone else.
+    In dev/fallback mode (no KV env), compares against _DEV_STORE.
+    """
+    if USE_DEV_KV:
+        _dev_expire(key)
+        if _DEV_STORE.get(key) != value:
+            return False
+        _DEV_STORE.pop(key, None)
+        _DEV_EXPIRY.pop(key, None)
+        return True
+    script = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+    return int(_command("EVAL", script, 1, key, value) or 0) == 1
+
+
+def kv_eval(script: str, keys: list, args: list) -> Any:
+    """
+    EVAL a Lua script (atomic on the server). Needs a configured KV: the development
+    fallback cannot run scripts.
+    """
+    if USE_DEV_KV:
+        raise KvError("EVAL needs KV_REST_API_URL and KV_REST_API_TOKEN")
+    return _command("EVAL", script, len(keys), *keys, *args)
+
+
+def kv_rpush(key: str, *values: str) -> int:
+    """
+    RPUSH values onto the list at key (atomic append). Returns the new length.
+    In dev/fallback mode (no KV env), appends to _DEV_LISTS.
+    """
+    if USE_DEV_KV:
+        items = _DEV_LISTS.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+    return int(_command("RPUSH", key, *values) or 0)
+
+
+def kv_lrange(key: str, start: int = 0, stop: int = -1) -> list:
+    """
+    LRANGE key start stop (inclusive, negative indexes count from the end).
+    In dev/fallback mode (no KV env), slices _DEV_LISTS.
+    """
+    if USE_DEV_KV:
+        items = _DEV_LISTS.get(key, [])
+        end = len(items) + stop + 1 if stop < 0 else stop + 1
+        return list(items[start:end])
+    return list(_command("LRANGE", key, start, stop) or [])
+
+
+def kv_ltrim(key: str, start: int, stop: int = -1) -> bool:
+    """
+    LTRIM key start stop: keep only that range of the list (the key is removed when it is empty).
+    In dev/fallback mode (no KV env), trims _DEV_LISTS.
+    """
+    if USE_DEV_KV:
+        items = _DEV_LISTS.get(key, [])
+        end = len(items) + stop + 1 if stop < 0 else stop + 1
+        kept = items[start:end]
+        if kept:
+            _DEV_LISTS[key] = kept
+        else:
+            _DEV_LISTS.pop(key, None)
+        return True
+    return (_command("LTRIM", key, start, stop) or "").upper() == "OK"
+
+
 def kv_get_json(key: str, default: Any = None) -> Any:
     raw = kv_get_raw(key)
     if raw is None:
@@ -117,9 +221,9 @@ def kv_get_json(key: str, default: Any = None) -> Any:
         return default
 
 
-def kv_set_json(key: str, value: Any, nx: bool = False) -> bool:
+def kv_set_json(key: str, value: Any, nx: bool = False, ex: Optional[int] = None) -> bool:
     payload = json.dumps(value, separators=(",", ":"))
-    return kv_set_raw(key, payload, nx=nx)
+    return kv_set_raw(key, payload, nx=nx, ex=ex)
 
 
 # Domain helpers for this app
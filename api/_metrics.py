@@ -0,0 +1,159 @@
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# In-process metrics registry (per serverless instance), rendered in the
+# Prometheus text exposition format by /api-py/health/metrics.
+# Recording is a dict lookup plus a bisect under one lock, so it stays on in production.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_LOCK = threading.Lock()
+_STARTED = time.time()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("bounds", "buckets", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# name -> (help, {labels -> value})
+_COUNTERS: Dict[str, Tuple[str, Dict[LabelKey, float]]] = {}
+# name -> (help, bounds, {labels -> histogram})
+_HISTOGRAMS: Dict[str, Tuple[str, Tuple[float, ...], Dict[LabelKey, _Histogram]]] = {}
+
+
+def _key(labels: Optional[dict]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, labels: Optional[dict] = None, value: float = 1.0, help: str = "") -> None:
+    k = _key(labels)
+    with _LOCK:
+        series = _COUNTERS.get(name)
+        if series is None:
+            series = _COUNTERS[name] = (help, {})
+        series[1][k] = series[1].get(k, 0.0) + value
+
+
+def observe(name: str, value: float, labels: Optional[dict] = None,
+            buckets: Tuple[float, ...] = LATENCY_BUCKETS, help: str = "") -> None:
+    k = _key(labels)
+    with _LOCK:
+        series = _HISTOGRAMS.get(name)
+        if series is None:
+            series = _HISTOGRAMS[name] = (help, buckets, {})
+        hist = series[2].get(k)
+        if hist is None:
+            hist = series[2][k] = _Histogram(series[1])
+        hist.observe(value)
+
+
+# Domain helpers used by the handlers and backend clients
+
+def observe_request(route: str, status: int, seconds: float, nbytes: int) -> None:
+    inc("birthapp_http_requests_total", {"route": route, "status": status},
+        help="HTTP requests handled, by route and status code.")
+    observe("birthapp_http_request_duration_seconds", seconds, {"route": route},
+            help="End-to-end handler latency by route.")
+    observe("birthapp_http_response_bytes", nbytes, {"route": route}, buckets=SIZE_BUCKETS,
+            help="Response body size by route.")
+
+
+def observe_outbound(backend: str, op: str, seconds: float) -> None:
+    observe("birthapp_outbound_duration_seconds", seconds, {"backend": backend, "op": op},
+            help="Latency of outbound calls by backend (blob/kv/github) and operation.")
+
+
+def observe_payload(kind: str, nbytes: int) -> None:
+    observe("birthapp_payload_bytes", nbytes, {"kind": kind}, buckets=SIZE_BUCKETS,
+            help="Size of payloads exchanged with backends, by kind.")
+
+
+def cache_hit(cache: str) -> None:
+    inc("birthapp_cache_requests_total", {"cache": cache, "result": "hit"},
+        help="Cache lookups by cache name and result (hit/miss/stale).")
+
+
+def cache_miss(cache: str) -> None:
+    inc("birthapp_cache_requests_total", {"cache": cache, "result": "miss"},
+        help="Cache lookups by cache name and result (hit/miss/stale).")
+
+
+def cache_stale(cache: str) -> None:
+    inc("birthapp_cache_requests_total", {"cache": cache, "result": "stale"},
+        help="Cache lookups by cache name and result (hit/miss/stale).")
+
+
+def blob_put_attempt(strategy: str, outcome: str) -> None:
+    inc("birthapp_blob_put_attempts_total", {"strategy": strategy, "outcome": outcome},
+        help="Blob PUT attempts by strategy (auth/query/upload) and outcome (ok/rejected/error).")
+
+
+# Exposition
+
+def _fmt_labels(k: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(k) + list(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(n, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for n, v in pairs
+    )
+    return "{" + inner + "}"
+
+
+def _fmt_num(v: float) -> str:
+    if v == int(v):
+        return str(int(v))
+    return repr(float(v))
+
+
+def render() -> str:
+    """
+    Render all series in Prometheus text format (version 0.0.4).
+    """
+    lines: List[str] = [
+        "# HELP birthapp_process_start_time_seconds Start time of this instance since unix epoch.",
+        "# TYPE birthapp_process_start_time_seconds gauge",
+        f"birthapp_process_start_time_seconds {_fmt_num(round(_STARTED, 3))}",
+    ]
+    with _LOCK:
+        for name in sorted(_COUNTERS):
+            help_text, series = _COUNTERS[name]
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for k in sorted(series):
+                lines.append(f"{name}{_fmt_labels(k)} {_fmt_num(series[k])}")
+        for name in sorted(_HISTOGRAMS):
+            help_text, bounds, series = _HISTOGRAMS[name]
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for k in sorted(series):
+                hist = series[k]
+                cumulative = 0
+                for bound, n in zip(bounds, hist.buckets):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_fmt_labels(k, [('le', _fmt_num(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{_fmt_labels(k, [('le', '+Inf')])} {hist.count}")
+                lines.append(f"{name}_sum{_fmt_labels(k)} {_fmt_num(hist.sum)}")
+                lines.append(f"{name}_count{_fmt_labels(k)} {hist.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,208 @@
+from typing import List, Tuple
+
+# Partial dataset edits for /api-py/json.
+# Two formats, both applied to a copy of the rows and reporting which rows they touched so
+# only those need validating:
+#   JSON Patch (RFC 6902, application/json-patch+json): [{"op", "path", "value"|"from"}, ...]
+#     against the rows array, e.g. {"op": "replace", "path": "/3/year", "value": "1990"}.
+#     Index paths are only safe against a known version, hence the If-Match precondition.
+#   Keyed merge patch (application/merge-patch+json): {"<id>": {field: value, ...} | null}
+#     merges fields into the row with that id (RFC 7396: a null field drops it), null removes
+#     the row and an unknown id adds a new row with that id.
+# Either way a patch may only write FIELDS, as strings; anything else is rejected up front.
+
+FIELDS = ("id", "first_name", "last_name", "day", "month", "year")
+
+
+class PatchError(ValueError):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _check_field(name: str, value) -> None:
+    """
+    A patch may only write FIELDS, with string values (None: the field is dropped).
+    """
+    if name not in FIELDS:
+        raise PatchError(f"Unknown field: {name!r} (allowed: {', '.join(FIELDS)})")
+    if value is not None and not isinstance(value, str):
+        raise PatchError(f"Field {name!r} must be a string")
+
+
+def _check_row(value) -> None:
+    if not isinstance(value, dict):
+        raise PatchError("A row must be an object")
+    for k, v in value.items():
+        _check_field(k, v)
+
+
+def _pointer(path) -> List[str]:
+    if not isinstance(path, str) or (path and not path.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer: {path!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in path.split("/")[1:]]
+
+
+def _index(token: str, size: int, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return size
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    i = int(token)
+    if i > size or (i == size and not allow_end):
+        raise PatchError(f"Array index out of range: {i}")
+    return i
+
+
+class _Rows:
+    """
+    Copy-on-write view of the rows: a row is copied the first time an op changes it,
+    and every copied or inserted row is remembered as touched.
+    """
+
+    def __init__(self, rows: list):
+        self.rows = list(rows)
+        self.touched = set()
+
+    def _own(self, i: int) -> dict:
+        row = self.rows[i]
+        if id(row) not in self.touched:
+            if not isinstance(row, dict):
+                raise PatchError(f"Row {i} is not an object")
+            row = dict(row)
+            self.rows[i] = row
+            self.touched.add(id(row))
+        return row
+
+    def _insert(self, i: int, value) -> None:
+        row = dict(value) if isinstance(value, dict) else value
+        self.rows.insert(i, row)
+        self.touched.add(id(row))
+
+    def get(self, tokens: List[str]):
+        if not tokens:
+            return list(self.rows)
+        i = _index(tokens[0], len(self.rows))
+        if len(tokens) == 1:
+            return self.rows[i]
+        if len(tokens) != 2 or not isinstance(self.rows[i], dict) or tokens[1] not in self.rows[i]:
+            raise PatchError("Path does not exist: /" + "/".join(tokens))
+        return self.rows[i][tokens[1]]
+
+    def add(self, tokens: List[str], value) -> None:
+        if len(tokens) == 1:
+            self._insert(_index(tokens[0], len(self.rows), allow_end=True), value)
+        elif len(tokens) == 2:
+            self._own(_index(tokens[0], len(self.rows)))[tokens[1]] = value
+        else:
+            raise PatchError("Paths must address a row (/N) or a row field (/N/field)")
+
+    def remove(self, tokens: List[str]):
+        if len(tokens) == 1:
+            return self.rows.pop(_index(tokens[0], len(self.rows)))
+        if len(tokens) == 2:
+            row = self._own(_index(tokens[0], len(self.rows)))
+            if tokens[1] not in row:
+                raise PatchError("Path does not exist: /" + "/".join(tokens))
+            return row.pop(tokens[1])
+        raise PatchError("Paths must address a row (/N) or a row field (/N/field)")
+
+
+def apply_json_patch(rows: list, ops) -> Tuple[list, list]:
+    """
+    Apply RFC 6902 operations to the rows array. Returns (rows, touched rows).
+    All-or-nothing: the input list is never modified, a failing op raises PatchError.
+    """
+    if not isinstance(ops, list):
+        raise PatchError("JSON Patch must be an array of operations")
+    doc = _Rows(rows)
+    for n, op in enumerate(ops):
+        if not isinstance(op, dict) or op.get("op") not in ("add", "remove", "replace", "move", "copy", "test"):
+            raise PatchError(f"Operation {n}: unsupported or missing op")
+        path = _pointer(op.get("path"))
+        if not path:
+            raise PatchError(f"Operation {n}: the whole dataset cannot be patched; use POST to replace it")
+        kind = op["op"]
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"Operation {n}: missing value")
+        try:
+            if kind in ("add", "replace"):
+                if len(path) == 1:
+                    _check_row(op["value"])
+                elif len(path) == 2:
+                    _check_field(path[1], op["value"])
+            elif kind == "remove" and len(path) == 2:
+                _check_field(path[1], None)
+        except PatchError as pe:
+            raise PatchError(f"Operation {n}: {pe}")
+        if kind == "add":
+            doc.add(path, op["value"])
+        elif kind == "remove":
+            doc.remove(path)
+        elif kind == "replace":
+            doc.get(path)  # must exist
+            if len(path) == 1:
+                doc.remove(path)
+            doc.add(path, op["value"])
+        elif kind == "test":
+            if doc.get(path) != op["value"]:
+                raise PatchError(f"Operation {n}: test failed at {op['path']}", status=409)
+        else:
+            src = _pointer(op.get("from"))
+            if not src:
+                raise PatchError(f"Operation {n}: missing from")
+            value = doc.remove(src) if kind == "move" else doc.get(src)
+            if len(path) == 2:
+                try:
+                    _check_field(path[1], value)
+                except PatchError as pe:
+                    raise PatchError(f"Operation {n}: {pe}")
+            doc.add(path, value)
+    touched = [r for r in doc.rows if id(r) in doc.touched]
+    ids = [r.get("id") for r in doc.rows if isinstance(r, dict) and r.get("id")]
+    if len(ids) != len(set(ids)):
+        raise PatchError("Patch would leave two rows with the same id")
+    return doc.rows, touched
+
+
+def apply_merge_patch(rows: list, patch) -> Tuple[list, list, list]:
+    """
+    Apply a keyed merge patch. Returns (rows, touched rows, removed ids).
+    """
+    if not isinstance(patch, dict) or not patch:
+        raise PatchError("Merge patch must be a non-empty object keyed by row id")
+    rows = list(rows)
+    positions = {r.get("id"): i for i, r in enumerate(rows) if isinstance(r, dict) and r.get("id")}
+    touched, removed = [], []
+    for row_id, change in patch.items():
+        if change is None:
+            if row_id not in positions:
+                raise PatchError(f"Unknown row id: {row_id}", status=409)
+            removed.append(row_id)
+            continue
+        if not isinstance(change, dict):
+            raise PatchError(f"Row {row_id}: patch must be an object or null")
+        try:
+            for k, v in change.items():
+                _check_field(k, v)
+        except PatchError as pe:
+            raise PatchError(f"Row {row_id}: {pe}")
+        i = positions.get(row_id)
+        row = dict(rows[i]) if i is not None else {}
+        for k, v in change.items():
+            if v is None:
+                row.pop(k, None)
+            else:
+                row[k] = v
+        row["id"] = row_id
+        if i is None:
+            positions[row_id] = len(rows)
+            rows.append(row)
+        else:
+            rows[i] = row
+        touched.append(row)
+    if removed:
+        drop = set(removed)
+        rows = [r for r in rows if not (isinstance(r, dict) and r.get("id") in drop)]
+        touched = [r for r in touched if r.get("id") not in drop]
+    return rows, touched, removed
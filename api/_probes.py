@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+import urllib.parse
+from typing import Optional
+
+# Read-only dependency probes (Blob object URL, GitHub raw JSON URL) for the diagnostics
+# paths and /api-py/health?deep=1. Probes run concurrently with a short timeout, and the
+# result is shared for PROBE_CACHE_TTL_SECONDS so an outage does not make every failing
+# request wait on the same slow dependencies again.
+PROBE_TIMEOUT_SECONDS = float(os.getenv("PROBE_TIMEOUT_SECONDS") or "3")
+PROBE_CACHE_TTL_SECONDS = float(os.getenv("PROBE_CACHE_TTL_SECONDS") or "15")
+
+_LOCK = threading.Lock()
+_RESULT: Optional[dict] = None
+_AT = 0.0
+_INFLIGHT: Optional[threading.Event] = None
+
+
+def blob_probe_url() -> Optional[str]:
+    b_base = (os.getenv("BLOB_BASE_URL") or "").rstrip("/")
+    b_key = (os.getenv("BLOB_JSON_KEY") or "").strip()
+    if b_base and b_key:
+        return f"{b_base}/{urllib.parse.quote(b_key, safe='')}"
+    return None
+
+
+def github_probe_url() -> Optional[str]:
+    owner = (os.getenv("GITHUB_REPO_OWNER") or "").strip()
+    repo = (os.getenv("GITHUB_REPO") or "").strip()
+    branch = (os.getenv("GITHUB_BRANCH") or "").strip()
+    path = (os.getenv("GITHUB_JSON_FILE_PATH") or "").strip()
+    if owner and repo and branch and path:
+        return f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
+    return None
+
+
+def _probe(url: Optional[str]) -> dict:
+    """
+    GET `url` and report {"url", "status", "ms", "error"}; status is None when unreachable.
+    Only the status line and headers are awaited, never the body.
+    """
+    out = {"url": url, "status": None, "ms": None, "error": None}
+    if not url:
+        return out
+    import urllib.error
+    import urllib.request
+    t0 = time.perf_counter()
+    try:
+        req = urllib.request.Request(url, method="GET", headers={"User-Agent": "birthdays-app-python"})
+        with urllib.request.urlopen(req, timeout=PROBE_TIMEOUT_SECONDS) as resp:
+            out["status"] = resp.getcode()
+    except urllib.error.HTTPError as he:
+        out["status"] = he.code
+    except Exception as e:
+        out["error"] = str(e) or e.__class__.__name__
+    out["ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return out
+
+
+def run_probes(force: bool = False) -> dict:
+    """
+    Probe Blob and GitHub concurrently. Returns
+      {"blob": {...}, "github": {...}, "cached": bool, "age_ms": float}
+    Concurrent callers share one in-flight probe run; results are reused within the TTL.
+    """
+    global _RESULT, _AT, _INFLIGHT
+    from . import _http
+    from ._metrics import cache_hit, cache_miss
+    from ._timing import phase
+
+    while True:
+        with _LOCK:
+            now = time.monotonic()
+            if not force and _RESULT is not None and (now - _AT) < PROBE_CACHE_TTL_SECONDS:
+                cache_hit("probes")
+                return dict(_RESULT, cached=True, age_ms=round((now - _AT) * 1000.0, 1))
+            waiting = _INFLIGHT
+            if waiting is None:
+                _INFLIGHT = threading.Event()
+                break
+        # Another request is probing right now: wait for its result instead of probing again
+        waiting.wait(PROBE_TIMEOUT_SECONDS * 2)
+        force = False
+
+    cache_miss("probes")
+    try:
+        with phase("probes"):
+            blob, github = _http.gather(lambda: _probe(blob_probe_url()), lambda: _probe(github_probe_url()))
+            result = {"blob": blob, "github": github}
+        with _LOCK:
+            _RESULT, _AT = result, time.monotonic()
+        return dict(result, cached=False, age_ms=0.0)
+    finally:
+        with _LOCK:
+            event, _INFLIGHT = _INFLIGHT, None
+        if event is not None:
+            event.set()
@@ -0,0 +1,320 @@
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from ._calendar import birth_parts, next_occurrence, occurrence
+
+# Birthday reminders.
+# The scheduler keeps a min-heap of (due timestamp, row id) built once from the dataset and
+# kept current through the storage engine's change notifications (store_subscribe), so a
+# mutation costs O(log n) instead of a rescan. dispatch_due() pops everything that is due
+# and hands it to the configured sink; each (row, birthday) is claimed in KV first, so a
+# reminder is delivered at most once even with several instances or retries.
+#
+#   REMINDER_SINK         "log" (default), "webhook" or "smtp"
+#   REMINDER_TZ           timezone reminders are scheduled in (default: UPCOMING_TZ, else UTC)
+#   REMINDER_HOUR         local hour at which reminders are sent (default 9)
+#   REMINDER_DAYS_BEFORE  how many days ahead of the birthday to remind (default 0)
+#   REMINDER_LOOKBACK_DAYS  reminders due up to this many days ago that were never sent (cron ran
+#                         before REMINDER_HOUR, a run was skipped, a cold start after the hour) are
+#                         still delivered on the next run (default 2)
+#   REMINDER_WEBHOOK_URL  target for the webhook sink (JSON POST)
+#   REMINDER_SMTP_HOST / REMINDER_SMTP_PORT / REMINDER_SMTP_FROM / REMINDER_SMTP_TO
+#                         local SMTP relay for the smtp sink (default localhost:25)
+REMINDER_SINK = (os.getenv("REMINDER_SINK") or "log").strip().lower()
+REMINDER_TZ = (os.getenv("REMINDER_TZ") or os.getenv("UPCOMING_TZ") or "UTC").strip()
+REMINDER_HOUR = int(os.getenv("REMINDER_HOUR") or "9")
+REMINDER_DAYS_BEFORE = int(os.getenv("REMINDER_DAYS_BEFORE") or "0")
+REMINDER_LOOKBACK_DAYS = int(os.getenv("REMINDER_LOOKBACK_DAYS") or "2")
+REMINDER_WEBHOOK_URL = (os.getenv("REMINDER_WEBHOOK_URL") or "").strip()
+REMINDER_SMTP_HOST = os.getenv("REMINDER_SMTP_HOST") or "localhost"
+REMINDER_SMTP_PORT = int(os.getenv("REMINDER_SMTP_PORT") or "25")
+REMINDER_SMTP_FROM = os.getenv("REMINDER_SMTP_FROM") or "birthdays@localhost"
+REMINDER_SMTP_TO = os.getenv("REMINDER_SMTP_TO") or ""
+
+SENT_PREFIX = "reminder:"          # reminder:<id>:<birthday date> -> {"at": ..., "sink": ...}
+SENT_TTL_SECONDS = 366 * 86400     # claims outlive the lookback window, then expire
+RETRY_SECONDS = 300                # a failed delivery is retried after this long
+
+
+# Sinks: send(reminder: dict) -> None, raising on failure
+
+class LogSink:
+    name = "log"
+
+    def send(self, reminder: dict) -> None:
+        print(json.dumps({"event": "birthday_reminder", **reminder}, ensure_ascii=False), flush=True)
+
+
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, url: str = REMINDER_WEBHOOK_URL):
+        if not url:
+            raise RuntimeError("REMINDER_WEBHOOK_URL is required for the webhook sink")
+        self.url = url
+
+    def send(self, reminder: dict) -> None:
+        import urllib.request
+        body = json.dumps(reminder, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "User-Agent": "birthdays-app-python",
+        })
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            resp.read()
+
+
+class SmtpSink:
+    name = "smtp"
+
+    def __init__(self, host: str = REMINDER_SMTP_HOST, port: int = REMINDER_SMTP_PORT,
+                 sender: str = REMINDER_SMTP_FROM, to: str = REMINDER_SMTP_TO):
+        if not to:
+            raise RuntimeError("REMINDER_SMTP_TO is required for the smtp sink")
+        self.host, self.port, self.sender, self.to = host, port, sender, to
+
+    def send(self, reminder: dict) -> None:
+        import smtplib
+        from email.message import EmailMessage
+        name = f"{reminder['first_name']} {reminder['last_name']}".strip()
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = self.to
+        msg["Subject"] = f"Birthday: {name} on {reminder['date']}"
+        age = f" (turns {reminder['age']})" if reminder.get("age") else ""
+        msg.set_content(f"{name} has a birthday on {reminder['date']}{age}.\n")
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(msg)
+
+
+SINKS: Dict[str, Callable[[], object]] = {"log": LogSink, "webhook": WebhookSink, "smtp": SmtpSink}
+
+
+def register_sink(name: str, factory: Callable[[], object]) -> None:
+    """
+    Make a custom sink available as REMINDER_SINK=<name>.
+    """
+    SINKS[name] = factory
+
+
+def get_sink(name: Optional[str] = None):
+    factory = SINKS.get(name or REMINDER_SINK)
+    if factory is None:
+        raise RuntimeError(f"Unknown REMINDER_SINK: {name or REMINDER_SINK}")
+    return factory()
+
+
+class _Entry:
+    __slots__ = ("due", "row_id", "birthday", "row", "live")
+
+    def __init__(self, due: float, row_id: str, birthday, row: dict):
+        self.due, self.row_id, self.birthday, self.row, self.live = due, row_id, birthday, row, True
+
+    def __lt__(self, other: "_Entry") -> bool:
+        return (self.due, self.row_id) < (other.due, other.row_id)
+
+
+class ReminderScheduler:
+    """
+    Min-heap of upcoming reminders. Replaced or removed rows are invalidated lazily
+    (marked dead and skipped when they reach the top), so every change is O(log n).
+    """
+
+    def __init__(self, tz_name: str = REMINDER_TZ, hour: int = REMINDER_HOUR, days_before: int = REMINDER_DAYS_BEFORE,
+                 lookback_days: int = REMINDER_LOOKBACK_DAYS):
+        from zoneinfo import ZoneInfo
+        self.tz = ZoneInfo(tz_name)
+        self.hour = hour
+        self.days_before = days_before
+        self.lookback_days = lookback_days
+        self.version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._heap: List[_Entry] = []
+        self._live: Dict[str, _Entry] = {}
+
+    def _entry(self, row: dict, after=None) -> Optional[_Entry]:
+        parts = birth_parts(row)
+        row_id = (row.get("id") or "").strip() if isinstance(row, dict) else ""
+        if parts is None or not row_id:
+            return None
+        _, month, day = parts
+        # The first birthday whose reminder day is at most lookback_days ago: a reminder whose
+        # hour passed without a dispatch is due right away instead of moving to next year
+        # (one that was delivered is skipped by its KV claim)
+        since = datetime.now(self.tz).date() - timedelta(days=self.lookback_days - self.days_before)
+        birthday = next_occurrence(month, day, since)
+        if after is not None and birthday <= after:
+            birthday = occurrence(after.year + 1, month, day)
+        remind_on = birthday - timedelta(days=self.days_before)
+        due = datetime(remind_on.year, remind_on.month, remind_on.day, self.hour, tzinfo=self.tz).timestamp()
+        return _Entry(due, row_id, birthday, row)
+
+    def _push(self, entry: Optional[_Entry]) -> None:
+        if entry is None:
+            return
+        old = self._live.get(entry.row_id)
+        if old is not None:
+            old.live = False
+        self._live[entry.row_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _drop(self, row_id: str) -> None:
+        old = self._live.pop(row_id, None)
+        if old is not None:
+            old.live = False
+
+    def rebuild(self, rows: list, version: Optional[int] = None) -> None:
+        """
+        O(n) build from the full dataset (heapify, not n pushes).
+        """
+        with self._lock:
+            self._live = {}
+            for r in rows:
+                e = self._entry(r)
+                if e is not None:
+                    self._live[e.row_id] = e
+            self._heap = list(self._live.values())
+            heapq.heapify(self._heap)
+            self.version = version
+
+    def on_change(self, diff: dict, version: int) -> None:
+        """
+        store_subscribe() callback: apply a keyed diff in O(k log n).
+        """
+        with self._lock:
+            for r in diff["added"] + diff["changed"]:
+                e = self._entry(r)
+                if e is None:
+                    self._drop((r.get("id") or "").strip())
+                else:
+                    self._push(e)
+            for row_id in diff["removed"]:
+                self._drop(row_id)
+            self.version = version
+            # Dead entries only leave the heap when they reach the top; compact if they dominate
+            if len(self._heap) > 2 * len(self._live) + 64:
+                self._heap = [e for e in self._heap if e.live]
+                heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            while self._heap and not self._heap[0].live:
+                heapq.heappop(self._heap)
+            return self._heap[0].due if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[_Entry]:
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and (not self._heap[0].live or self._heap[0].due <= now):
+                e = heapq.heappop(self._heap)
+                if e.live:
+                    due.append(e)
+        return due
+
+    def reschedule(self, entry: _Entry, retry_at: Optional[float] = None) -> None:
+        """
+        After delivery: schedule the following year's reminder. After a failure: retry later.
+        """
+        with self._lock:
+            if self._live.get(entry.row_id) is not entry:
+                return  # row changed or was removed meanwhile
+            if retry_at is not None:
+                nxt = _Entry(retry_at, entry.row_id, entry.birthday, entry.row)
+            else:
+                nxt = self._entry(entry.row, after=entry.birthday)
+            entry.live = False
+            self._push(nxt)
+
+
+def _reminder(entry: _Entry, days_before: int) -> dict:
+    parts = birth_parts(entry.row) or (None, 0, 0)
+    year = parts[0]
+    return {
+        "id": entry.row_id,
+        "first_name": entry.row.get("first_name") or "",
+        "last_name": entry.row.get("last_name") or "",
+        "date": entry.birthday.isoformat(),
+        "age": (entry.birthday.year - year) if year else None,
+        "days_before": days_before,
+    }
+
+
+_LOCK = threading.Lock()
+_SCHEDULER: Optional[ReminderScheduler] = None
+
+
+def get_scheduler() -> ReminderScheduler:
+    """
+    The process-wide scheduler, built from the current dataset and subscribed to changes.
+    """
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        from ._store import store_get_rows, store_subscribe, store_version
+        with _LOCK:
+            if _SCHEDULER is None:
+                scheduler = ReminderScheduler()
+                scheduler.rebuild(store_get_rows(), store_version())
+                store_subscribe(scheduler.on_change)
+                _SCHEDULER = scheduler
+    return _SCHEDULER
+
+
+def dispatch_due(sink=None, now: Optional[float] = None) -> dict:
+    """
+    Deliver every reminder that is due. Returns {"sent", "skipped", "failed", "next_due"}.
+    """
+    from ._kv import kv_del, kv_set_json
+    from ._store import store_get_rows
+    store_get_rows()  # pick up changes from other instances (notifies the scheduler)
+    scheduler = get_scheduler()
+    sink = sink or get_sink()
+    report = {"sent": 0, "skipped": 0, "failed": 0}
+    for entry in scheduler.pop_due(now):
+        key = f"{SENT_PREFIX}{entry.row_id}:{entry.birthday.isoformat()}"
+        # Claim first: only one instance (or retry) delivers a given birthday
+        if not kv_set_json(key, {"at": time.time(), "sink": getattr(sink, "name", "custom")}, nx=True, ex=SENT_TTL_SECONDS):
+            report["skipped"] += 1
+            scheduler.reschedule(entry)
+            continue
+        try:
+            sink.send(_reminder(entry, scheduler.days_before))
+        except Exception:
+            kv_del(key)  # release the claim so the retry can deliver
+            report["failed"] += 1
+            scheduler.reschedule(entry, retry_at=time.time() + RETRY_SECONDS)
+            continue
+        report["sent"] += 1
+        scheduler.reschedule(entry)
+    report["next_due"] = scheduler.next_due()
+    return report
+
+
+def run_forever(sink=None, max_sleep: float = 300.0) -> None:
+    """
+    Long-running loop for self-hosted deployments: sleep until the heap's next due time
+    (at most max_sleep, so changes from other instances are noticed) and dispatch.
+    """
+    sink = sink or get_sink()
+    while True:
+        report = dispatch_due(sink)
+        if report["sent"] or report["failed"]:
+            print(json.dumps({"event": "reminders_dispatched", **report}), flush=True)
+        next_due = report["next_due"]
+        delay = max_sleep if next_due is None else min(max_sleep, max(1.0, next_due - time.time()))
+        time.sleep(delay)
+
+
+if __name__ == "__main__":
+    # python -m api._reminders        dispatch due reminders once
+    # python -m api._reminders --loop run the scheduler loop
+    import sys
+    if "--loop" in sys.argv[1:]:
+        run_forever()
+    else:
+        print(json.dumps(dispatch_due()))
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from ._timing import phase
+
+# Month-sharded Blob layout for the storage engine (STORE_BACKEND=blob-shards).
+# Rows live in one Blob object per birth month, the change-feed ring in its own object, and a
+# small manifest holds the rest of the dataset meta and a content hash per object:
+#
+#   <prefix>/manifest.json   {"schema_version", "layout": "month-shards", "meta", "shards", "changes"}
+#   <prefix>/m01.json ...    {"pos": [...], "rows": [...]} for rows whose month is 1..12
+#                            (m00.json: missing/invalid month)
+#   <prefix>/changes.json    meta.changes (the change-feed ring)
+#
+# Every row keeps its dataset position next to it in its shard ("pos": increasing, with gaps),
+# so the manifest does not grow with the dataset and reassembling the rows is a merge of the
+# shards. Positions survive saves (new rows take free positions between their neighbours) and
+# are only renumbered when rows are reordered, so a mutation re-uploads the shards it touched,
+# the change ring and the manifest. Objects are fetched in parallel and cached by hash.
+# When no manifest exists yet, the single BLOB_JSON_KEY document is read instead and the
+# first save writes the sharded layout.
+#
+#   BLOB_SHARD_PREFIX  key prefix for the manifest and shards (default: "birthdays")
+BLOB_SHARD_PREFIX = (os.getenv("BLOB_SHARD_PREFIX") or "birthdays").strip("/")
+
+MANIFEST_KEY = f"{BLOB_SHARD_PREFIX}/manifest.json"
+CHANGES = "changes"   # object name of the change ring (<prefix>/changes.json)
+LAYOUT = "month-shards"
+POS_STEP = 1024       # gap between positions after a renumbering, room for inserts
+LOAD_ATTEMPTS = 3     # manifest re-reads when a shard is newer than the manifest
+
+
+def _to_int(v) -> Optional[int]:
+    try:
+        return int(str(v).strip())
+    except Exception:
+        return None
+
+
+def shard_name(row: dict) -> str:
+    month = _to_int(row.get("month")) or 0
+    return f"m{month:02d}" if 1 <= month <= 12 else "m00"
+
+
+def shard_key(name: str) -> str:
+    return f"{BLOB_SHARD_PREFIX}/{name}.json"
+
+
+def _hash(content) -> str:
+    text = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _row_id(row):
+    return row.get("id") if isinstance(row, dict) else None
+
+
+def _positions(rows: list, previous: Dict[str, List[int]]) -> List[int]:
+    """
+    One position per row. Rows that are already stored keep their position (`previous` maps
+    id -> stored positions) as long as those still increase in the new order, and new rows take
+    evenly spaced free positions between their neighbours; otherwise every row is renumbered.
+    """
+    n = len(rows)
+    renumbered = [(i + 1) * POS_STEP for i in range(n)]
+    available = {k: list(v) for k, v in previous.items()}
+    known: List[Optional[int]] = []
+    for r in rows:
+        bucket = available.get(_row_id(r))
+        known.append(bucket.pop(0) if bucket else None)
+    out: List[int] = []
+    last, i = 0, 0
+    while i < n:
+        if known[i] is not None:
+            if known[i] <= last:
+                return renumbered
+            last = known[i]
+            out.append(last)
+            i += 1
+            continue
+        j = i
+        while j < n and known[j] is None:
+            j += 1
+        k = j - i
+        upper = known[j] if j < n else last + (k + 1) * POS_STEP
+        if upper - last <= k:
+            return renumbered
+        out.extend(last + (upper - last) * (m + 1) // (k + 1) for m in range(k))
+        last = out[-1]
+        i = j
+    return out
+
+
+def _merge(shards: Iterable[dict]) -> list:
+    """
+    Rows of the given shards in dataset order.
+    """
+    pairs = []
+    for content in shards:
+        pairs.extend(zip(content.get("pos") or [], content.get("rows") or []))
+    pairs.sort(key=lambda p: p[0])
+    return [r for _, r in pairs]
+
+
+class ShardedBlobBackend:
+    name = "blob-shards"
+    persistent = True
+
+    def __init__(self):
+        from ._store import STORE_CACHE_TTL_SECONDS
+        self.cache_ttl: Optional[float] = STORE_CACHE_TTL_SECONDS
+        self._lock = threading.Lock()
+        self._objects: Dict[str, tuple] = {}       # name -> (hash, content)
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="shard")
+        return self._executor
+
+    def _read_manifest(self) -> Optional[dict]:
+        from ._blob import get_json as blob_get_json
+        with phase("shards-manifest"):
+            manifest = blob_get_json(key=MANIFEST_KEY, default=None)
+        if not (isinstance(manifest, dict) and manifest.get("layout") == LAYOUT):
+            return None
+        return manifest
+
+    @staticmethod
+    def _hashes(manifest: dict) -> Dict[str, str]:
+        """
+        name -> hash of every object the manifest points at (the shards and the change ring).
+        """
+        out = {name: (info or {}).get("hash") for name, info in (manifest.get("shards") or {}).items()}
+        if isinstance(manifest.get(CHANGES), dict):
+            out[CHANGES] = manifest[CHANGES].get("hash")
+        return {k: v for k, v in out.items() if v}
+
+    def _fetch(self, manifest: dict, names: Iterable[str]) -> tuple:
+        """
+        ({name: content}, current) for the named objects, downloading (in parallel) only those
+        whose hash changed. `current` is False when an object no longer matches the manifest
+        (written after the manifest was read).
+        """
+        from ._blob import get_json as blob_get_json
+        hashes = self._hashes(manifest)
+        out, missing = {}, []
+        for name in names:
+            want = hashes.get(name)
+            if want is None:
+                continue
+            cached = self._objects.get(name)
+            if cached is not None and cached[0] == want:
+                out[name] = cached[1]
+            else:
+                missing.append(name)
+        current = True
+        if missing:
+            with phase("shards-get"):
+                futures = {n: self._pool().submit(blob_get_json, key=shard_key(n), default=None) for n in missing}
+                for name, f in futures.items():
+                    content = f.result()
+                    # Keyed by the hash of what we actually got, so an object written after the
+                    # manifest we read is fetched again next time
+                    h = _hash(content)
+                    self._objects[name] = (h, content)
+                    out[name] = content
+                    current = current and h == hashes[name]
+        return out, current
+
+    def load(self):
+        manifest = self._read_manifest()
+        if manifest is None:
+            # Not sharded yet: fall back to the single-document layout
+            from ._blob import get_json as blob_get_json
+            return blob_get_json(default=None)
+        for _ in range(LOAD_ATTEMPTS):
+            objects, current = self._fetch(manifest, self._hashes(manifest).keys())
+            if current:
+                break
+            # An object was rewritten after the manifest was read: its manifest is (or will
+            # shortly be) newer, so read it again rather than mix two versions
+            manifest = self._read_manifest() or manifest
+        else:
+            from ._store import StoreError
+            raise StoreError("blob shards changed while loading; try again")
+        meta = dict(manifest.get("meta") or {})
+        changes = objects.pop(CHANGES, None)
+        if isinstance(changes, list) and changes:
+            meta["changes"] = changes
+        rows = _merge(c for c in objects.values() if isinstance(c, dict))
+        return {"schema_version": manifest.get("schema_version", 2), "meta": meta, "data": rows}
+
+    def save(self, doc: dict) -> None:
+        from ._blob import set_json as blob_set_json
+        rows = doc["data"]
+        # Re-read the manifest (small) so objects changed by another instance are not skipped;
+        # stored positions come from the shards (cached by hash, so usually no download)
+        known = self._read_manifest() or {}
+        old = known.get("shards") or {}
+        previous: Dict[str, List[int]] = {}
+        if old:
+            stored, _ = self._fetch(known, old.keys())
+            for content in stored.values():
+                if isinstance(content, dict):
+                    for p, r in zip(content.get("pos") or [], content.get("rows") or []):
+                        previous.setdefault(_row_id(r), []).append(p)
+            for positions in previous.values():
+                positions.sort()
+        shards: Dict[str, dict] = {}
+        for p, r in zip(_positions(rows, previous), rows):
+            content = shards.setdefault(shard_name(r if isinstance(r, dict) else {}), {"pos": [], "rows": []})
+            content["pos"].append(p)
+            content["rows"].append(r)
+        meta = dict(doc.get("meta") or {})
+        changes = meta.pop("changes", None) or []
+        # Shards that became empty are rewritten as empty so stale rows do not reappear
+        info, changed = {}, []
+        for name in sorted(set(shards) | set(old)):
+            content = shards.get(name, {"pos": [], "rows": []})
+            h = _hash(content)
+            info[name] = {"hash": h, "count": len(content["rows"])}
+            if (old.get(name) or {}).get("hash") != h:
+                changed.append((name, content, h))
+        h = _hash(changes)
+        if ((known.get(CHANGES) or {}).get("hash")) != h:
+            changed.append((CHANGES, changes, h))
+        manifest = {
+            "schema_version": doc.get("schema_version", 2),
+            "layout": LAYOUT,
+            "meta": meta,
+            "shards": info,
+            CHANGES: {"hash": h, "count": len(changes)},
+        }
+        with phase("shards-put"):
+            futures = [self._pool().submit(blob_set_json, content, key=shard_key(name)) for name, content, _ in changed]
+            for f in futures:
+                f.result()
+        # The manifest goes last: readers never see a manifest pointing at unwritten objects
+        blob_set_json(manifest, key=MANIFEST_KEY)
+        for name, content, h in changed:
+            self._objects[name] = (h, content)
+
+    def find_by_months(self, months: List[int]) -> tuple:
+        """
+        (rows born in any of `months`, in dataset order, dataset version), reading only the
+        manifest and those months' shards. The version is None (the caller reads everything)
+        before the dataset is sharded, or when a shard was rewritten after the manifest was read.
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            return [], None
+        objects, current = self._fetch(manifest, [f"m{int(m):02d}" for m in months])
+        if not current:
+            return [], None
+        rows = _merge(c for c in objects.values() if isinstance(c, dict))
+        return rows, (manifest.get("meta") or {}).get("version")
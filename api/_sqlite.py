@@ -0,0 +1,237 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+from ._dupes import fold_name
+from ._timing import phase
+
+# Optional SQLite backend for the storage engine (STORE_BACKEND=sqlite).
+# Intended for self-hosted/local deployments with large datasets: rows live in an
+# indexed table (id, (month, day), normalized name), the database runs in WAL mode so
+# readers never block the writer, and store_set_rows() is applied as per-row writes.
+#
+#   SQLITE_PATH  database file (default: birthdays.sqlite3 in the working directory)
+SQLITE_PATH = os.getenv("SQLITE_PATH") or "birthdays.sqlite3"
+
+FIELDS = ("id", "first_name", "last_name", "day", "month", "year")
+ABSENT_KEY = "$absent"   # in `extra`: FIELDS missing from the row (their columns hold '')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL DEFAULT '',
+    first_name TEXT NOT NULL DEFAULT '',
+    last_name TEXT NOT NULL DEFAULT '',
+    day TEXT NOT NULL DEFAULT '',
+    month TEXT NOT NULL DEFAULT '',
+    year TEXT NOT NULL DEFAULT '',
+    month_i INTEGER,
+    day_i INTEGER,
+    name_norm TEXT NOT NULL DEFAULT '',
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS people_id ON people(id);
+CREATE INDEX IF NOT EXISTS people_month_day ON people(month_i, day_i);
+CREATE INDEX IF NOT EXISTS people_name ON people(name_norm);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _to_int(v) -> Optional[int]:
+    try:
+        return int(str(v).strip())
+    except Exception:
+        return None
+
+
+def _row_params(pos: int, row: dict) -> tuple:
+    """
+    Rows are stored as-is: string FIELDS go to their text columns, while non-string values
+    (numbers, null), missing FIELDS and any other keys are kept in `extra` as JSON, so a row
+    reads back exactly as it was written.
+    """
+    r = row if isinstance(row, dict) else {}
+    values = [r[f] if isinstance(r.get(f), str) else "" for f in FIELDS]
+    extra = {k: v for k, v in r.items() if k not in FIELDS or not isinstance(v, str)}
+    absent = [f for f in FIELDS if f not in r]
+    if absent:
+        extra[ABSENT_KEY] = absent
+    return (
+        pos,
+        *values,
+        _to_int(r.get("month")),
+        _to_int(r.get("day")),
+        fold_name(r.get("first_name"), r.get("last_name")),
+        json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else None,
+    )
+
+
+def _row_from_db(rec: tuple) -> dict:
+    row = dict(zip(FIELDS, rec[:len(FIELDS)]))
+    extra = rec[len(FIELDS)]
+    if extra:
+        try:
+            extra = json.loads(extra)
+        except Exception:
+            extra = {}
+        for f in extra.pop(ABSENT_KEY, ()):
+            row.pop(f, None)
+        row.update(extra)
+    return row
+
+
+_SELECT = "SELECT " + ", ".join(FIELDS) + ", extra FROM people"
+_UPSERT = (
+    "INSERT OR REPLACE INTO people (pos, " + ", ".join(FIELDS) + ", month_i, day_i, name_norm, extra) "
+    "VALUES (" + ", ".join(["?"] * (len(FIELDS) + 5)) + ")"
+)
+
+
+class SqliteBackend:
+    name = "sqlite"
+    persistent = True
+    cache_ttl: Optional[float] = None  # freshness is checked with PRAGMA data_version (is_stale)
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or SQLITE_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        # Rows as last seen by this connection, used to turn full-list saves into per-row writes
+        self._known: Optional[List[tuple]] = None
+        self._seen_version: Optional[int] = None
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def is_stale(self) -> bool:
+        """
+        True when another connection/process has committed since our last load or save.
+        """
+        with self._lock:
+            return self._data_version() != self._seen_version
+
+    def load(self) -> Optional[dict]:
+        """
+        The dataset as a storage-engine document ({"schema_version", "meta", "data"}).
+        """
+        with self._lock, phase("sqlite-load"):
+            recs = self._conn.execute(_SELECT + " ORDER BY pos").fetchall()
+            meta = {k: json.loads(v) for k, v in self._conn.execute("SELECT key, value FROM meta")}
+            self._seen_version = self._data_version()
+            rows = [_row_from_db(r) for r in recs]
+            self._known = [_row_params(i, r) for i, r in enumerate(rows)]
+        if not rows and not meta:
+            return None
+        schema_version = meta.pop("schema_version", 1)
+        return {"schema_version": schema_version, "meta": meta, "data": rows}
+
+    def save(self, doc: dict) -> None:
+        rows = doc["data"]
+        new = [_row_params(i, r) for i, r in enumerate(rows)]
+        meta = dict(doc.get("meta") or {}, schema_version=doc.get("schema_version", 1))
+        with self._lock, phase("sqlite-save"):
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                # Conditional write: another process may have committed this version already
+                row = cur.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                stored, version = (json.loads(row[0]) if row else None), meta.get("version")
+                if isinstance(stored, int) and isinstance(version, int) and stored >= version:
+                    from ._store import VersionConflict
+                    raise VersionConflict(version - 1, stored)
+                if self._known is None or self._data_version() != self._seen_version:
+                    recs = cur.execute(_SELECT + " ORDER BY pos").fetchall()
+                    self._known = [_row_params(i, _row_from_db(r)) for i, r in enumerate(recs)]
+                self._apply(cur, self._known, new)
+                cur.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [(k, json.dumps(v)) for k, v in meta.items()],
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                self._known = None
+                raise
+            self._known = new
+            self._seen_version = self._data_version()
+
+    @staticmethod
+    def _apply(cur, old: List[tuple], new: List[tuple]) -> None:
+        """
+        Write only what changed. A single removal is a DELETE plus one position shift;
+        anything else is compared position by position.
+        """
+        if len(new) == len(old) - 1:
+            k = next((i for i in range(len(new)) if new[i][1:] != old[i][1:]), len(new))
+            if all(new[i][1:] == old[i + 1][1:] for i in range(k, len(new))):
+                cur.execute("DELETE FROM people WHERE pos = ?", (k,))
+                # Shift in two steps so the primary key never collides mid-update
+                cur.execute("UPDATE people SET pos = -pos - 1 WHERE pos > ?", (k,))
+                cur.execute("UPDATE people SET pos = -pos - 2 WHERE pos < 0")
+                return
+        changed = [n for i, n in enumerate(new) if i >= len(old) or old[i][1:] != n[1:]]
+        if changed:
+            cur.executemany(_UPSERT, changed)
+        if len(new) < len(old):
+            cur.execute("DELETE FROM people WHERE pos >= ?", (len(new),))
+
+    def find_by_months(self, months: List[int]) -> tuple:
+        """
+        (rows born in any of `months`, in dataset order, dataset version) through the
+        (month_i, day_i) index, read in one transaction so the rows match the version.
+        The version is None while the database is empty.
+        """
+        months = [int(m) for m in months]
+        with self._lock, phase("sqlite-find"):
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                recs = cur.execute(
+                    _SELECT + " WHERE month_i IN (" + ", ".join("?" * len(months)) + ") ORDER BY pos", months
+                ).fetchall()
+                row = cur.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            finally:
+                cur.execute("COMMIT")
+        return [_row_from_db(r) for r in recs], (json.loads(row[0]) if row else None)
+
+    def export_json(self) -> str:
+        """
+        JSON snapshot in the same format as the GitHub backup (GITHUB_JSON_FILE_PATH).
+        """
+        doc = self.load() or {}
+        return json.dumps(doc.get("data") or [], ensure_ascii=False, indent=2) + "\n"
+
+
+if __name__ == "__main__":
+    # python -m api._sqlite export [out.json]  |  python -m api._sqlite import <in.json>
+    import sys
+
+    args = sys.argv[1:]
+    backend = SqliteBackend()
+    if args[:1] == ["export"]:
+        text = backend.export_json()
+        if len(args) > 1:
+            with open(args[1], "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+    elif args[:1] == ["import"] and len(args) > 1:
+        with open(args[1], "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            sys.exit("input must be a JSON array of rows")
+        from ._store import wrap_document
+        current = backend.load() or {}
+        backend.save(wrap_document(data, int((current.get("meta") or {}).get("version") or 0) + 1))
+        print(f"imported {len(data)} rows into {backend.path}")
+    else:
+        sys.exit("usage: python -m api._sqlite export [out.json] | import <in.json>")
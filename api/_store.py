@@ -0,0 +1,1007 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from ._metrics import cache_hit, cache_miss, cache_stale
+from ._timing import phase
+
+# Storage engine shared by every handler.
+# One backend is selected per process (Blob, SQLite, local file or memory) and all reads go
+# through a single process-wide cache with a monotonic version counter, so handlers
+# no longer carry their own copies of the store/bootstrap/backfill logic.
+#
+#   STORE_BACKEND            "blob" | "blob-shards" | "sqlite" | "file" | "memory"
+#                            (default: blob when configured, else file)
+#   STORE_CACHE_TTL_SECONDS  how long Blob reads are served from the cache (default 5)
+#   STORE_STALE_SECONDS      after the TTL, how long stale rows may still be served to readers that
+#                            opt in (stale_ok) while one background refresh runs (default 30, 0 = off)
+#   STORE_FILE_PATH          JSON file for the file backend (default: birthdays.json in repo root or CWD)
+#   STORE_WRITE_BEHIND       "1" to acknowledge Blob mutations once they are in the KV journal
+#                            (_journal.py) and write them to Blob in batches (opt-in, default off;
+#                            ignored unless KV is configured)
+#   STORE_FLUSH_INTERVAL_SECONDS  how long write-behind mutations are coalesced before a flush (default 2)
+#   STORE_CHANGES_MAX        change-feed entries kept in the document meta (default 100, 0 = off)
+#   STORE_CHANGES_MAX_ROWS   larger mutations (imports, syncs) are recorded as a reset marker
+#                            instead of their rows (default 50)
+#   STORE_LOCK_SECONDS       upper bound on how long the shared write lock is held if an instance
+#                            dies mid-write (default 30)
+#   STORE_LOCK_WAIT_SECONDS  how long a write waits for the shared write lock before failing (default 10)
+STORE_BACKEND = (os.getenv("STORE_BACKEND") or "").strip().lower()
+STORE_CACHE_TTL_SECONDS = float(os.getenv("STORE_CACHE_TTL_SECONDS") or "5")
+STORE_STALE_SECONDS = float(os.getenv("STORE_STALE_SECONDS") or "30")
+STORE_FILE_PATH = (os.getenv("STORE_FILE_PATH") or "").strip()
+STORE_WRITE_BEHIND = (os.getenv("STORE_WRITE_BEHIND") or "").strip().lower() in ("1", "true", "yes", "on")
+STORE_FLUSH_INTERVAL_SECONDS = float(os.getenv("STORE_FLUSH_INTERVAL_SECONDS") or "2")
+STORE_CHANGES_MAX = int(os.getenv("STORE_CHANGES_MAX") or "100")
+STORE_CHANGES_MAX_ROWS = int(os.getenv("STORE_CHANGES_MAX_ROWS") or "50")
+STORE_LOCK_SECONDS = int(os.getenv("STORE_LOCK_SECONDS") or "30")
+STORE_LOCK_WAIT_SECONDS = float(os.getenv("STORE_LOCK_WAIT_SECONDS") or "10")
+
+LOCK_KEY_PREFIX = "store:lock:"   # store:lock:<backend> -> token of the instance writing
+UPDATE_ATTEMPTS = 3               # store_update() retries after a conditional-write conflict
+
+
+class StoreError(RuntimeError):
+    pass
+
+
+class VersionConflict(StoreError):
+    def __init__(self, expected: int, actual: int):
+        super().__init__(f"Dataset version is {actual}, expected {expected}")
+        self.expected = expected
+        self.actual = actual
+
+
+def gen_id_from_dt(dt: datetime) -> str:
+    iso = dt.replace(tzinfo=timezone.utc).isoformat()
+    return hashlib.sha1(f"birthapp|{iso}".encode("utf-8")).hexdigest()
+
+
+# Dataset document
+#
+# Persistent backends store a schema-versioned envelope:
+#   {"schema_version": 2, "meta": {"version": N, "updated_at": "...", "count": n}, "data": [rows]}
+# A bare JSON array (the GitHub snapshot format, and what older deployments wrote to Blob)
+# is read as schema 1: ids are backfilled in memory with deterministic values so reads
+# never write, and the document is upgraded by migrate_dataset() or the next mutation.
+SCHEMA_VERSION = 2
+
+
+def unwrap_document(doc) -> Optional[tuple]:
+    """
+    (rows, meta) for a stored document, meta is None for legacy arrays; None if invalid.
+    """
+    if isinstance(doc, list):
+        return doc, None
+    if isinstance(doc, dict) and isinstance(doc.get("data"), list):
+        meta = doc.get("meta") if isinstance(doc.get("meta"), dict) else {}
+        if int(doc.get("schema_version") or 0) >= SCHEMA_VERSION:
+            return doc["data"], meta
+        return doc["data"], None
+    return None
+
+
+def wrap_document(rows: list, version: int, changes: Optional[list] = None) -> dict:
+    meta = {
+        "version": version,
+        "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "count": len(rows),
+    }
+    if changes:
+        meta["changes"] = changes
+    return {"schema_version": SCHEMA_VERSION, "meta": meta, "data": rows}
+
+
+# Change feed
+#
+# Every write appends one entry to a bounded ring in meta.changes, so the feed travels with
+# the dataset through every backend:
+#   {"v": N, "upserts": [rows], "removed": [ids]}   the mutation that produced version N
+#   {"v": N, "reset": true}                          too large to record; readers must resync
+# Entries use the journal's delta format and are applied with the same upsert-by-id rules.
+
+def _record_change(changes, version: int, upserts: list, removed: list) -> Optional[list]:
+    """
+    The ring with an entry for `version` appended and trimmed to STORE_CHANGES_MAX.
+    """
+    if STORE_CHANGES_MAX <= 0:
+        return None
+    if len(upserts) + len(removed) > STORE_CHANGES_MAX_ROWS:
+        entry = {"v": version, "reset": True}
+    else:
+        entry = {"v": version, "upserts": upserts, "removed": removed}
+    ring = [c for c in (changes or []) if isinstance(c, dict) and isinstance(c.get("v"), int) and c["v"] < version]
+    ring.append(entry)
+    return ring[-STORE_CHANGES_MAX:]
+
+
+def legacy_row_id(row: dict, ordinal: int) -> str:
+    """
+    Deterministic id for a schema-1 row without one (same value on every read until migrated).
+    """
+    key = "|".join(str(row.get(f) or "").strip() for f in ("first_name", "last_name", "day", "month", "year"))
+    return hashlib.sha1(f"birthapp|legacy|{ordinal}|{key}".encode("utf-8")).hexdigest()
+
+
+def rows_digest(rows: list) -> str:
+    """
+    Content hash of a row list (key order and whitespace do not matter).
+    """
+    text = json.dumps(rows, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _row_hash(row) -> str:
+    text = json.dumps(row, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def diff_rows(old: list, new: list) -> dict:
+    """
+    Keyed diff by id, linear in both lists: {"added": [rows], "removed": [ids], "changed": [rows],
+    "unchanged": n}. Rows are compared by content hash; "added"/"changed" hold the rows from `new`.
+    """
+    old_hashes = {}
+    for r in old:
+        if isinstance(r, dict) and r.get("id"):
+            old_hashes[r["id"]] = _row_hash(r)
+    added, changed, seen = [], [], set()
+    unchanged = 0
+    for r in new:
+        if not isinstance(r, dict) or not r.get("id") or r["id"] in seen:
+            continue
+        seen.add(r["id"])
+        h = old_hashes.get(r["id"])
+        if h is None:
+            added.append(r)
+        elif h != _row_hash(r):
+            changed.append(r)
+        else:
+            unchanged += 1
+    removed = [i for i in old_hashes if i not in seen]
+    return {"added": added, "removed": removed, "changed": changed, "unchanged": unchanged}
+
+
+# Backends
+#
+# load() returns the stored document (envelope dict or legacy array), or None when the
+# dataset is missing/empty. save(doc) persists an envelope; a backend that can write
+# conditionally raises VersionConflict when the stored version is already doc's or newer.
+# `persistent` tells whether writes survive the process; `cache_ttl` is how long a load may
+# be reused (None = until the next write, or until the optional is_stale() hook reports an
+# outside change).
+# The SQLite and month-sharded Blob backends live in _sqlite.py and _shards.py and are
+# imported only when selected.
+
+class MemoryBackend:
+    name = "memory"
+    persistent = False
+    cache_ttl: Optional[float] = None
+
+    def __init__(self, doc=None):
+        self.doc = doc
+
+    def load(self):
+        return self.doc
+
+    def save(self, doc: dict) -> None:
+        self.doc = dict(doc, data=list(doc["data"]))
+
+
+class FileBackend:
+    """
+    Local birthdays.json (repo root or CWD, or STORE_FILE_PATH) for dev/unconfigured environments.
+    The file is read and parsed only when its (mtime, size, inode) signature changes;
+    the engine polls is_stale(), so repeat reads cost one stat() and edits on disk are picked up.
+    Read-only: edits are kept in the process cache (until the file changes) and never written
+    to the snapshot file.
+    """
+    name = "file"
+    persistent = False
+    cache_ttl: Optional[float] = None
+
+    def __init__(self, candidates: Optional[List[str]] = None):
+        if candidates is None:
+            candidates = []
+            if STORE_FILE_PATH:
+                candidates.append(STORE_FILE_PATH)
+            try:
+                here = os.path.dirname(__file__)
+                candidates.append(os.path.normpath(os.path.join(here, "..", "birthdays.json")))
+            except Exception:
+                pass
+            candidates.append("birthdays.json")
+        self.candidates = candidates
+        self._sig: Optional[tuple] = None
+        self._rows: Optional[list] = None
+
+    def _signature(self) -> Optional[tuple]:
+        for p in self.candidates:
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            return (p, st.st_mtime_ns, st.st_size, st.st_ino)
+        return None
+
+    def is_stale(self) -> bool:
+        return self._signature() != self._sig
+
+    def load(self):
+        sig = self._signature()
+        if sig is not None and sig == self._sig:
+            cache_hit("file")
+            if isinstance(self._rows, list):
+                return list(self._rows)
+            return self._rows
+        cache_miss("file")
+        self._sig, self._rows = sig, None
+        if sig is None or sig[2] == 0:
+            return None
+        try:
+            with open(sig[0], "rb") as f:
+                data = f.read()
+            with phase("file-parse"):
+                parsed = json.loads(data)
+        except Exception:
+            return None
+        if unwrap_document(parsed) is None:
+            return None
+        self._rows = parsed
+        return parsed if isinstance(parsed, dict) else list(parsed)
+
+    def save(self, doc: dict) -> None:
+        return
+
+
+class BlobBackend:
+    name = "blob"
+    persistent = True
+    cache_ttl: Optional[float] = STORE_CACHE_TTL_SECONDS
+
+    def load(self):
+        from ._blob import get_json as blob_get_json
+        data = blob_get_json(default=None)
+        return data if unwrap_document(data) is not None else None
+
+    def save(self, doc: dict) -> None:
+        from ._blob import set_json as blob_set_json
+        blob_set_json(doc)
+
+
+def _select_backend():
+    from ._blob import is_blob_configured
+    choice = STORE_BACKEND
+    if not choice:
+        choice = "blob" if is_blob_configured() else "file"
+    if choice == "blob":
+        return BlobBackend()
+    if choice == "blob-shards":
+        from ._shards import ShardedBlobBackend
+        return ShardedBlobBackend()
+    if choice == "file":
+        return FileBackend()
+    if choice == "memory":
+        return MemoryBackend()
+    if choice == "sqlite":
+        from ._sqlite import SqliteBackend
+        return SqliteBackend()
+    raise StoreError(f"Unknown STORE_BACKEND: {choice}")
+
+
+# Process-wide cache
+
+_LOCK = threading.Lock()
+_BACKEND = None
+_ROWS: Optional[list] = None     # last rows loaded or written
+_META: dict = {}                 # meta of the cached document ({} for legacy arrays)
+_LOADED_AT = 0.0                 # monotonic time of the last load/write
+_VERSION = 0                     # dataset version (meta.version, or bumped locally for legacy data)
+_WRITES = 0                      # writes in this process; a background refresh started before a write is dropped
+_REFRESHING = False              # a background refresh is in flight (single-flight)
+_LOADING = None                  # the backend load in flight (_Flight); concurrent misses wait for it
+_JOURNAL = None                  # write-behind journal, created on first use
+_FLUSH_TIMER = None              # pending write-behind flush
+_FLUSH_LOCK = threading.Lock()   # one flush at a time
+_SUBSCRIBERS: list = []          # callbacks notified with a keyed diff whenever the rows change
+_UPDATE_LOCK = threading.Lock()  # serializes this process's writes (the KV lock serializes instances)
+_CHANGED = threading.Condition()  # notified whenever the cached version changes (long-poll waiters)
+
+
+def get_backend():
+    global _BACKEND
+    if _BACKEND is None:
+        with _LOCK:
+            if _BACKEND is None:
+                _BACKEND = _select_backend()
+    return _BACKEND
+
+
+def store_version() -> int:
+    return _VERSION
+
+
+def store_cached_version(stale_ok: bool = False) -> Optional[int]:
+    """
+    The dataset version when the cache is fresh (or servable stale with stale_ok, refreshed
+    in the background), without reading rows; None when it has to be reloaded first.
+    """
+    backend = get_backend()
+    if _fresh(backend):
+        return _VERSION
+    if stale_ok and _servable_stale(backend):
+        _refresh_in_background(backend)
+        return _VERSION
+    return None
+
+
+def store_meta() -> dict:
+    return dict(_META, version=_VERSION)
+
+
+def store_changes_since(since: int) -> Optional[list]:
+    """
+    Change-feed entries after version `since`, oldest first ([] when current), or None when
+    they are no longer in the ring (or include a reset) and the client must refetch everything.
+    """
+    store_get_rows(stale_ok=True)
+    if since > _VERSION:
+        # The client saw a newer version on another instance: reload once before giving up
+        store_invalidate()
+        store_get_rows()
+    with _LOCK:
+        version, changes = _VERSION, list(_META.get("changes") or [])
+    if since == version:
+        return []
+    if since > version:
+        return None
+    entries = [c for c in changes if isinstance(c, dict) and isinstance(c.get("v"), int) and c["v"] > since]
+    expected = list(range(since + 1, version + 1))
+    if [c["v"] for c in entries] != expected or any(c.get("reset") for c in entries):
+        return None
+    return entries
+
+
+def store_wait(since: int, timeout: float) -> bool:
+    """
+    Block until the cached version differs from `since` or `timeout` seconds pass.
+    Only wakes for changes this process sees (local writes and reloads); callers that need
+    other instances' writes re-read through store_get_rows() between short waits.
+    """
+    deadline = time.monotonic() + timeout
+    with _CHANGED:
+        while _VERSION == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _CHANGED.wait(remaining)
+    return True
+
+
+def store_invalidate() -> None:
+    """
+    Force the next read to go to the backend.
+    """
+    global _LOADED_AT
+    with _LOCK:
+        _LOADED_AT = 0.0
+
+
+def _fresh(backend) -> bool:
+    if _ROWS is None:
+        return False
+    if backend.cache_ttl is None:
+        is_stale = getattr(backend, "is_stale", None)
+        return not (is_stale and is_stale())
+    return (time.monotonic() - _LOADED_AT) < backend.cache_ttl
+
+
+def _servable_stale(backend) -> bool:
+    """
+    True when the cached rows are past the TTL but still inside the stale-while-revalidate window.
+    Only TTL-cached (remote) backends qualify; local backends are cheap to reload.
+    """
+    if _ROWS is None or backend.cache_ttl is None or STORE_STALE_SECONDS <= 0:
+        return False
+    return (time.monotonic() - _LOADED_AT) < backend.cache_ttl + STORE_STALE_SECONDS
+
+
+class _Flight:
+    """
+    One backend load shared by every caller that missed the cache while it ran.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.rows: Optional[list] = None
+        self.error: Optional[BaseException] = None
+
+
+def _reload(backend) -> list:
+    """
+    Load the rows from the backend into the cache (bootstrapping an empty persistent store)
+    and return them. Single-flight: the first caller loads, callers arriving meanwhile wait
+    for that load and share its rows, or its error, instead of issuing their own read.
+    """
+    global _LOADING
+    with _LOCK:
+        flight, leader = _LOADING, _LOADING is None
+        if leader:
+            flight = _LOADING = _Flight()
+            writes = _WRITES
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return list(flight.rows)
+    try:
+        loaded = _load_document(backend)
+        if loaded is None:
+            meta = None
+            # Attempt automatic bootstrap from GitHub JSON if the store is empty/missing
+            rows = bootstrap_from_github_if_empty() if backend.persistent else []
+        else:
+            rows, meta = loaded
+        with _LOCK:
+            # A local write since the load started is newer than what was read: keep it
+            superseded = _WRITES != writes
+            if superseded:
+                rows = list(_ROWS or [])
+        if not superseded:
+            _set_cache(rows, meta)
+        flight.rows = rows
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _LOCK:
+            _LOADING = None
+        flight.done.set()
+    return list(rows)
+
+
+def _refresh(backend) -> None:
+    global _REFRESHING
+    try:
+        _reload(backend)
+    except Exception:
+        pass  # keep serving the cached rows; the next stale read retries
+    finally:
+        with _LOCK:
+            _REFRESHING = False
+
+
+def _refresh_in_background(backend) -> None:
+    global _REFRESHING
+    with _LOCK:
+        if _REFRESHING:
+            return
+        _REFRESHING = True
+    threading.Thread(target=_refresh, args=(backend,), name="store-refresh", daemon=True).start()
+
+
+def _backfill_ids(rows: list, legacy: bool = False) -> int:
+    """
+    Assign ids to rows that lack one. Returns how many were assigned.
+    Legacy backfill is deterministic (see legacy_row_id); new rows get time-based ids.
+    """
+    base = datetime.now(timezone.utc)
+    idx = 0
+    for ordinal, r in enumerate(rows):
+        try:
+            if isinstance(r, dict) and not (r.get("id") or "").strip():
+                r["id"] = legacy_row_id(r, ordinal) if legacy else gen_id_from_dt(base + timedelta(minutes=idx))
+                idx += 1
+        except Exception:
+            pass
+    return idx
+
+
+def _load_document(backend, replay: bool = True) -> Optional[tuple]:
+    """
+    (rows, meta) from the backend, with legacy arrays backfilled in memory (no write).
+    In write-behind mode, journaled mutations that are not flushed yet are applied on top.
+    """
+    with phase("store-load"):
+        doc = backend.load()
+    unwrapped = unwrap_document(doc) if doc is not None else None
+    entries = _journal().entries() if replay and _write_behind(backend) else []
+    if unwrapped is None and not entries:
+        return None
+    rows, meta = unwrapped if unwrapped is not None else ([], None)
+    if meta is None:
+        # Schema 1: one O(n) pass until the dataset is migrated
+        _backfill_ids(rows, legacy=True)
+    if entries:
+        rows, meta, applied = _replay(rows, meta, entries)
+        if applied:
+            # Left over by an instance that stopped before flushing (or still waiting): flush soon
+            _schedule_flush()
+    return rows, meta
+
+
+def _replay(rows: list, meta: Optional[dict], entries: list) -> tuple:
+    """
+    (rows, meta, applied): journal entries newer than meta's version applied on top, each one
+    counting as one version, as if it had been written through.
+    """
+    version = (meta or {}).get("version") or 0
+    changes = (meta or {}).get("changes")
+    applied = 0
+    for e in entries:
+        if isinstance(e.get("v"), int) and e["v"] <= version:
+            continue  # already in the document (flushed, or the journal's version marker)
+        rows = _apply_delta(rows, e.get("upserts") or [], e.get("removed") or [])
+        version += 1
+        changes = _record_change(changes, version, e.get("upserts") or [], e.get("removed") or [])
+        applied += 1
+    if not applied:
+        return rows, meta, 0
+    meta = dict(meta or {}, version=version)
+    if changes:
+        meta["changes"] = changes
+    return rows, meta, applied
+
+
+def _apply_delta(rows: list, upserts: list, remove_ids=()) -> list:
+    """
+    Rows in `upserts` replace the row with the same id in place or are appended;
+    rows whose id is in `remove_ids` are dropped. Returns a new list.
+    """
+    rows = list(rows)
+    positions = {r.get("id"): i for i, r in enumerate(rows) if isinstance(r, dict)}
+    for r in upserts:
+        i = positions.get(r.get("id"))
+        if i is None:
+            positions[r.get("id")] = len(rows)
+            rows.append(r)
+        else:
+            rows[i] = r
+    if remove_ids:
+        drop = set(remove_ids)
+        rows = [r for r in rows if not (isinstance(r, dict) and r.get("id") in drop)]
+    return rows
+
+
+# Write-behind
+
+def _write_behind(backend) -> bool:
+    # Only remote, TTL-cached backends (Blob) benefit; local backends already write per row.
+    # Without a durable shared journal an acknowledged write could be lost, so writes stay synchronous.
+    if not (STORE_WRITE_BEHIND and backend.persistent and backend.cache_ttl is not None):
+        return False
+    from ._journal import journal_available
+    return journal_available()
+
+
+def _journal():
+    global _JOURNAL
+    if _JOURNAL is None:
+        from ._journal import get_journal
+        with _LOCK:
+            if _JOURNAL is None:
+                _JOURNAL = get_journal()
+                import atexit
+                atexit.register(flush_pending)
+    return _JOURNAL
+
+
+def _schedule_flush() -> None:
+    global _FLUSH_TIMER
+    with _LOCK:
+        if _FLUSH_TIMER is not None:
+            return
+        _FLUSH_TIMER = threading.Timer(STORE_FLUSH_INTERVAL_SECONDS, _flush_from_timer)
+        _FLUSH_TIMER.daemon = True
+        _FLUSH_TIMER.start()
+
+
+def _flush_from_timer() -> None:
+    try:
+        flush_pending()
+    except Exception:
+        _schedule_flush()  # backend unavailable: keep the journal and retry later
+
+
+def flush_pending() -> int:
+    """
+    Write every journaled mutation to the backend in one save and trim the journal.
+    Returns the number of journal entries flushed (0 when write-behind is off or idle).
+    """
+    global _FLUSH_TIMER
+    backend = get_backend()
+    if not _write_behind(backend):
+        return 0
+    # Flushes from different instances are serialized by the shared lock; appends do not take it
+    with _FLUSH_LOCK, _write_lock(backend, shared=True):
+        with _LOCK:
+            _FLUSH_TIMER = None
+            writes = _WRITES
+        entries = _journal().entries()
+        if not entries:
+            return 0
+        loaded = _load_document(backend, replay=False)
+        rows, meta = loaded if loaded is not None else ([], None)
+        # Every entry carries the version it was acknowledged as, so the result is that version
+        rows, meta, applied = _replay(rows, meta, entries)
+        if applied:
+            doc = wrap_document(rows, meta["version"], meta.get("changes"))
+            with phase("store-flush"):
+                backend.save(doc)
+            if _WRITES == writes:
+                _set_cache(rows, doc["meta"])
+        # Keep the newest entry: it tells writers which version the journal is at
+        _journal().clear(len(entries) - 1)
+        return applied
+
+
+def bootstrap_from_github_if_empty() -> list:
+    """
+    If the persistent backend is empty or invalid, read the JSON snapshot from the
+    repository (GITHUB_JSON_FILE_PATH) and write it into the backend.
+    Returns the rows read (possibly empty).
+    """
+    try:
+        from ._github import fetch_raw_json, GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH
+        raw = fetch_raw_json(GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH)
+    except Exception:
+        return []
+    if not raw:
+        return []
+    try:
+        unwrapped = unwrap_document(json.loads(raw))
+    except Exception:
+        return []
+    if unwrapped is None:
+        return []
+    parsed = unwrapped[0]
+    _backfill_ids(parsed, legacy=True)
+    backend = get_backend()
+    try:
+        with _write_lock(backend, shared=True):
+            # Another instance may have bootstrapped (or written) while we fetched the snapshot
+            loaded = _load_document(backend, replay=False)
+            if loaded is not None:
+                return loaded[0]
+            backend.save(wrap_document(parsed, 1))
+    except Exception:
+        pass
+    return parsed
+
+
+def _set_cache(rows: list, meta: Optional[dict], write: bool = False) -> None:
+    global _ROWS, _META, _LOADED_AT, _VERSION, _WRITES
+    with _LOCK:
+        if write:
+            _WRITES += 1
+        old, old_version = _ROWS, _VERSION
+        if meta and isinstance(meta.get("version"), int):
+            _VERSION = meta["version"]
+        elif _ROWS is None or _ROWS != rows:
+            _VERSION += 1
+        _ROWS = rows
+        _META = dict(meta or {})
+        _LOADED_AT = time.monotonic()
+        version = _VERSION
+        subscribers = list(_SUBSCRIBERS) if (old is None or version != old_version) else []
+    if version != old_version:
+        with _CHANGED:
+            _CHANGED.notify_all()
+    if subscribers:
+        diff = diff_rows(old or [], rows)
+        for fn in subscribers:
+            try:
+                fn(diff, version)
+            except Exception:
+                pass
+
+
+def store_subscribe(fn) -> None:
+    """
+    Call fn(diff, version) whenever the cached rows change (local writes and reloads that
+    see another instance's writes). `diff` is diff_rows(old, new); the first load reports
+    every row as added.
+    """
+    with _LOCK:
+        if fn not in _SUBSCRIBERS:
+            _SUBSCRIBERS.append(fn)
+
+
+def store_get_rows(stale_ok: bool = False) -> list:
+    """
+    Current rows from the cache, reloading from the backend when stale. Never writes,
+    except the one-time bootstrap from GitHub when the persistent store is empty.
+    Returns a shallow copy so callers can append/pop before store_set_rows().
+    With stale_ok=True (read-only callers), rows up to STORE_STALE_SECONDS past the TTL are
+    returned immediately and refreshed on a background thread instead. Past that window,
+    concurrent callers share a single backend load (see _reload).
+    """
+    backend = get_backend()
+    if _fresh(backend):
+        cache_hit("store")
+        return list(_ROWS)
+    if stale_ok and _servable_stale(backend):
+        cache_stale("store")
+        _refresh_in_background(backend)
+        return list(_ROWS)
+    cache_miss("store")
+    try:
+        return _reload(backend)
+    except Exception:
+        # Backend read failed (e.g. Blob 405/403 or domain/permission issues):
+        # serve the last known rows, or an empty list to keep the UI functional.
+        return list(_ROWS) if isinstance(_ROWS, list) else []
+
+
+def store_snapshot(stale_ok: bool = False) -> tuple:
+    """
+    (rows, version) read together, for clients that follow up with the change feed.
+    """
+    store_get_rows(stale_ok=stale_ok)
+    with _LOCK:
+        return list(_ROWS or []), _VERSION
+
+
+def _birth_month(row) -> Optional[int]:
+    try:
+        return int(str(row.get("month")).strip())
+    except Exception:
+        return None
+
+
+def store_find_by_months(months, stale_ok: bool = False) -> tuple:
+    """
+    (rows born in any of `months`, version) read together. Served from the cache while it is
+    fresh (or servable stale with stale_ok); otherwise a backend with a partial read
+    (find_by_months: SQLite's month index, or only those months' Blob shards) answers without
+    loading every row, and any other backend falls back to a full snapshot.
+    """
+    wanted = {int(m) for m in months}
+    backend = get_backend()
+    find = getattr(backend, "find_by_months", None)
+    cached = _fresh(backend) or (stale_ok and _servable_stale(backend))
+    if find is not None and wanted and not cached and not _write_behind(backend):
+        try:
+            rows, version = find(sorted(wanted))
+            if isinstance(version, int):
+                return rows, version
+        except Exception:
+            pass  # fall back to the full read below
+    rows, version = store_snapshot(stale_ok=stale_ok)
+    return [r for r in rows if isinstance(r, dict) and _birth_month(r) in wanted], version
+
+
+def store_load_rows() -> list:
+    """
+    Rows as stored right now, bypassing the cache, with write-behind mutations that are not
+    flushed yet applied. Never bootstraps: an empty store gives [].
+    """
+    loaded = _load_document(get_backend())
+    return loaded[0] if loaded else []
+
+
+def store_document(stale_ok: bool = False) -> tuple:
+    """
+    (rows, meta) read together; meta carries the version (as store_meta()).
+    """
+    store_get_rows(stale_ok=stale_ok)
+    with _LOCK:
+        return list(_ROWS or []), dict(_META, version=_VERSION)
+
+
+# Writes
+#
+# Every write runs under the write lock: _UPDATE_LOCK within the process and, for backends
+# shared by all instances (Blob), a KV lock (LOCK_KEY_PREFIX) across instances. Under the lock
+# the stored document is read again and the new version is the stored version + 1, so two
+# instances never publish the same version with different contents, and read-modify-write
+# callers (store_update) never overwrite each other's edits. Without KV configured the
+# development fallback keeps the lock per process.
+# In write-behind mode writes do not take the shared lock: the next document is the cached one
+# plus the journal entries after it, and the journal append itself is conditional on that
+# version (see _journal.py), so acknowledging a mutation costs two KV calls and no Blob traffic.
+
+def _shared(backend) -> bool:
+    # Remote, TTL-cached backends are written by every instance
+    return backend.persistent and backend.cache_ttl is not None
+
+
+def _acquire_shared_lock(backend) -> str:
+    from ._kv import kv_set_raw
+    token = os.urandom(16).hex()
+    key = LOCK_KEY_PREFIX + backend.name
+    deadline = time.monotonic() + STORE_LOCK_WAIT_SECONDS
+    delay = 0.05
+    with phase("store-lock"):
+        try:
+            while not kv_set_raw(key, token, nx=True, ex=STORE_LOCK_SECONDS):
+                if time.monotonic() >= deadline:
+                    raise StoreError("Timed out waiting for the dataset write lock")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        except StoreError:
+            raise
+        except Exception as e:
+            raise StoreError(f"Dataset write lock unavailable: {e}") from e
+    return token
+
+
+def _release_shared_lock(backend, token: str) -> None:
+    from ._kv import kv_del_if_equal
+    try:
+        kv_del_if_equal(LOCK_KEY_PREFIX + backend.name, token)
+    except Exception:
+        pass  # expires after STORE_LOCK_SECONDS
+
+
+@contextmanager
+def _write_lock(backend, shared: Optional[bool] = None):
+    if shared is None:
+        shared = not _write_behind(backend)
+    with _UPDATE_LOCK:
+        token = _acquire_shared_lock(backend) if shared and _shared(backend) else None
+        try:
+            yield
+        finally:
+            if token is not None:
+                _release_shared_lock(backend, token)
+
+
+def _latest(backend) -> tuple:
+    """
+    (rows, version, changes) to base a write on; call under the write lock. Persistent backends
+    are read again (SQLite only when another connection committed), so the version comes from
+    what is stored now rather than from this instance's cache. Empty and legacy (schema 1)
+    datasets are version 0. In write-behind mode the journal tail brings the cached document up
+    to date instead, unless it does not reach back to the cached version.
+    """
+    if _write_behind(backend):
+        base = _from_journal()
+        if base is not None:
+            return base
+    if backend.persistent and not (backend.cache_ttl is None and _fresh(backend)):
+        loaded = _load_document(backend)
+        if loaded is None:
+            return [], 0, []
+        rows, meta = loaded
+        _set_cache(rows, meta)  # readers and subscribers (duplicate index) see the latest rows
+        meta = meta or {}
+        version = meta.get("version") if isinstance(meta.get("version"), int) else 0
+        return list(rows), version, list(meta.get("changes") or [])
+    store_get_rows()
+    with _LOCK:
+        return list(_ROWS or []), _VERSION, list(_META.get("changes") or [])
+
+
+def _from_journal() -> Optional[tuple]:
+    """
+    (rows, version, changes) from the cached document plus the journal entries after its
+    version, or None when there is no cache, the journal is empty, or there is a gap between
+    the two (another instance's writes were flushed and trimmed since this cache was loaded).
+    """
+    with _LOCK:
+        if _ROWS is None:
+            return None
+        rows, meta, version = list(_ROWS), dict(_META, version=_VERSION), _VERSION
+    with phase("journal-read"):
+        entries = _journal().entries()
+    if not entries:
+        return None
+    tail = [e for e in entries if not (isinstance(e.get("v"), int) and e["v"] <= version)]
+    if tail:
+        if [e.get("v") for e in tail] != list(range(version + 1, version + 1 + len(tail))):
+            return None
+        rows, meta, _ = _replay(rows, meta, tail)
+        _set_cache(rows, meta)
+    elif entries[-1].get("v") != version:
+        return None
+    return list(rows), meta["version"], list(meta.get("changes") or [])
+
+
+def _commit(backend, base: tuple, rows: list, strict: bool) -> int:
+    """
+    Write `rows` as the version after `base` (from _latest) and update the cache.
+    """
+    base_rows, base_version, changes = base
+    diff = diff_rows(base_rows, rows)
+    upserts = diff["added"] + diff["changed"]
+    version = base_version + 1
+    doc = wrap_document(rows, version, _record_change(changes, version, upserts, diff["removed"]))
+    if _write_behind(backend):
+        # Journal the keyed delta and acknowledge; the flusher coalesces everything pending
+        # into one backend write per interval. Every write is one entry (even an empty one),
+        # so replaying the journal reproduces the acknowledged versions. No synchronous
+        # fallback: a version published outside the journal would be invisible to writers.
+        from ._journal import new_entry
+        try:
+            with phase("journal-append"):
+                appended, actual = _journal().append(new_entry(version, upserts, diff["removed"]), base_version)
+        except Exception as e:
+            raise StoreError(f"Write-behind journal unavailable: {e}") from e
+        if not appended:
+            raise VersionConflict(base_version, actual)
+        _schedule_flush()
+        _set_cache(rows, doc["meta"], write=True)
+        return version
+    try:
+        with phase("store-save"):
+            backend.save(doc)
+    except VersionConflict:
+        raise
+    except Exception as e:
+        if strict:
+            raise StoreError(str(e)) from e
+    _set_cache(rows, doc["meta"], write=True)
+    return version
+
+
+def store_set_rows(rows: list, strict: bool = False) -> int:
+    """
+    Replace the dataset with `rows` (imports, syncs, migrations) and update the cache.
+    Returns the new version. Write errors are swallowed (the cache still reflects the edit)
+    unless strict=True, so the UI keeps working in dev/misconfigured environments.
+    Edits derived from the current rows go through store_update() instead.
+    """
+    rows = list(rows)
+    return store_update(lambda _: rows, strict=strict)[1]
+
+
+def store_update(fn, expected_version: Optional[int] = None, strict: bool = False) -> tuple:
+    """
+    Read-modify-write against the latest stored rows: under the write lock the backend is
+    re-read (bypassing the cache; in write-behind mode the journal tail is read instead), the version is checked against expected_version
+    (VersionConflict on mismatch) and fn(rows) -> new rows is written. fn may raise to abort.
+    Returns (new rows, new version).
+    """
+    backend = get_backend()
+    with _write_lock(backend):
+        for attempt in range(UPDATE_ATTEMPTS):
+            base = _latest(backend)
+            if expected_version is not None and expected_version != base[1]:
+                raise VersionConflict(expected_version, base[1])
+            rows = list(fn(list(base[0])))
+            _backfill_ids(rows)
+            try:
+                return rows, _commit(backend, base, rows, strict)
+            except VersionConflict:
+                # A conditional write (SQLite, write-behind journal) lost to another process:
+                # re-read and run fn again
+                if expected_version is not None or attempt == UPDATE_ATTEMPTS - 1:
+                    raise
+                store_invalidate()
+
+
+def store_apply_delta(upserts: list, remove_ids=(), strict: bool = False) -> tuple:
+    """
+    Apply a keyed delta on top of the current backend contents (read fresh, bypassing the cache):
+    rows in `upserts` replace the row with the same id in place or are appended, and rows whose
+    id is in `remove_ids` are dropped. Returns (new rows, new version).
+    """
+    return store_update(lambda rows: _apply_delta(rows, upserts, remove_ids), strict=strict)
+
+
+def migrate_dataset() -> dict:
+    """
+    One-time upgrade of a legacy (schema 1) dataset: backfill ids and store the envelope.
+    Safe to call repeatedly; reads the backend directly, bypassing the cache.
+    """
+    backend = get_backend()
+    with phase("store-load"):
+        doc = backend.load()
+    unwrapped = unwrap_document(doc) if doc is not None else None
+    if unwrapped is None:
+        return {"migrated": False, "reason": "empty", "schema_version": SCHEMA_VERSION}
+    rows, meta = unwrapped
+    if meta is not None:
+        _set_cache(rows, meta)
+        return {"migrated": False, "reason": "current", "schema_version": SCHEMA_VERSION, "version": _VERSION}
+    if not backend.persistent:
+        return {"migrated": False, "reason": "backend is not persistent", "schema_version": 1}
+    backfilled = _backfill_ids(rows, legacy=True)
+    version = store_set_rows(rows, strict=True)
+    return {"migrated": True, "rows": len(rows), "schema_version": SCHEMA_VERSION, "version": version, "ids_backfilled": backfilled}
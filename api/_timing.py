@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from . import _metrics
+
+# Per-request phase timers.
+# Handlers call begin() at the start of a request, wrap interesting work in
+# `with phase("name"):` and the response helpers emit the collected timings as a
+# `Server-Timing` header (visible in browser devtools). When TIMING_LOG is set,
+# end() also prints one structured JSON line per request for log aggregation.
+# Request totals and outbound phases are also fed into the _metrics registry.
+TIMING_LOG = (os.getenv("TIMING_LOG") or "").strip().lower() in ("1", "true", "yes", "on")
+
+_local = threading.local()
+
+
+class RequestTimer:
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        # name -> [total_ms, count]; dicts keep insertion order, so phases are reported in first-use order
+        self.phases: Dict[str, List[float]] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        entry = self.phases.get(name)
+        if entry is None:
+            self.phases[name] = [ms, 1]
+        else:
+            entry[0] += ms
+            entry[1] += 1
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def header_value(self) -> str:
+        parts = []
+        for name, (ms, count) in self.phases.items():
+            item = f"{name};dur={ms:.1f}"
+            if count > 1:
+                item += f';desc="x{int(count)}"'
+            parts.append(item)
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+
+def begin(route: str) -> RequestTimer:
+    """
+    Start timing a request on the current thread (replaces any leftover timer).
+    """
+    timer = RequestTimer(route)
+    _local.timer = timer
+    return timer
+
+
+def current() -> Optional[RequestTimer]:
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def phase(name: str, backend: Optional[str] = None):
+    """
+    Time a block and attribute it to the current request (no-op outside a request).
+    Repeated phases with the same name are summed and reported with a count.
+    Pass `backend` for outbound calls so the latency is also recorded in metrics.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        timer = current()
+        if timer is not None:
+            timer.add(name, elapsed * 1000.0)
+        if backend:
+            _metrics.observe_outbound(backend, name, elapsed)
+
+
+def server_timing_header() -> str:
+    timer = current()
+    return timer.header_value() if timer is not None else ""
+
+
+def end(status: int, nbytes: int = 0) -> None:
+    """
+    Finish the current request timer and emit the structured log line if enabled.
+    """
+    timer = current()
+    if timer is None:
+        return
+    _local.timer = None
+    try:
+        _metrics.observe_request(timer.route, status, timer.total_ms() / 1000.0, nbytes)
+    except Exception:
+        pass
+    if not TIMING_LOG:
+        return
+    record = {
+        "event": "request_timing",
+        "route": timer.route,
+        "status": status,
+        "bytes": nbytes,
+        "total_ms": round(timer.total_ms(), 1),
+        "phases": {name: {"ms": round(ms, 1), "count": int(count)} for name, (ms, count) in timer.phases.items()},
+    }
+    try:
+        print(json.dumps(record, separators=(",", ":")), flush=True)
+    except Exception:
+        pass
@@ -2,19 +2,27 @@ import json
 from http.server import BaseHTTPRequestHandler
 
 from .._auth import create_invite, get_user_from_headers
+from .. import _timing
+from .._timing import phase
 
 def _json(handler: BaseHTTPRequestHandler, status: int, payload: dict):
   data = json.dumps(payload).encode("utf-8")
   handler.send_response(status)
   handler.send_header("Content-Type", "application/json; charset=utf-8")
   handler.send_header("Content-Length", str(len(data)))
+  timing = _timing.server_timing_header()
+  if timing:
+    handler.send_header("Server-Timing", timing)
   handler.end_headers()
   handler.wfile.write(data)
+  _timing.end(status, len(data))
 
 class handler(BaseHTTPRequestHandler):
   # POST {"role": "user"|"admin"}  (admin only)
   def do_POST(self):
-    user = get_user_from_headers(self.headers)
+    _timing.begin("auth.invite")
+    with phase("auth"):
+      user = get_user_from_headers(self.headers)
     if not user or (user.get("role") != "admin"):
       _json(self, 403, {"error": "Forbidden"})
       return
@@ -27,7 +35,8 @@ class handler(BaseHTTPRequestHandler):
       if role not in ("user", "admin"):
         role = "user"
 
-      token = create_invite(role=role)
+      with phase("kv-write"):
+        token = create_invite(role=role)
 
       # Return token; frontend can compose a registration URL like /register?invite=TOKEN
       _json(self, 200, {"ok": True, "token": token})
@@ -7,20 +7,27 @@ from .._auth import (
   create_jwt,
   build_auth_cookie,
 )
+from .. import _timing
+from .._timing import phase
 
 def _json(handler: BaseHTTPRequestHandler, status: int, payload: dict, set_cookie: str | None = None):
   data = json.dumps(payload).encode("utf-8")
   handler.send_response(status)
   handler.send_header("Content-Type", "application/json; charset=utf-8")
   handler.send_header("Content-Length", str(len(data)))
+  timing = _timing.server_timing_header()
+  if timing:
+    handler.send_header("Server-Timing", timing)
   if set_cookie:
     handler.send_header("Set-Cookie", set_cookie)
   handler.end_headers()
   handler.wfile.write(data)
+  _timing.end(status, len(data))
 
 class handler(BaseHTTPRequestHandler):
   # POST {username, password}
   def do_POST(self):
+    _timing.begin("auth.login")
     try:
       length = int(self.headers.get("Content-Length", "0"))
       body = self.rfile.read(length) if length > 0 else b"{}"
@@ -44,7 +51,8 @@ class handler(BaseHTTPRequestHandler):
           # ignore bootstrap errors, fallback to normal auth
           pass
 
-      ok, sub, role = authenticate_user(username, password)
+      with phase("auth"):
+        ok, sub, role = authenticate_user(username, password)
       if not ok:
         _json(self, 401, {"error": "Invalid credentials"})
         return
@@ -2,20 +2,27 @@ import json
 from http.server import BaseHTTPRequestHandler
 
 from .._auth import consume_invite, create_user, create_jwt, build_auth_cookie
+from .. import _timing
+from .._timing import phase
 
 def _json(handler: BaseHTTPRequestHandler, status: int, payload: dict, set_cookie: str | None = None):
   data = json.dumps(payload).encode("utf-8")
   handler.send_response(status)
   handler.send_header("Content-Type", "application/json; charset=utf-8")
   handler.send_header("Content-Length", str(len(data)))
+  timing = _timing.server_timing_header()
+  if timing:
+    handler.send_header("Server-Timing", timing)
   if set_cookie:
     handler.send_header("Set-Cookie", set_cookie)
   handler.end_headers()
   handler.wfile.write(data)
+  _timing.end(status, len(data))
 
 class handler(BaseHTTPRequestHandler):
   # POST {"token": "...", "username": "...", "password": "..."}
   def do_POST(self):
+    _timing.begin("auth.register")
     try:
       length = int(self.headers.get("Content-Length", "0"))
       body = self.rfile.read(length) if length > 0 else b"{}"
@@ -29,7 +36,8 @@ class handler(BaseHTTPRequestHandler):
         _json(self, 400, {"error": "token, username and password are required"})
         return
 
-      inv = consume_invite(token)
+      with phase("kv-invite"):
+        inv = consume_invite(token)
       if inv is None:
         _json(self, 400, {"error": "Invalid or expired invite token"})
         return
@@ -39,7 +47,8 @@ class handler(BaseHTTPRequestHandler):
         role = "user"
 
       # Create user
-      create_user(username, password, role=role)
+      with phase("auth"):
+        create_user(username, password, role=role)
 
       # Log them in by setting cookie
       jwt = create_jwt(sub=username, role=role)
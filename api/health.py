@@ -1,14 +1,44 @@
 import json
 import os
 from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from . import _metrics, _timing
 
 
 def _missing(vars_list):
     return [v for v in vars_list if not (os.getenv(v) or "").strip()]
 
 
+def _metrics_response(handler: BaseHTTPRequestHandler):
+    data = _metrics.render().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.send_header("Cache-Control", "no-store")
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        # Sub-route /api-py/health/metrics is rewritten to ?metrics=1
+        qs = parse_qs(urlparse(self.path).query or "")
+        if "metrics" in qs:
+            # Same bearer check as /api-py/reminders (CRON_SECRET or BOOTSTRAP_TOKEN)
+            from .reminders import _authorized
+            if not _authorized(self):
+                data = json.dumps({"error": "Unauthorized"}).encode("utf-8")
+                self.send_response(401)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            _metrics_response(self)
+            return
+        _timing.begin("health")
+
         blob_vars = ["BLOB_BASE_URL", "BLOB_READ_WRITE_TOKEN", "BLOB_JSON_KEY"]
         github_vars = ["GITHUB_TOKEN", "GITHUB_REPO_OWNER", "GITHUB_REPO", "GITHUB_BRANCH", "GITHUB_JSON_FILE_PATH"]
         auth_vars = ["AUTH_SECRET", "ADMIN_INITIAL_PASSWORD"]
@@ -76,9 +106,27 @@ class handler(BaseHTTPRequestHandler):
             ]
         }
 
+        # ?deep=1: live dependency check (concurrent probes, cached for PROBE_CACHE_TTL_SECONDS)
+        if "deep" in qs:
+            from ._probes import run_probes
+            probes = run_probes(force=(qs.get("deep") == ["fresh"]))
+            blob_ok = probes["blob"]["status"] in (200, 404)
+            github_ok = probes["github"]["status"] == 200
+            status["dependencies"] = {
+                "blob": dict(probes["blob"], ok=blob_ok),
+                "github": dict(probes["github"], ok=github_ok),
+                "cached": probes["cached"],
+                "age_ms": probes["age_ms"],
+            }
+            status["ok"] = blob_configured and blob_ok
+
         data = json.dumps(status).encode("utf-8")
         self.send_response(200)
         self.send_header("Content-Type", "application/json; charset=utf-8")
         self.send_header("Content-Length", str(len(data)))
+        timing = _timing.server_timing_header()
+        if timing:
+            self.send_header("Server-Timing", timing)
         self.end_headers()
         self.wfile.write(data)
+        _timing.end(200, len(data))
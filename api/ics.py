@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler
+from typing import Iterator, Optional
+
+from ._calendar import birth_parts
+from ._metrics import cache_hit, cache_miss
+from ._store import store_document
+from . import _timing
+from ._timing import phase
+
+# iCalendar feed for calendar subscriptions: GET /api-py/calendar.ics (this module, ics.py)
+# One all-day, yearly recurring event per row with a stable UID derived from the row id.
+# The feed is rendered once per dataset version and served from memory with ETag and
+# Last-Modified, so polling clients get a 304 or the cached body. Within
+# CALENDAR_CACHE_SECONDS the cached feed is served without consulting the store at all.
+#
+#   CALENDAR_CACHE_SECONDS  how long the feed is served without checking the dataset version (default 300)
+#   CALENDAR_NAME           calendar display name (default: Birthdays)
+CALENDAR_CACHE_SECONDS = float(os.getenv("CALENDAR_CACHE_SECONDS") or "300")
+CALENDAR_NAME = os.getenv("CALENDAR_NAME") or "Birthdays"
+
+_LOCK = threading.Lock()
+_FEED: Optional[dict] = None   # {"version", "body", "etag", "last_modified", "checked_at"}
+
+
+def _escape(text: str) -> str:
+    return (
+        str(text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> bytes:
+    """
+    Encode one content line, folded at 75 octets (RFC 5545 3.1) without splitting UTF-8 sequences.
+    """
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return data + b"\r\n"
+    out, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        out.append(data[start:end])
+        start, limit = end, 74  # continuation lines start with a space
+    return b"\r\n ".join(out) + b"\r\n"
+
+
+def render_feed(rows: list, stamp: str) -> Iterator[bytes]:
+    """
+    Yield the calendar line by line (rows are rendered one at a time).
+    """
+    for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//birthdays-app//calendar feed//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(CALENDAR_NAME)}",
+    ):
+        yield _fold(line)
+    for r in rows:
+        parts = birth_parts(r)
+        if parts is None or not (r.get("id") or "").strip():
+            continue
+        year, month, day = parts
+        # Unknown years start in 2000 (a leap year, so Feb 29 is a valid DTSTART)
+        start_year = year if year and year >= 1900 else 2000
+        if month == 2 and day == 29:
+            start_year = start_year if start_year % 4 == 0 and (start_year % 100 != 0 or start_year % 400 == 0) else 2000
+            rrule = "RRULE:FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=-1"  # Feb 28 in non-leap years
+        else:
+            rrule = "RRULE:FREQ=YEARLY"
+        name = " ".join(p for p in ((r.get("first_name") or "").strip(), (r.get("last_name") or "").strip()) if p)
+        summary = f"{name} ({year})" if year else name
+        for line in (
+            "BEGIN:VEVENT",
+            f"UID:{_escape(r['id'].strip())}@birthdays-app",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{start_year:04d}{month:02d}{day:02d}",
+            rrule,
+            f"SUMMARY:{_escape(summary)}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ):
+            yield _fold(line)
+    yield _fold("END:VCALENDAR")
+
+
+def _last_modified(meta: dict) -> datetime:
+    try:
+        return datetime.strptime(meta.get("updated_at") or "", "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _current_feed() -> dict:
+    global _FEED
+    with _LOCK:
+        feed = _FEED
+    if feed is not None and time.monotonic() - feed["checked_at"] < CALENDAR_CACHE_SECONDS:
+        cache_hit("calendar")
+        return feed
+    with phase("store-read"):
+        # Rows, version and updated_at from the same cached document
+        rows, meta = store_document(stale_ok=True)
+    version = meta["version"]
+    if feed is not None and feed["version"] == version:
+        cache_hit("calendar")
+        with _LOCK:
+            feed["checked_at"] = time.monotonic()
+        return feed
+    cache_miss("calendar")
+    last_modified = _last_modified(meta)
+    with phase("render"):
+        body = b"".join(render_feed(rows, last_modified.strftime("%Y%m%dT%H%M%SZ")))
+    feed = {
+        "version": version,
+        "body": body,
+        "etag": '"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+        "last_modified": last_modified,
+        "checked_at": time.monotonic(),
+    }
+    with _LOCK:
+        _FEED = feed
+    return feed
+
+
+def _not_modified(handler: BaseHTTPRequestHandler, feed: dict) -> bool:
+    inm = handler.headers.get("If-None-Match")
+    if inm:
+        return feed["etag"] in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = handler.headers.get("If-Modified-Since")
+    if ims:
+        try:
+            from email.utils import parsedate_to_datetime
+            return feed["last_modified"] <= parsedate_to_datetime(ims)
+        except Exception:
+            return False
+    return False
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        _timing.begin("ics")
+        try:
+            feed = _current_feed()
+        except Exception as e:
+            data = f"error: {e}".encode("utf-8")
+            self.send_response(500)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            _timing.end(500, len(data))
+            return
+
+        from email.utils import format_datetime  # already loaded by http.server
+        status = 304 if _not_modified(self, feed) else 200
+        body = b"" if status == 304 else feed["body"]
+        self.send_response(status)
+        if status == 200:
+            self.send_header("Content-Type", "text/calendar; charset=utf-8")
+            self.send_header("Content-Disposition", 'inline; filename="birthdays.ics"')
+            self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", feed["etag"])
+        self.send_header("Last-Modified", format_datetime(feed["last_modified"], usegmt=True))
+        self.send_header("Cache-Control", f"public, max-age={int(CALENDAR_CACHE_SECONDS)}")
+        timing = _timing.server_timing_header()
+        if timing:
+            self.send_header("Server-Timing", timing)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        _timing.end(status, len(body))
@@ -1,10 +1,11 @@
 import json
 from http.server import BaseHTTPRequestHandler
+from typing import Optional
 from urllib.parse import urlparse, parse_qs
 
-from ._blob import is_blob_configured, set_json as blob_set_json, get_json as blob_get_json
-from ._github import create_pr_with_json
-from ._auth import get_user_from_headers
+from ._store import store_set_rows, store_snapshot, store_update, VersionConflict
+from . import _idempotency, _timing
+from ._timing import phase
 
 def _normalize_row(row: dict) -> dict:
     return {
@@ -37,38 +38,171 @@ def _validate_row(row: dict) -> None:
     _ = datetime.date(y, m, d)
 
 
-def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict):
-    data = json.dumps(payload).encode("utf-8")
+def get_user_from_headers(headers):
+    from ._auth import get_user_from_headers as _get_user_from_headers
+    return _get_user_from_headers(headers)
+
+
+def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict, headers: Optional[dict] = None):
+    _idempotency.complete(status, payload)
+    with phase("serialize"):
+        data = json.dumps(payload).encode("utf-8")
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(data)))
+    for k, v in (headers or {}).items():
+        handler.send_header(k, v)
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
     handler.end_headers()
     handler.wfile.write(data)
+    _timing.end(status, len(data))
+
+
+PATCH_TYPES = {
+    "application/json-patch+json": "json-patch",
+    "application/merge-patch+json": "merge-patch",
+}
+
+
+def _patch_kind(headers) -> Optional[str]:
+    ctype = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    return PATCH_TYPES.get(ctype)
+
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _precondition(handler: BaseHTTPRequestHandler) -> Optional[int]:
+    """
+    Dataset version a patch was written against: If-Match with the ETag from GET, or ?version=.
+    None for If-Match: *; KeyError when neither is given, ValueError when malformed.
+    """
+    if_match = (handler.headers.get("If-Match") or "").strip()
+    if if_match == "*":
+        return None
+    if if_match:
+        return int(if_match.removeprefix("W/").strip('"'))
+    qs = parse_qs(urlparse(handler.path).query or "")
+    if "version" in qs:
+        return int(qs["version"][0])
+    raise KeyError("version")
 
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
-        user = get_user_from_headers(self.headers)
+        _timing.begin("json.get")
+        with phase("auth"):
+            user = get_user_from_headers(self.headers)
         if not user:
             _json_response(self, 401, {"error": "Unauthorized"})
             return
         try:
-            rows = blob_get_json(default=[])
-            if not isinstance(rows, list):
-                rows = []
-            _json_response(self, 200, {"data": rows, "count": len(rows)})
+            with phase("store-read"):
+                rows, version = store_snapshot()
+            # The ETag is the dataset version: send it back as If-Match with a PATCH
+            _json_response(self, 200, {"data": rows, "count": len(rows), "version": version}, {"ETag": _etag(version)})
+        except Exception as e:
+            _json_response(self, 500, {"error": str(e)})
+
+    def do_PATCH(self):
+        """
+        Partial edit: JSON Patch (RFC 6902) or a merge patch keyed by row id (see _patch.py).
+        Only the touched rows are validated; the patch is applied to the latest rows and
+        rejected with 412 unless they are still at the version given in If-Match. The version
+        is compared with the stored document, re-read under the dataset write lock (see
+        _store.store_update), not with this instance's cache.
+        """
+        _timing.begin("json.patch")
+        with phase("auth"):
+            user = get_user_from_headers(self.headers)
+        if not user or user.get("role") != "admin":
+            _json_response(self, 403, {"error": "Forbidden"})
+            return
+        from ._patch import PatchError, apply_json_patch, apply_merge_patch
+        try:
+            replay = _idempotency.begin(self, "json.patch", user)
+            if replay is not None:
+                _json_response(self, *replay)
+                return
+            try:
+                expected = _precondition(self)
+            except KeyError:
+                _json_response(self, 428, {"error": "Send If-Match with the dataset version (the ETag of GET /api-py/json)"})
+                return
+            except ValueError:
+                _json_response(self, 400, {"error": "If-Match/version must be a dataset version"})
+                return
+            length = int(self.headers.get("Content-Length", "0"))
+            body = self.rfile.read(length) if length > 0 else b""
+            with phase("parse"):
+                patch = json.loads(body.decode("utf-8") or "null")
+            kind = _patch_kind(self.headers) or ("json-patch" if isinstance(patch, list) else "merge-patch")
+            touched = []
+
+            def apply(rows: list) -> list:
+                with phase("patch"):
+                    if kind == "json-patch":
+                        new_rows, changed = apply_json_patch(rows, patch)
+                    else:
+                        new_rows, changed, _ = apply_merge_patch(rows, patch)
+                with phase("validate"):
+                    for r in changed:
+                        try:
+                            _validate_row(r if isinstance(r, dict) else {})
+                        except Exception as ve:
+                            label = (r.get("id") if isinstance(r, dict) else None) or "new row"
+                            raise PatchError(f"Row {label}: {str(ve)}")
+                touched[:] = changed  # fn may run again after a conflicting write
+                return new_rows
+
+            with phase("store-write"):
+                rows, version = store_update(apply, expected_version=expected, strict=True)
+        except VersionConflict as vc:
+            _json_response(self, 412, {"error": str(vc), "version": vc.actual}, {"ETag": _etag(vc.actual)})
+            return
+        except PatchError as pe:
+            _json_response(self, pe.status, {"error": str(pe)})
+            return
+        except json.JSONDecodeError:
+            _json_response(self, 400, {"error": "Invalid JSON"})
+            return
         except Exception as e:
             _json_response(self, 500, {"error": str(e)})
+            return
+
+        resp = {"ok": True, "version": version, "count": len(rows), "touched": len(touched)}
+        try:
+            from ._github import create_pr_with_json
+            pr_number, pr_url = create_pr_with_json(rows, title="Patch birthdays (JSON) via UI")
+            resp["pr_url"] = pr_url
+        except Exception as pe:
+            resp["pr_url"] = None
+            resp["warning"] = f"PR creation failed: {str(pe)}"
+        _json_response(self, 200, resp, {"ETag": _etag(version)})
 
     def do_POST(self):
-        user = get_user_from_headers(self.headers)
+        # Hosts that do not forward PATCH can POST a patch media type instead
+        if _patch_kind(self.headers) is not None:
+            self.do_PATCH()
+            return
+        _timing.begin("json.post")
+        with phase("auth"):
+            user = get_user_from_headers(self.headers)
         if not user or user.get("role") != "admin":
             _json_response(self, 403, {"error": "Forbidden"})
             return
         try:
+            replay = _idempotency.begin(self, "json.post", user)
+            if replay is not None:
+                _json_response(self, *replay)
+                return
             length = int(self.headers.get("Content-Length", "0"))
             body = self.rfile.read(length) if length > 0 else b"{}"
-            parsed = json.loads((body or b"{}").decode("utf-8") or "{}")
+            with phase("parse"):
+                parsed = json.loads((body or b"{}").decode("utf-8") or "{}")
 
             if isinstance(parsed, list):
                 rows = parsed
@@ -84,27 +218,52 @@ class handler(BaseHTTPRequestHandler):
 
             # Validate all rows with clear indexing; in non-strict mode collect warnings instead of failing
             warnings = []
-            for i, r in enumerate(rows):
-                try:
-                    _validate_row(r if isinstance(r, dict) else {})
-                except Exception as ve:
-                    if strict:
-                        _json_response(self, 400, {"error": f"Row {i}: {str(ve)}"})
-                        return
-                    warnings.append(f"Row {i}: {str(ve)}")
-
-            # Persist to Blob (runtime DB) when configured; otherwise skip in dev
-            if is_blob_configured():
-                blob_set_json(rows)
+            with phase("validate"):
+                for i, r in enumerate(rows):
+                    try:
+                        _validate_row(r if isinstance(r, dict) else {})
+                    except Exception as ve:
+                        if strict:
+                            _json_response(self, 400, {"error": f"Row {i}: {str(ve)}"})
+                            return
+                        warnings.append(f"Row {i}: {str(ve)}")
+
+            # Duplicate handling via ?duplicates=report (default: write and report),
+            # strict (reject the import) or merge (keep the first of each group, fill gaps from the rest)
+            mode = (qs.get("duplicates", ["report"])[0] or "report").lower()
+            if mode not in ("report", "strict", "merge"):
+                _json_response(self, 400, {"error": "duplicates must be report, strict or merge"})
+                return
+            from ._dupes import find_duplicates, merge_duplicates
+            with phase("dupe-check"):
+                if mode == "merge":
+                    rows, duplicates = merge_duplicates(rows)
+                else:
+                    duplicates = find_duplicates(rows)
+            if duplicates and mode == "strict":
+                _json_response(self, 409, {"error": f"{len(duplicates)} duplicate group(s) in import", "duplicates": duplicates})
+                return
+
+            # Persist through the storage engine (Blob when configured; in-memory in dev)
+            with phase("store-write"):
+                store_set_rows(rows, strict=True)
 
             # Open PR to update GitHub JSON backup
             try:
+                from ._github import create_pr_with_json
                 pr_number, pr_url = create_pr_with_json(rows, title="Update birthdays (JSON) via UI")
             except Exception as pe:
-                _json_response(self, 200, {"ok": True, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"})
+                resp = {"ok": True, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"}
+                if duplicates:
+                    resp["duplicates"] = duplicates
+                    resp["duplicates_merged"] = mode == "merge"
+                _json_response(self, 200, resp)
                 return
 
             resp = {"ok": True, "count": len(rows), "pr_url": pr_url}
+            if duplicates:
+                resp["duplicates"] = duplicates
+                resp["duplicates_merged"] = mode == "merge"
             if warnings:
                 resp["warning"] = "; ".join(warnings)
             _json_response(self, 200, resp)
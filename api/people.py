@@ -1,18 +1,15 @@
 import json
 import os
-import urllib.request
-import urllib.parse
-import urllib.error
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import hashlib
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
+from typing import Optional
 
-# Lazy-import _github only where needed to avoid module import errors at cold start
-from ._blob import is_blob_configured, get_json as blob_get_json, set_json as blob_set_json
-
-# In-memory dev storage when Blob is not configured
-_DEV_ROWS = None
+# Lazy-import _github, _auth and urllib.request only where needed: unauthenticated GETs
+# should load the smallest possible module graph at cold start.
+from ._store import store_set_rows, store_snapshot, store_update, gen_id_from_dt as _gen_id_from_dt
+from . import _idempotency, _timing
+from ._timing import phase
 
 
 def normalize_row(row: dict) -> dict:
@@ -49,136 +46,32 @@ def validate_row(row: dict) -> None:
     _ = datetime.date(y, m, d)
 
 
-def _gen_id_from_dt(dt: datetime) -> str:
-    iso = dt.replace(tzinfo=timezone.utc).isoformat()
-    return hashlib.sha1(f"birthapp|{iso}".encode("utf-8")).hexdigest()
-
-
-def _bootstrap_blob_from_github_if_empty() -> list:
+class _Rejected(Exception):
     """
-    If Blob is configured but currently empty or invalid, fetch JSON from GitHub
-    (using env: GITHUB_REPO_OWNER/REPO/BRANCH/GITHUB_JSON_FILE_PATH) and write it into Blob.
-    Returns the rows read (possibly empty).
+    Raised inside a store_update() callback to answer with (status, payload) and write nothing.
     """
-    owner = (os.getenv("GITHUB_REPO_OWNER") or "").strip()
-    repo = (os.getenv("GITHUB_REPO") or "").strip()
-    branch = (os.getenv("GITHUB_BRANCH") or "").strip()
-    path = (os.getenv("GITHUB_JSON_FILE_PATH") or "").strip()
-    if not (owner and repo and branch and path):
-        return []
-    raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
-    try:
-        req = urllib.request.Request(raw_url, method="GET", headers={"User-Agent": "birthdays-app-python"})
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            text = resp.read().decode("utf-8")
-    except urllib.error.HTTPError as he:
-        if he.code == 404:
-            return []
-        return []
-    except Exception:
-        return []
-    try:
-        parsed = json.loads(text)
-        if isinstance(parsed, list):
-            # Persist to Blob and return
-            blob_set_json(parsed)
-            return parsed
-    except Exception:
-        return []
-    return []
-
-
-def store_get_rows():
-    global _DEV_ROWS
-    if not is_blob_configured():
-        # Prefer in-memory ephemeral store for dev/unconfigured environments
-        if isinstance(_DEV_ROWS, list):
-            return _DEV_ROWS
-        # Fallback: try reading birthdays.json from repo root or CWD
-        candidates = []
-        try:
-            here = os.path.dirname(__file__)
-            candidates.append(os.path.normpath(os.path.join(here, "..", "birthdays.json")))
-        except Exception:
-            pass
-        candidates.append("birthdays.json")
-        for p in candidates:
-            try:
-                with open(p, "r", encoding="utf-8") as f:
-                    parsed = json.load(f)
-                    if isinstance(parsed, list):
-                        _DEV_ROWS = parsed  # cache for subsequent requests
-                        return parsed
-            except Exception:
-                continue
-        # No local fallback, return empty list to keep UI functional
-        _DEV_ROWS = []
-        return _DEV_ROWS
-    try:
-        data = blob_get_json(default=None)
-    except Exception:
-        # Fallback when Blob GET errors (e.g., 405/403 or domain/permission issues)
-        if isinstance(_DEV_ROWS, list):
-            return _DEV_ROWS
-        return []
-    if isinstance(data, list):
-        # Backfill missing ids for existing rows and persist once
-        needs = False
-        for r in data:
-            try:
-                if not (isinstance(r, dict) and (r.get("id") or "").strip()):
-                    needs = True
-                    break
-            except Exception:
-                continue
-        if needs:
-            base = datetime.now(timezone.utc)
-            idx = 0
-            for r in data:
-                try:
-                    if not (isinstance(r, dict) and (r.get("id") or "").strip()):
-                        r["id"] = _gen_id_from_dt(base + timedelta(minutes=idx))
-                        idx += 1
-                except Exception:
-                    pass
-            try:
-                store_set_rows(data)
-            except Exception:
-                pass
-        return data
-    # Attempt automatic bootstrap from GitHub JSON if Blob is empty/missing
-    rows = _bootstrap_blob_from_github_if_empty()
-    return rows
-
 
-def store_set_rows(rows):
-    global _DEV_ROWS
-    if not is_blob_configured():
-        # Dev/unconfigured: keep rows in-memory to allow UI edits without Blob
-        try:
-            _DEV_ROWS = list(rows)
-        except Exception:
-            _DEV_ROWS = rows
-        return
-    # Blob configured but write may fail (405/403). Fallback to in-memory to avoid breaking the UI.
-    try:
-        blob_set_json(rows)
-    except Exception:
-        try:
-            _DEV_ROWS = list(rows)
-        except Exception:
-            _DEV_ROWS = rows
-        # swallow write error to keep UX working in dev/misconfigured envs
-        return
+    def __init__(self, status: int, payload: dict):
+        super().__init__(payload.get("error"))
+        self.status = status
+        self.payload = payload
 
 
-def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict):
-    data = json.dumps(payload).encode("utf-8")
+def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict, headers: Optional[dict] = None):
+    _idempotency.complete(status, payload)
+    with phase("serialize"):
+        data = json.dumps(payload).encode("utf-8")
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(data)))
+    for k, v in (headers or {}).items():
+        handler.send_header(k, v)
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
     handler.end_headers()
     handler.wfile.write(data)
+    _timing.end(status, len(data))
 
 
 def _text_response(handler: BaseHTTPRequestHandler, status: int, text: str):
@@ -186,12 +79,53 @@ def _text_response(handler: BaseHTTPRequestHandler, status: int, text: str):
     handler.send_response(status)
     handler.send_header("Content-Type", "text/plain; charset=utf-8")
     handler.send_header("Content-Length", str(len(data)))
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
     handler.end_headers()
     handler.wfile.write(data)
+    _timing.end(status, len(data))
+
+
+def _wants_minimal(handler: BaseHTTPRequestHandler) -> bool:
+    """
+    Opt-in small mutation responses: `Prefer: return=minimal` (RFC 7240) or `?return=minimal`.
+    """
+    prefer = (handler.headers.get("Prefer") or "").replace(" ", "").lower()
+    if "return=minimal" in prefer.split(","):
+        return True
+    qs = parse_qs(urlparse(handler.path).query or "")
+    return (qs.get("return") or [""])[0].strip().lower() == "minimal"
+
+
+def _mutation_response(handler: BaseHTTPRequestHandler, rows: list, row: dict, version: int, pr_url,
+                       warning: Optional[str] = None):
+    """
+    201 with the whole dataset under "data", or in minimal mode only the added row,
+    its id and position, and the new dataset version.
+    """
+    headers = None
+    if _wants_minimal(handler):
+        payload = {
+            "op": "add",
+            "row": row,
+            "id": row.get("id") or "",
+            "index": len(rows) - 1,
+            "version": version,
+            "count": len(rows),
+            "pr_url": pr_url,
+        }
+        headers = {"Preference-Applied": "return=minimal"}
+    else:
+        payload = {"data": rows, "count": len(rows), "pr_url": pr_url}
+    if warning:
+        payload["warning"] = warning
+    _json_response(handler, 201, payload, headers)
 
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        _timing.begin("people.get")
         # Reading data does NOT require auth; this allows the UI to bootstrap transparently.
         qs = parse_qs(urlparse(self.path).query or "")
         # On-demand diagnostics (always returns text 200 without attempting store access)
@@ -221,46 +155,19 @@ class handler(BaseHTTPRequestHandler):
                 "GITHUB_JSON_FILE_PATH": _redact("GITHUB_JSON_FILE_PATH"),
             }
 
-            # Live probes
-            blob_url = None
-            blob_get_status = None
-            github_raw_url = None
-            github_get_status = None
-
-            try:
-                b_base = (os.getenv("BLOB_BASE_URL") or "").rstrip("/")
-                b_key = (os.getenv("BLOB_JSON_KEY") or "").strip()
-                if b_base and b_key:
-                    blob_url = f"{b_base}/{urllib.parse.quote(b_key, safe='')}"
-                    req = urllib.request.Request(blob_url, method="GET", headers={"User-Agent": "birthdays-app-python"})
-                    with urllib.request.urlopen(req, timeout=10) as resp:
-                        blob_get_status = resp.getcode()
-            except urllib.error.HTTPError as he:
-                blob_get_status = he.code
-            except Exception:
-                pass
-
-            try:
-                owner = (os.getenv("GITHUB_REPO_OWNER") or "").strip()
-                repo = (os.getenv("GITHUB_REPO") or "").strip()
-                branch = (os.getenv("GITHUB_BRANCH") or "").strip()
-                path = (os.getenv("GITHUB_JSON_FILE_PATH") or "").strip()
-                if owner and repo and branch and path:
-                    github_raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
-                    req = urllib.request.Request(github_raw_url, method="GET", headers={"User-Agent": "birthdays-app-python"})
-                    with urllib.request.urlopen(req, timeout=10) as resp:
-                        github_get_status = resp.getcode()
-            except urllib.error.HTTPError as he:
-                github_get_status = he.code
-            except Exception:
-                pass
+            # Live probes (concurrent, shared cache; ?diag=fresh bypasses the cache)
+            from ._probes import run_probes
+            probes = run_probes(force=(qs.get("diag") == ["fresh"]))
 
             lines = [
                 "diag: on-demand status",
-                f"blob.url: {blob_url}",
-                f"blob.status: {blob_get_status}",
-                f"github.url: {github_raw_url}",
-                f"github.status: {github_get_status}",
+                f"blob.url: {probes['blob']['url']}",
+                f"blob.status: {probes['blob']['status']}",
+                f"blob.ms: {probes['blob']['ms']}",
+                f"github.url: {probes['github']['url']}",
+                f"github.status: {probes['github']['status']}",
+                f"github.ms: {probes['github']['ms']}",
+                f"probes.cached: {probes['cached']} (age {probes['age_ms']} ms)",
                 "env_preview:",
                 f"  BLOB_BASE_URL: {env_preview['BLOB_BASE_URL']}",
                 f"  BLOB_READ_WRITE_TOKEN: {env_preview['BLOB_READ_WRITE_TOKEN']}",
@@ -281,16 +188,10 @@ class handler(BaseHTTPRequestHandler):
 
         # Force bootstrap from GitHub into Blob (manual trigger for diagnostics)
         if "force_bootstrap" in qs:
-            # Build probe URLs
-            b_base = (os.getenv("BLOB_BASE_URL") or "").rstrip("/")
-            b_key = (os.getenv("BLOB_JSON_KEY") or "").strip()
-            owner = (os.getenv("GITHUB_REPO_OWNER") or "").strip()
-            repo = (os.getenv("GITHUB_REPO") or "").strip()
-            branch = (os.getenv("GITHUB_BRANCH") or "").strip()
-            path = (os.getenv("GITHUB_JSON_FILE_PATH") or "").strip()
-
-            blob_url = f"{b_base}/{urllib.parse.quote(b_key, safe='')}" if b_base and b_key else None
-            github_raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}" if owner and repo and branch and path else None
+            import urllib.request
+            from ._probes import blob_probe_url, github_probe_url
+            blob_url = blob_probe_url()
+            github_raw_url = github_probe_url()
 
             # Try fetching GitHub JSON and writing to Blob
             try:
@@ -306,7 +207,7 @@ class handler(BaseHTTPRequestHandler):
                     parsed = json.loads(raw)
                     if isinstance(parsed, list):
                         try:
-                            blob_set_json(parsed)
+                            store_set_rows(parsed, strict=True)
                             _text_response(self, 200, "\n".join([
                                 "force_bootstrap: OK",
                                 f"blob.url: {blob_url}",
@@ -339,8 +240,10 @@ class handler(BaseHTTPRequestHandler):
                 return
 
         try:
-            rows = store_get_rows()
-            _json_response(self, 200, {"data": rows, "count": len(rows)})
+            with phase("store-read"):
+                rows, version = store_snapshot(stale_ok=True)
+            # "version" is where a client picks up the change feed (/api-py/people/changes)
+            _json_response(self, 200, {"data": rows, "count": len(rows), "version": version})
         except Exception as e:
             # Provide detailed diagnostics, including redacted values, plus live probes, to identify misconfiguration
             qs = parse_qs(urlparse(self.path).query or "")
@@ -373,39 +276,12 @@ class handler(BaseHTTPRequestHandler):
             missing_blob = [v for v in blob_vars if not (os.getenv(v) or "").strip()]
             missing_github = [v for v in github_vars if not (os.getenv(v) or "").strip()]
 
-            # Live probes (read-only) to help detect common issues
-            blob_url = None
-            blob_get_status = None
-            github_raw_url = None
-            github_get_status = None
-
-            try:
-                b_base = (os.getenv("BLOB_BASE_URL") or "").rstrip("/")
-                b_key = (os.getenv("BLOB_JSON_KEY") or "").strip()
-                if b_base and b_key:
-                    blob_url = f"{b_base}/{urllib.parse.quote(b_key, safe='')}"
-                    req = urllib.request.Request(blob_url, method="GET", headers={"User-Agent": "birthdays-app-python"})
-                    with urllib.request.urlopen(req, timeout=10) as resp:
-                        blob_get_status = resp.getcode()
-            except urllib.error.HTTPError as he:
-                blob_get_status = he.code
-            except Exception:
-                pass
-
+            # Live probes (read-only, concurrent and cached) to help detect common issues
             try:
-                owner = (os.getenv("GITHUB_REPO_OWNER") or "").strip()
-                repo = (os.getenv("GITHUB_REPO") or "").strip()
-                branch = (os.getenv("GITHUB_BRANCH") or "").strip()
-                path = (os.getenv("GITHUB_JSON_FILE_PATH") or "").strip()
-                if owner and repo and branch and path:
-                    github_raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
-                    req = urllib.request.Request(github_raw_url, method="GET", headers={"User-Agent": "birthdays-app-python"})
-                    with urllib.request.urlopen(req, timeout=10) as resp:
-                        github_get_status = resp.getcode()
-            except urllib.error.HTTPError as he:
-                github_get_status = he.code
+                from ._probes import run_probes
+                probes = run_probes()
             except Exception:
-                pass
+                probes = {"blob": {}, "github": {}}
 
             payload = {
                 "ok": False,
@@ -414,16 +290,18 @@ class handler(BaseHTTPRequestHandler):
                     "configured": len(missing_blob) == 0,
                     "missing": missing_blob,
                     "probe": {
-                        "blob_url": blob_url,
-                        "blob_get_status": blob_get_status
+                        "blob_url": probes["blob"].get("url"),
+                        "blob_get_status": probes["blob"].get("status"),
+                        "ms": probes["blob"].get("ms")
                     }
                 },
                 "github": {
                     "configured": len(missing_github) == 0,
                     "missing": missing_github,
                     "probe": {
-                        "github_raw_url": github_raw_url,
-                        "github_get_status": github_get_status
+                        "github_raw_url": probes["github"].get("url"),
+                        "github_get_status": probes["github"].get("status"),
+                        "ms": probes["github"].get("ms")
                     }
                 },
                 "env_preview": env_preview,
@@ -459,20 +337,28 @@ class handler(BaseHTTPRequestHandler):
                 _json_response(self, 500, payload)
 
     def do_POST(self):
+        _timing.begin("people.post")
         # Mutations still require auth
         try:
-            from ._auth import get_user_from_headers as _get_user_from_headers
+            with phase("auth"):
+                from ._auth import get_user_from_headers as _get_user_from_headers
+                user = _get_user_from_headers(self.headers)
         except Exception as ie:
             _json_response(self, 500, {"error": f"Auth module import failed: {str(ie)}"})
             return
-        user = _get_user_from_headers(self.headers)
         if not user:
             _json_response(self, 401, {"error": "Unauthorized"})
             return
         try:
+            # A retry carrying the same Idempotency-Key gets the first response back
+            replay = _idempotency.begin(self, "people.post", user)
+            if replay is not None:
+                _json_response(self, *replay)
+                return
             length = int(self.headers.get("Content-Length", "0"))
             body = self.rfile.read(length) if length > 0 else b"{}"
-            payload = json.loads(body.decode("utf-8") or "{}")
+            with phase("parse"):
+                payload = json.loads(body.decode("utf-8") or "{}")
             if not isinstance(payload, dict):
                 _json_response(self, 400, {"error": "Invalid person payload"})
                 return
@@ -484,13 +370,31 @@ class handler(BaseHTTPRequestHandler):
                 _json_response(self, 400, {"error": str(ve)})
                 return
 
-            # Load current rows from Blob and append
-            rows = store_get_rows()
             new_row = normalize_row(payload)
-            if not new_row.get("id"):
-                new_row["id"] = _gen_id_from_dt(datetime.now(timezone.utc))
-            rows.append(new_row)
-            store_set_rows(rows)
+            qs = parse_qs(urlparse(self.path).query or "")
+            check_duplicates = qs.get("allow_duplicate", ["0"])[0].lower() not in ("1", "true", "yes")
+
+            def add(rows: list) -> list:
+                # Runs on the latest stored rows, under the dataset write lock
+                if new_row.get("id") and any(isinstance(r, dict) and r.get("id") == new_row["id"] for r in rows):
+                    raise _Rejected(409, {"error": "A person with this id already exists", "id": new_row["id"]})
+                if check_duplicates:
+                    # Same folded name and birth date as an existing row: 409 unless ?allow_duplicate=1
+                    from ._dupes import get_index
+                    with phase("dupe-check"):
+                        duplicate_ids = get_index().lookup(new_row)
+                    if duplicate_ids:
+                        raise _Rejected(409, {
+                            "error": "A person with the same name and birth date already exists",
+                            "duplicate_ids": duplicate_ids,
+                        })
+                if not new_row.get("id"):
+                    new_row["id"] = _gen_id_from_dt(datetime.now(timezone.utc))
+                rows.append(new_row)
+                return rows
+
+            with phase("store-write"):
+                rows, version = store_update(add)
 
             # Create PR with JSON only
             try:
@@ -498,10 +402,12 @@ class handler(BaseHTTPRequestHandler):
                 pr_number, pr_url = create_pr_with_json(rows, title="Add person via UI")
             except Exception as pe:
                 # If PR fails, still return the updated data so UI updates; but indicate failure
-                _json_response(self, 201, {"data": rows, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"})
+                _mutation_response(self, rows, new_row, version, None, f"PR creation failed: {str(pe)}")
                 return
 
-            _json_response(self, 201, {"data": rows, "count": len(rows), "pr_url": pr_url})
+            _mutation_response(self, rows, new_row, version, pr_url)
+        except _Rejected as rj:
+            _json_response(self, rj.status, rj.payload)
         except json.JSONDecodeError:
             _json_response(self, 400, {"error": "Invalid JSON"})
         except Exception as e:
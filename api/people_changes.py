@@ -0,0 +1,80 @@
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from ._store import store_changes_since, store_version, store_wait
+from . import _timing
+from ._timing import phase
+
+# Incremental change feed for polling clients.
+# GET /api-py/people/changes?since=V
+#   {"version": N, "since": V, "changes": [{"v", "upserts", "removed"}, ...]}  entries after V, oldest first
+#   {"version": N, "since": V, "resync": true}                                  refetch /api-py/people
+# Apply each entry in order: rows in "upserts" replace the row with the same id or are
+# appended, ids in "removed" are dropped; the client is then at "version".
+#
+# Long-poll: with &wait=S (seconds, up to CHANGES_MAX_WAIT_SECONDS) a request that has nothing
+# new is held until a mutation commits or the wait ends, then answered as above (an empty
+# "changes" list on timeout). Waiters wake on this instance's writes immediately; writes on
+# other instances are picked up when the shared store cache refreshes (STORE_CACHE_TTL_SECONDS),
+# so any number of waiting browsers cost one Blob read per TTL per instance.
+#
+#   CHANGES_MAX_WAIT_SECONDS  upper bound for ?wait= (default 20; keep below the function timeout)
+CHANGES_MAX_WAIT_SECONDS = float(os.getenv("CHANGES_MAX_WAIT_SECONDS") or "20")
+
+POLL_SLICE_SECONDS = 1.0   # how often a waiter re-reads the store for other instances' writes
+
+
+def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict):
+    with phase("serialize"):
+        data = json.dumps(payload).encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json; charset=utf-8")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.send_header("Cache-Control", "no-cache")
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
+    handler.end_headers()
+    handler.wfile.write(data)
+    _timing.end(status, len(data))
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        _timing.begin("people.changes")
+        qs = parse_qs(urlparse(self.path).query or "")
+        try:
+            since = int((qs.get("since") or [""])[0])
+            if since < 0:
+                raise ValueError()
+        except ValueError:
+            _json_response(self, 400, {"error": "since must be a non-negative dataset version"})
+            return
+        try:
+            wait = max(0.0, min(CHANGES_MAX_WAIT_SECONDS, float((qs.get("wait") or ["0"])[0])))
+        except ValueError:
+            _json_response(self, 400, {"error": "wait must be a number of seconds"})
+            return
+        try:
+            with phase("store-read"):
+                changes = store_changes_since(since)
+            if changes == [] and wait > 0:
+                deadline = time.monotonic() + wait
+                with phase("wait"):
+                    while changes == []:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        store_wait(since, min(remaining, POLL_SLICE_SECONDS))
+                        changes = store_changes_since(since)
+            if changes is None:
+                payload = {"version": store_version(), "since": since, "resync": True}
+            else:
+                # The version the entries lead to (a write may have landed since they were read)
+                payload = {"version": changes[-1]["v"] if changes else since, "since": since, "changes": changes}
+            _json_response(self, 200, payload)
+        except Exception as e:
+            _json_response(self, 500, {"error": str(e)})
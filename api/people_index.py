@@ -1,22 +1,13 @@
 import json
 from http.server import BaseHTTPRequestHandler
+from typing import Optional
 from urllib.parse import urlparse, parse_qs
-import hashlib
-from datetime import datetime, timezone, timedelta
 
-from ._github import (
-    create_pr_with_json,
-    fetch_raw_json,
-    GITHUB_OWNER,
-    GITHUB_REPO,
-    GITHUB_BRANCH,
-    GITHUB_JSON_FILE_PATH,
-)
-from ._blob import is_blob_configured, get_json as blob_get_json, set_json as blob_set_json
-from ._auth import get_user_from_headers
-
-# In-memory dev storage when Blob is not configured
-_DEV_ROWS = None
+# _github and _auth are imported lazily: the module is loaded before any request is seen,
+# and _github is only needed after a successful mutation
+from ._store import store_update
+from . import _idempotency, _timing
+from ._timing import phase
 
 
 def normalize_row(row: dict) -> dict:
@@ -52,130 +43,195 @@ def validate_row(row: dict) -> None:
     _ = datetime.date(y, m, d)
 
 
-def _gen_id_from_dt(dt: datetime) -> str:
-    iso = dt.replace(tzinfo=timezone.utc).isoformat()
-    return hashlib.sha1(f"birthapp|{iso}".encode("utf-8")).hexdigest()
+def get_user_from_headers(headers):
+    from ._auth import get_user_from_headers as _get_user_from_headers
+    return _get_user_from_headers(headers)
+
+
+def create_pr_with_json(rows, title: str):
+    from ._github import create_pr_with_json as _create_pr_with_json
+    return _create_pr_with_json(rows, title=title)
 
 
-def _bootstrap_blob_from_github_if_empty() -> list:
+class _Rejected(Exception):
     """
-    If Blob is configured but currently empty or invalid, read JSON
-    from the repository (GITHUB_JSON_FILE_PATH) and write it into Blob.
-    Returns the rows read (possibly empty).
+    Raised inside a store_update() callback to answer with (status, payload) and write nothing.
     """
-    raw = fetch_raw_json(GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH)
-    if not raw:
-        return []
-    try:
-        parsed = json.loads(raw)
-        if isinstance(parsed, list):
-            blob_set_json(parsed)
-            return parsed
-    except Exception:
-        pass
-    return []
 
+    def __init__(self, status: int, payload: dict):
+        super().__init__(payload.get("error"))
+        self.status = status
+        self.payload = payload
 
-def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict):
-    data = json.dumps(payload).encode("utf-8")
+
+def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict, headers: Optional[dict] = None):
+    _idempotency.complete(status, payload)
+    with phase("serialize"):
+        data = json.dumps(payload).encode("utf-8")
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(data)))
+    for k, v in (headers or {}).items():
+        handler.send_header(k, v)
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
     handler.end_headers()
     handler.wfile.write(data)
+    _timing.end(status, len(data))
 
 
-def store_get_rows():
-    global _DEV_ROWS
-    if not is_blob_configured():
-        # Prefer in-memory ephemeral store for dev/unconfigured environments
-        if isinstance(_DEV_ROWS, list):
-            return _DEV_ROWS
-        # Local dev fallback: read from birthdays.json in repo root or CWD
-        candidates = []
-        try:
-            import os
-            here = os.path.dirname(__file__)
-            candidates.append(os.path.normpath(os.path.join(here, "..", "birthdays.json")))
-        except Exception:
-            pass
-        candidates.append("birthdays.json")
-        for p in candidates:
-            try:
-                with open(p, "r", encoding="utf-8") as f:
-                    parsed = json.load(f)
-                    if isinstance(parsed, list):
-                        return parsed
-            except Exception:
-                continue
-        # No local fallback, return empty list
-        return []
+def _wants_minimal(handler: BaseHTTPRequestHandler) -> bool:
+    """
+    Opt-in small mutation responses: `Prefer: return=minimal` (RFC 7240) or `?return=minimal`.
+    """
+    prefer = (handler.headers.get("Prefer") or "").replace(" ", "").lower()
+    if "return=minimal" in prefer.split(","):
+        return True
+    qs = parse_qs(urlparse(handler.path).query or "")
+    return (qs.get("return") or [""])[0].strip().lower() == "minimal"
+
+
+def _mutation_response(handler: BaseHTTPRequestHandler, op: str, rows: list, row: dict, index: int,
+                       version: int, pr_url, warning: Optional[str] = None):
+    """
+    200 with the whole dataset under "data", or in minimal mode only the affected row
+    (the removed one for a delete), its id and position, and the new dataset version.
+    """
+    headers = None
+    if _wants_minimal(handler):
+        payload = {
+            "op": op,
+            "row": row,
+            "id": (row.get("id") or "") if isinstance(row, dict) else "",
+            "index": index,
+            "version": version,
+            "count": len(rows),
+            "pr_url": pr_url,
+        }
+        headers = {"Preference-Applied": "return=minimal"}
+    else:
+        payload = {"data": rows, "count": len(rows), "pr_url": pr_url}
+    if warning:
+        payload["warning"] = warning
+    _json_response(handler, 200, payload, headers)
+
+
+def _target(handler: BaseHTTPRequestHandler) -> tuple:
+    """
+    (index, id) from ?index=# and ?id=; at least one is required.
+    """
+    qs = parse_qs(urlparse(handler.path).query or "")
+    row_id = (qs.get("id") or [""])[0].strip()
+    index_vals = qs.get("index", [])
+    if not index_vals:
+        if row_id:
+            return None, row_id
+        raise _Rejected(400, {"error": "Missing index"})
     try:
-        data = blob_get_json(default=None)
+        idx = int(index_vals[0])
+        if idx < 0:
+            raise ValueError()
     except Exception:
-        # Fallback when Blob GET errors (e.g., 405/403 or domain/permission issues)
-        if isinstance(_DEV_ROWS, list):
-            return _DEV_ROWS
-        return []
-    if isinstance(data, list):
-        # Backfill missing ids for existing rows and persist once if needed
-        needs = False
-        for r in data:
-            try:
-                if not (isinstance(r, dict) and (r.get("id") or "").strip()):
-                    needs = True
-                    break
-            except Exception:
-                continue
-        if needs:
-            base = datetime.now(timezone.utc)
-            idx = 0
-            for r in data:
-                try:
-                    if not (isinstance(r, dict) and (r.get("id") or "").strip()):
-                        r["id"] = _gen_id_from_dt(base + timedelta(minutes=idx))
-                        idx += 1
-                except Exception:
-                    pass
-            try:
-                store_set_rows(data)
-            except Exception:
-                pass
-        return data
-    # Attempt automatic bootstrap from GitHub JSON if Blob is empty/missing
-    rows = _bootstrap_blob_from_github_if_empty()
-    return rows
+        raise _Rejected(400, {"error": "Invalid index"})
+    return idx, row_id
 
 
-def store_set_rows(rows):
-    global _DEV_ROWS
-    if not is_blob_configured():
-        # Dev/unconfigured: keep rows in-memory to allow UI edits without Blob
-        try:
-            _DEV_ROWS = list(rows)
-        except Exception:
-            _DEV_ROWS = rows
+def _position(rows: list, idx: Optional[int], row_id: str) -> int:
+    """
+    Position of the target row in the latest rows. When the id is known it decides (the row
+    may have moved since the client loaded the list, e.g. after another user's delete) and
+    ?index= is only a hint; without an id the index is taken as is.
+    """
+    if row_id:
+        if idx is not None and idx < len(rows) and isinstance(rows[idx], dict) and rows[idx].get("id") == row_id:
+            return idx
+        for i, r in enumerate(rows):
+            if isinstance(r, dict) and r.get("id") == row_id:
+                return i
+        raise _Rejected(409, {"error": "Person not found; it may have been deleted, reload and retry", "id": row_id})
+    if idx is None or idx >= len(rows):
+        raise _Rejected(400, {"error": "Index out of range"})
+    return idx
+
+
+def _update(handler: BaseHTTPRequestHandler) -> None:
+    idx, row_id = _target(handler)
+
+    # Read JSON body for updated person
+    length = int(handler.headers.get("Content-Length", "0"))
+    body = handler.rfile.read(length) if length > 0 else b"{}"
+    with phase("parse"):
+        payload = json.loads(body.decode("utf-8") or "{}")
+    if not isinstance(payload, dict):
+        raise _Rejected(400, {"error": "Invalid person payload"})
+
+    # Validate
+    try:
+        validate_row(payload)
+    except Exception as ve:
+        raise _Rejected(400, {"error": str(ve)})
+
+    updated = normalize_row(payload)
+    row_id = row_id or updated.get("id") or ""
+    position = []
+
+    def put(rows: list) -> list:
+        # Runs on the latest stored rows, under the dataset write lock
+        i = _position(rows, idx, row_id)
+        existing_id = rows[i].get("id") if isinstance(rows[i], dict) else None
+        if not (updated.get("id") or "") and existing_id:
+            updated["id"] = existing_id
+        rows[i] = updated
+        position[:] = [i]
+        return rows
+
+    with phase("store-write"):
+        rows, version = store_update(put)
+
+    # Create PR with JSON only
+    try:
+        pr_number, pr_url = create_pr_with_json(rows, title="Update person via UI")
+    except Exception as pe:
+        _mutation_response(handler, "update", rows, updated, position[0], version, None, f"PR creation failed: {str(pe)}")
         return
-    # Blob configured but write may fail (405/403). Fallback to in-memory to avoid breaking the UI.
+
+    _mutation_response(handler, "update", rows, updated, position[0], version, pr_url)
+
+
+def _delete(handler: BaseHTTPRequestHandler) -> None:
+    idx, row_id = _target(handler)
+    removed = []
+
+    def pop(rows: list) -> list:
+        # Runs on the latest stored rows, under the dataset write lock
+        i = _position(rows, idx, row_id)
+        removed[:] = [i, rows.pop(i)]
+        return rows
+
+    with phase("store-write"):
+        rows, version = store_update(pop)
+
+    # Create PR with JSON only
     try:
-        blob_set_json(rows)
-    except Exception:
-        try:
-            _DEV_ROWS = list(rows)
-        except Exception:
-            _DEV_ROWS = rows
-        # swallow write error to keep UX working in dev/misconfigured envs
+        pr_number, pr_url = create_pr_with_json(rows, title="Delete person via UI")
+    except Exception as pe:
+        _mutation_response(handler, "delete", rows, removed[1], removed[0], version, None, f"PR creation failed: {str(pe)}")
         return
 
+    _mutation_response(handler, "delete", rows, removed[1], removed[0], version, pr_url)
+
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """
         Method override endpoint for hosts that don't forward PUT/DELETE to Python functions.
-        Use header: X-HTTP-Method-Override: PUT|DELETE and ?index=#
+        Use header: X-HTTP-Method-Override: PUT|DELETE and ?index=# (plus ?id= to target the row by id)
         """
+        _timing.begin("people_index.post")
         # Auth
-        user = get_user_from_headers(self.headers)
+        with phase("auth"):
+            user = get_user_from_headers(self.headers)
         if not user:
             _json_response(self, 401, {"error": "Unauthorized"})
             return
@@ -194,183 +250,56 @@ class handler(BaseHTTPRequestHandler):
             override = "PUT" if content_len > 0 else "DELETE"
 
         try:
-            # Parse index from query ?index=#
-            qs = parse_qs(urlparse(self.path).query or "")
-            index_vals = qs.get("index", [])
-            if not index_vals:
-                _json_response(self, 400, {"error": "Missing index"})
+            # Same key space as real PUT/DELETE, so a retry may switch transport
+            replay = _idempotency.begin(self, f"people_index.{override.lower()}", user)
+            if replay is not None:
+                _json_response(self, *replay)
                 return
-            try:
-                idx = int(index_vals[0])
-                if idx < 0:
-                    raise ValueError()
-            except Exception:
-                _json_response(self, 400, {"error": "Invalid index"})
-                return
-
-            rows = store_get_rows()
-
             if override == "PUT":
-                # Read JSON body for updated person
-                length = int(self.headers.get("Content-Length", "0"))
-                body = self.rfile.read(length) if length > 0 else b"{}"
-                payload = json.loads(body.decode("utf-8") or "{}")
-                if not isinstance(payload, dict):
-                    _json_response(self, 400, {"error": "Invalid person payload"})
-                    return
-
-                # Validate
-                try:
-                    validate_row(payload)
-                except Exception as ve:
-                    _json_response(self, 400, {"error": str(ve)})
-                    return
-
-                if idx >= len(rows):
-                    _json_response(self, 400, {"error": "Index out of range"})
-                    return
-
-                updated = normalize_row(payload)
-                try:
-                    existing_id = rows[idx].get("id")
-                except Exception:
-                    existing_id = None
-                if not (updated.get("id") or "") and existing_id:
-                    updated["id"] = existing_id
-                rows[idx] = updated
-                store_set_rows(rows)
-
-                # Create PR with JSON only
-                try:
-                    pr_number, pr_url = create_pr_with_json(rows, title="Update person via UI")
-                except Exception as pe:
-                    _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"})
-                    return
-
-                _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": pr_url})
-                return
-
-            if override == "DELETE":
-                if idx >= len(rows):
-                    _json_response(self, 400, {"error": "Index out of range"})
-                    return
-                rows.pop(idx)
-                store_set_rows(rows)
-
-                # Create PR with JSON only
-                try:
-                    pr_number, pr_url = create_pr_with_json(rows, title="Delete person via UI")
-                except Exception as pe:
-                    _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"})
-                    return
-
-                _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": pr_url})
-                return
-
-            _json_response(self, 405, {"error": "Method Not Allowed"})
+                _update(self)
+            else:
+                _delete(self)
+        except _Rejected as rj:
+            _json_response(self, rj.status, rj.payload)
         except json.JSONDecodeError:
             _json_response(self, 400, {"error": "Invalid JSON"})
         except Exception as e:
             _json_response(self, 500, {"error": str(e)})
 
     def do_PUT(self):
-        user = get_user_from_headers(self.headers)
+        _timing.begin("people_index.put")
+        with phase("auth"):
+            user = get_user_from_headers(self.headers)
         if not user:
             _json_response(self, 401, {"error": "Unauthorized"})
             return
         try:
-            # Parse index from query ?index=#
-            qs = parse_qs(urlparse(self.path).query or "")
-            index_vals = qs.get("index", [])
-            if not index_vals:
-                _json_response(self, 400, {"error": "Missing index"})
-                return
-            try:
-                idx = int(index_vals[0])
-                if idx < 0:
-                    raise ValueError()
-            except Exception:
-                _json_response(self, 400, {"error": "Invalid index"})
-                return
-
-            # Read JSON body for updated person
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length) if length > 0 else b"{}"
-            payload = json.loads(body.decode("utf-8") or "{}")
-            if not isinstance(payload, dict):
-                _json_response(self, 400, {"error": "Invalid person payload"})
-                return
-
-            # Validate
-            try:
-                validate_row(payload)
-            except Exception as ve:
-                _json_response(self, 400, {"error": str(ve)})
+            replay = _idempotency.begin(self, "people_index.put", user)
+            if replay is not None:
+                _json_response(self, *replay)
                 return
-
-            # Load current rows from KV, update at index
-            rows = store_get_rows()
-            if idx >= len(rows):
-                _json_response(self, 400, {"error": "Index out of range"})
-                return
-            updated = normalize_row(payload)
-            try:
-                existing_id = rows[idx].get("id")
-            except Exception:
-                existing_id = None
-            if not (updated.get("id") or "") and existing_id:
-                updated["id"] = existing_id
-            rows[idx] = updated
-            store_set_rows(rows)
-
-            # Create PR with JSON only
-            try:
-                pr_number, pr_url = create_pr_with_json(rows, title="Update person via UI")
-            except Exception as pe:
-                _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"})
-                return
-
-            _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": pr_url})
+            _update(self)
+        except _Rejected as rj:
+            _json_response(self, rj.status, rj.payload)
         except json.JSONDecodeError:
             _json_response(self, 400, {"error": "Invalid JSON"})
         except Exception as e:
             _json_response(self, 500, {"error": str(e)})
 
     def do_DELETE(self):
-        user = get_user_from_headers(self.headers)
+        _timing.begin("people_index.delete")
+        with phase("auth"):
+            user = get_user_from_headers(self.headers)
         if not user:
             _json_response(self, 401, {"error": "Unauthorized"})
             return
         try:
-            # Parse index from query ?index=#
-            qs = parse_qs(urlparse(self.path).query or "")
-            index_vals = qs.get("index", [])
-            if not index_vals:
-                _json_response(self, 400, {"error": "Missing index"})
+            replay = _idempotency.begin(self, "people_index.delete", user)
+            if replay is not None:
+                _json_response(self, *replay)
                 return
-            try:
-                idx = int(index_vals[0])
-                if idx < 0:
-                    raise ValueError()
-            except Exception:
-                _json_response(self, 400, {"error": "Invalid index"})
-                return
-
-            # Load current rows from KV and delete at index
-            rows = store_get_rows()
-            if idx >= len(rows):
-                _json_response(self, 400, {"error": "Index out of range"})
-                return
-            rows.pop(idx)
-            store_set_rows(rows)
-
-            # Create PR with JSON only
-            try:
-                pr_number, pr_url = create_pr_with_json(rows, title="Delete person via UI")
-            except Exception as pe:
-                _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": None, "warning": f"PR creation failed: {str(pe)}"})
-                return
-
-            _json_response(self, 200, {"data": rows, "count": len(rows), "pr_url": pr_url})
+            _delete(self)
+        except _Rejected as rj:
+            _json_response(self, rj.status, rj.payload)
         except Exception as e:
             _json_response(self, 500, {"error": str(e)})
@@ -0,0 +1,56 @@
+import json
+import os
+from http.server import BaseHTTPRequestHandler
+
+from . import _timing
+from ._timing import phase
+
+
+def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict):
+    with phase("serialize"):
+        data = json.dumps(payload).encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json; charset=utf-8")
+    handler.send_header("Content-Length", str(len(data)))
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
+    handler.end_headers()
+    handler.wfile.write(data)
+    _timing.end(status, len(data))
+
+
+def _authorized(handler: BaseHTTPRequestHandler) -> bool:
+    """
+    Accepts Authorization: Bearer <CRON_SECRET> (what Vercel Cron sends) or <BOOTSTRAP_TOKEN>.
+    """
+    auth = handler.headers.get("Authorization") or ""
+    if not auth.startswith("Bearer "):
+        return False
+    token = auth.split(" ", 1)[1].strip()
+    expected = [t for t in (os.getenv("CRON_SECRET"), os.getenv("BOOTSTRAP_TOKEN")) if t]
+    return bool(token) and token in expected
+
+
+class handler(BaseHTTPRequestHandler):
+    def _dispatch(self):
+        _timing.begin("reminders")
+        if not _authorized(self):
+            _json_response(self, 401, {"error": "Unauthorized"})
+            return
+        try:
+            from ._reminders import dispatch_due
+            with phase("dispatch"):
+                report = dispatch_due()
+            _json_response(self, 200, {"ok": True, **report})
+        except Exception as e:
+            _json_response(self, 500, {"error": str(e)})
+
+    def do_GET(self):
+        """
+        Deliver due birthday reminders (for a scheduler such as Vercel Cron).
+        """
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
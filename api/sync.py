@@ -1,25 +1,47 @@
 import json
 import os
+import time
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
-from ._blob import is_blob_configured, set_json as blob_set_json
+from ._store import (
+    diff_rows,
+    get_backend,
+    legacy_row_id,
+    migrate_dataset,
+    rows_digest,
+    store_apply_delta,
+    store_load_rows,
+    store_set_rows,
+    unwrap_document,
+)
 from ._github import (
-    fetch_raw_json,
+    fetch_raw_json_conditional,
     GITHUB_OWNER,
     GITHUB_REPO,
     GITHUB_BRANCH,
     GITHUB_JSON_FILE_PATH,
 )
+from . import _timing
+from ._timing import phase
+
+# Last successful sync, kept in KV so scheduled syncs can skip unchanged sources:
+# {"etag": "...", "sha256": "...", "synced_at": "...", "wrote": bool}
+SYNC_STATE_KEY = "sync:state"
 
 
 def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict):
-    data = json.dumps(payload).encode("utf-8")
+    with phase("serialize"):
+        data = json.dumps(payload).encode("utf-8")
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(data)))
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
     handler.end_headers()
     handler.wfile.write(data)
+    _timing.end(status, len(data))
 
 
 def _authorized(handler: BaseHTTPRequestHandler) -> bool:
@@ -54,33 +76,95 @@ def _authorized(handler: BaseHTTPRequestHandler) -> bool:
     return False
 
 
-def _load_rows_from_github() -> list:
-    raw = fetch_raw_json(GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH)
+def _parse_rows(raw: str) -> list:
     if not raw:
         # empty/missing treated as empty dataset
         return []
     try:
-        parsed = json.loads(raw)
+        with phase("parse"):
+            parsed = json.loads(raw)
     except Exception as e:
         raise RuntimeError(f"Invalid JSON in GitHub file {GITHUB_JSON_FILE_PATH}: {e}")
-    if not isinstance(parsed, list):
+    unwrapped = unwrap_document(parsed)
+    if unwrapped is None:
         raise RuntimeError(f"GitHub JSON {GITHUB_JSON_FILE_PATH} must be a JSON array of rows")
-    return parsed
+    return _with_legacy_ids(unwrapped[0])
+
+
+def _with_legacy_ids(rows: list) -> list:
+    # Deterministic ids for rows without one, so unchanged content hashes the same on every sync
+    for ordinal, r in enumerate(rows):
+        if isinstance(r, dict) and not (r.get("id") or "").strip():
+            r["id"] = legacy_row_id(r, ordinal)
+    return rows
+
+
+def _stored_rows() -> list:
+    """
+    What the store holds right now, including write-behind mutations not flushed yet
+    (bypasses the cache and never bootstraps).
+    """
+    return _with_legacy_ids(store_load_rows())
+
+
+DIFF_SAMPLE = 50
+
+
+def _diff_summary(diff: dict) -> dict:
+    """
+    Counts plus (at most DIFF_SAMPLE) affected ids per kind, for the JSON response.
+    """
+    ids = {
+        "added": [r["id"] for r in diff["added"]],
+        "removed": list(diff["removed"]),
+        "changed": [r["id"] for r in diff["changed"]],
+    }
+    out = {k: len(v) for k, v in ids.items()}
+    out["unchanged"] = diff["unchanged"]
+    out["ids"] = {k: v[:DIFF_SAMPLE] for k, v in ids.items()}
+    return out
+
+
+def _load_rows_from_github() -> list:
+    _, raw, _ = fetch_raw_json_conditional(GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH)
+    return _parse_rows(raw)
+
+
+def _load_sync_state() -> dict:
+    try:
+        from ._kv import kv_get_json
+        state = kv_get_json(SYNC_STATE_KEY, default=None)
+    except Exception:
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def _save_sync_state(state: dict) -> None:
+    try:
+        from ._kv import kv_set_json
+        kv_set_json(SYNC_STATE_KEY, state)
+    except Exception:
+        pass
 
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         """
-        Dry-run/status: fetch JSON from GitHub and report counts (no writes).
+        Dry-run/status: fetch JSON from GitHub and report counts plus the keyed diff
+        (added/removed/changed by id) against the stored rows (no writes).
         Auth required (same as POST).
         """
+        _timing.begin("sync.get")
         if not _authorized(self):
             _json_response(self, 401, {"error": "Unauthorized"})
             return
         try:
             rows = _load_rows_from_github()
+            with phase("diff"):
+                diff = _diff_summary(diff_rows(_stored_rows(), rows))
             _json_response(self, 200, {
                 "ok": True,
+                "diff": diff,
                 "github_owner": GITHUB_OWNER,
                 "github_repo": GITHUB_REPO,
                 "github_branch": GITHUB_BRANCH,
@@ -93,21 +177,95 @@ class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """
         Perform sync: load JSON from GitHub, write to Blob (runtime source of truth).
+        Skips the write when GitHub answers 304 for the last synced ETag and the store still
+        holds the synced content, or when the content hash matches what is stored;
+        ?force=1 always rewrites.
+        ?mode=delta writes only the keyed diff (added/changed/removed rows);
+        ?mode=upsert applies added/changed rows and keeps rows missing from GitHub.
+        With ?migrate=1, only upgrade the stored dataset to the current schema (one-time id backfill).
         Auth required via BOOTSTRAP_TOKEN.
         """
+        _timing.begin("sync.post")
         if not _authorized(self):
             _json_response(self, 401, {"error": "Unauthorized"})
             return
         try:
-            if not is_blob_configured():
-                _json_response(self, 500, {"error": "Blob is not configured (BLOB_BASE_URL, BLOB_READ_WRITE_TOKEN, BLOB_JSON_KEY)"})
+            if not get_backend().persistent:
+                _json_response(self, 500, {"error": "No persistent store configured: set Blob (BLOB_BASE_URL, BLOB_READ_WRITE_TOKEN, BLOB_JSON_KEY) or STORE_BACKEND=sqlite"})
                 return
 
-            rows = _load_rows_from_github()
-            blob_set_json(rows)
+            qs = parse_qs(urlparse(self.path).query or "")
+            if "migrate" in qs:
+                with phase("store-migrate"):
+                    report = migrate_dataset()
+                _json_response(self, 200, {"ok": True, **report})
+                return
+
+            # Conditional fetch: an unchanged GitHub file costs a 304 and one store read.
+            # ?force=1 skips both the ETag and the content-hash checks (recovery).
+            force = "force" in qs
+            mode = (qs.get("mode") or ["full"])[0]
+            if mode not in ("full", "delta", "upsert"):
+                _json_response(self, 400, {"error": "mode must be full, delta or upsert"})
+                return
+            state = {} if force else _load_sync_state()
+            status, raw, etag = fetch_raw_json_conditional(
+                GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH, etag=state.get("etag")
+            )
+            now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            if status == 304:
+                # GitHub is unchanged since the last sync, but the store may have been edited
+                # since: skip only while it still holds the content that was synced
+                with phase("diff"):
+                    in_sync = rows_digest(_stored_rows()) == state.get("sha256")
+                if in_sync:
+                    _json_response(self, 200, {
+                        "ok": True,
+                        "wrote": False,
+                        "reason": "not-modified",
+                        "etag": etag,
+                        "last_synced_at": state.get("synced_at"),
+                    })
+                    return
+                status, raw, etag = fetch_raw_json_conditional(
+                    GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH, GITHUB_JSON_FILE_PATH
+                )
+
+            rows = _parse_rows(raw)
+            digest = rows_digest(rows)
+            stored = _stored_rows()
+            with phase("diff"):
+                diff = diff_rows(stored, rows)
+            removed = diff["removed"] if mode == "delta" else []
+            if mode == "full":
+                wrote = force or rows_digest(stored) != digest
+                written = len(rows)
+            else:
+                upserts = diff["added"] + diff["changed"]
+                wrote = force or bool(upserts or removed)
+                written = len(upserts) + len(removed)
+            result = stored
+            if wrote:
+                with phase("store-write"):
+                    if mode == "full":
+                        store_set_rows(rows, strict=True)
+                        result = rows
+                    else:
+                        result, _ = store_apply_delta(upserts, removed, strict=True)
+            # The ETag may only short-circuit the next sync when the store now holds exactly the
+            # GitHub content. Upsert keeps rows missing from GitHub, so it never records one, and a
+            # delta on top of concurrent edits (or in a different order) does not either.
+            if mode != "upsert" and rows_digest(result) == digest:
+                _save_sync_state({"etag": etag, "sha256": digest, "synced_at": now, "wrote": wrote})
             _json_response(self, 200, {
                 "ok": True,
-                "written": len(rows),
+                "mode": mode,
+                "wrote": wrote,
+                "reason": ("forced" if force else "changed") if wrote else "unchanged",
+                "written": written if wrote else 0,
+                "diff": _diff_summary(diff),
+                "sha256": digest,
+                "etag": etag,
                 "github_owner": GITHUB_OWNER,
                 "github_repo": GITHUB_REPO,
                 "github_branch": GITHUB_BRANCH,
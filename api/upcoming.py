@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from ._calendar import birth_parts, next_occurrence
+from ._metrics import cache_hit, cache_miss
+from ._store import store_cached_version, store_find_by_months
+from . import _timing
+from ._timing import phase
+
+# "Today / this week" view for dashboards.
+# GET /api-py/upcoming?tz=Europe/Prague&days=7
+# The response is materialized once per (dataset version, local date, timezone, days) and
+# served as cached bytes until a mutation bumps the version or the local day changes.
+#
+#   UPCOMING_TZ  default timezone when ?tz= is not given (default: UTC)
+UPCOMING_TZ = (os.getenv("UPCOMING_TZ") or "UTC").strip()
+
+MAX_DAYS = 366
+MAX_VIEWS = 64
+
+_LOCK = threading.Lock()
+_VIEWS: Dict[tuple, Tuple[bytes, str]] = {}   # (version, date, tz, days) -> (body, etag)
+
+
+def _send(handler: BaseHTTPRequestHandler, status: int, data: bytes, headers: Optional[dict] = None):
+    handler.send_response(status)
+    if data or status != 304:
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(data)))
+    for k, v in (headers or {}).items():
+        handler.send_header(k, v)
+    timing = _timing.server_timing_header()
+    if timing:
+        handler.send_header("Server-Timing", timing)
+    handler.end_headers()
+    if data:
+        handler.wfile.write(data)
+    _timing.end(status, len(data))
+
+
+def _error(handler: BaseHTTPRequestHandler, status: int, message: str):
+    _send(handler, status, json.dumps({"error": message}).encode("utf-8"))
+
+
+def window_months(today, days: int) -> list:
+    """
+    Birth months that can fall within `days` days of `today`.
+    """
+    months, d = [], today
+    while (d - today).days < days:
+        if d.month not in months:
+            months.append(d.month)
+        d = (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def build_view(rows: list, today, days: int) -> dict:
+    """
+    Rows with a birthday within `days` days of `today` (0 = today), soonest first.
+    """
+    today_rows, upcoming = [], []
+    for r in rows:
+        parts = birth_parts(r)
+        if parts is None:
+            continue
+        year, month, day = parts
+        nxt = next_occurrence(month, day, today)
+        until = (nxt - today).days
+        if until >= days:
+            continue
+        item = {
+            "id": r.get("id") or "",
+            "first_name": r.get("first_name") or "",
+            "last_name": r.get("last_name") or "",
+            "date": nxt.isoformat(),
+            "days_until": until,
+            "age": (nxt.year - year) if year else None,
+        }
+        upcoming.append(item)
+        if until == 0:
+            today_rows.append(item)
+    upcoming.sort(key=lambda i: (i["days_until"], i["last_name"], i["first_name"]))
+    return {"today": today_rows, "upcoming": upcoming}
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        _timing.begin("upcoming")
+        qs = parse_qs(urlparse(self.path).query or "")
+        tz_name = (qs.get("tz") or [UPCOMING_TZ])[0].strip() or "UTC"
+        try:
+            days = max(1, min(MAX_DAYS, int((qs.get("days") or ["7"])[0])))
+        except ValueError:
+            _error(self, 400, "days must be an integer")
+            return
+        try:
+            from zoneinfo import ZoneInfo
+            tz = ZoneInfo(tz_name)
+        except Exception:
+            _error(self, 400, f"Unknown timezone: {tz_name}")
+            return
+
+        now = datetime.now(tz)
+        today = now.date()
+        # While the store cache is fresh its version alone decides whether the view is cached
+        version = store_cached_version(stale_ok=True)
+        with _LOCK:
+            cached = _VIEWS.get((version, today.isoformat(), tz_name, days)) if version is not None else None
+        if cached is None:
+            try:
+                with phase("store-read"):
+                    # Only the months in the window (an index/shard read where the backend has one);
+                    # rows and version are read together, so a view is never cached under another version
+                    rows, version = store_find_by_months(window_months(today, days), stale_ok=True)
+            except Exception as e:
+                _error(self, 500, str(e))
+                return
+        key = (version, today.isoformat(), tz_name, days)
+
+        if cached is None:
+            with _LOCK:
+                cached = _VIEWS.get(key)
+        if cached is not None:
+            cache_hit("upcoming")
+        else:
+            cache_miss("upcoming")
+            with phase("view-build"):
+                view = build_view(rows, today, days)
+                body = json.dumps({
+                    "date": today.isoformat(),
+                    "tz": tz_name,
+                    "days": days,
+                    "version": key[0],
+                    **view,
+                }).encode("utf-8")
+            cached = (body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"')
+            with _LOCK:
+                # Views of older versions can never be served again; past days age out by size
+                for k in [k for k in _VIEWS if k[0] != key[0]]:
+                    del _VIEWS[k]
+                if len(_VIEWS) >= MAX_VIEWS:
+                    _VIEWS.clear()
+                _VIEWS[key] = cached
+
+        body, etag = cached
+        headers = {
+            "ETag": etag,
+            # Revalidate on every poll: a cheap 304 until a mutation or local midnight
+            "Cache-Control": "no-cache",
+        }
+        if etag in [t.strip() for t in (self.headers.get("If-None-Match") or "").split(",")]:
+            _send(self, 304, b"", headers)
+            return
+        _send(self, 200, body, headers)
@@ -1,6 +1,6 @@
 function forwardHeaders(req: Request) {
   const headers = new Headers();
-  const toCopy = ['accept', 'content-type', 'authorization', 'cookie', 'x-forwarded-for'];
+  const toCopy = ['accept', 'content-type', 'authorization', 'cookie', 'x-forwarded-for', 'idempotency-key', 'prefer', 'if-match'];
   for (const k of toCopy) {
     const v = req.headers.get(k);
     if (v) headers.set(k, v);
@@ -8,7 +8,7 @@ function forwardHeaders(req: Request) {
   return headers;
 }
 
-async function proxy(method: 'GET' | 'POST', req: Request) {
+async function proxy(method: 'GET' | 'POST' | 'PATCH', req: Request) {
   const url = new URL(req.url);
   const target = `${url.origin}/api/json.py`;
   const init: RequestInit = {
@@ -16,7 +16,7 @@ async function proxy(method: 'GET' | 'POST', req: Request) {
     headers: forwardHeaders(req),
     cache: 'no-store',
   };
-  if (method === 'POST') {
+  if (method === 'POST' || method === 'PATCH') {
     init.body = await req.text();
   }
   const res = await fetch(target, init);
@@ -25,6 +25,10 @@ async function proxy(method: 'GET' | 'POST', req: Request) {
 
   const headers = new Headers();
   headers.set('content-type', res.headers.get('content-type') || 'application/json; charset=utf-8');
+  for (const k of ['preference-applied', 'idempotent-replayed', 'etag']) {
+    const v = res.headers.get(k);
+    if (v) headers.set(k, v);
+  }
   return new Response(outBody, { status: res.status, headers });
 }
 
@@ -61,3 +65,14 @@ export async function POST(req: Request) {
     });
   }
 }
+
+export async function PATCH(req: Request) {
+  try {
+    return await proxy('PATCH', req);
+  } catch (e: any) {
+    return new Response(JSON.stringify({ ok: false, error: 'json_proxy_failed', detail: e?.message || String(e) }), {
+      status: 500,
+      headers: { 'content-type': 'application/json; charset=utf-8' },
+    });
+  }
+}
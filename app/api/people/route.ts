@@ -1,7 +1,7 @@
 
 function forwardHeaders(req: Request) {
   const headers = new Headers();
-  const toCopy = ['accept', 'content-type', 'authorization', 'cookie', 'x-forwarded-for'];
+  const toCopy = ['accept', 'content-type', 'authorization', 'cookie', 'x-forwarded-for', 'idempotency-key', 'prefer'];
   for (const k of toCopy) {
     const v = req.headers.get(k);
     if (v) headers.set(k, v);
@@ -28,6 +28,10 @@ async function proxy(method: 'GET' | 'POST', req: Request) {
   // Mirror status and content-type from backend
   const headers = new Headers();
   headers.set('content-type', res.headers.get('content-type') || 'application/json; charset=utf-8');
+  for (const k of ['preference-applied', 'idempotent-replayed']) {
+    const v = res.headers.get(k);
+    if (v) headers.set(k, v);
+  }
   return new Response(outBody, { status: res.status, headers });
 }
 
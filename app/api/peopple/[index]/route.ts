@@ -1,6 +1,6 @@
 function forwardHeaders(req: Request) {
   const headers = new Headers();
-  const toCopy = ['accept', 'content-type', 'authorization', 'cookie', 'x-forwarded-for'];
+  const toCopy = ['accept', 'content-type', 'authorization', 'cookie', 'x-forwarded-for', 'idempotency-key', 'prefer'];
   for (const k of toCopy) {
     const v = req.headers.get(k);
     if (v) headers.set(k, v);
@@ -13,10 +13,13 @@ async function proxy(method: 'PUT' | 'DELETE', req: Request, index: string) {
   const reqHeaders = forwardHeaders(req);
   reqHeaders.set('X-HTTP-Method-Override', method);
   const base = url.origin;
+  // The row id (when given) lets the backend find the row even if its position changed
+  const id = url.searchParams.get('id');
+  const idParam = id ? `&id=${encodeURIComponent(id)}` : '';
   const targets = [
-    `${base}/api/people_index.py?index=${encodeURIComponent(index)}&method=${encodeURIComponent(method)}`,
-    `${base}/api-py/people/${encodeURIComponent(index)}?method=${encodeURIComponent(method)}`,
-    `${base}/api-py/people/${encodeURIComponent(index)}`
+    `${base}/api/people_index.py?index=${encodeURIComponent(index)}&method=${encodeURIComponent(method)}${idParam}`,
+    `${base}/api-py/people/${encodeURIComponent(index)}?method=${encodeURIComponent(method)}${idParam}`,
+    `${base}/api-py/people/${encodeURIComponent(index)}${id ? `?id=${encodeURIComponent(id)}` : ''}`
   ];
   const initBase: RequestInit = {
     method: 'POST',
@@ -41,6 +44,10 @@ async function proxy(method: 'PUT' | 'DELETE', req: Request, index: string) {
       const outBody = text && text.length ? text : (!res.ok ? JSON.stringify({ ok: false, status: res.status, error: 'empty_error_body_from_backend', target: t }) : text);
       const respHeaders = new Headers();
       respHeaders.set('content-type', res.headers.get('content-type') || 'application/json; charset=utf-8');
+      for (const k of ['preference-applied', 'idempotent-replayed']) {
+        const v = res.headers.get(k);
+        if (v) respHeaders.set(k, v);
+      }
       return new Response(outBody, { status: res.status, headers: respHeaders });
     }
     tried.push({ url: t, status: res.status, body: (text || '').slice(0, 400) });
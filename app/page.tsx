@@ -3,6 +3,7 @@
 import { useEffect, useMemo, useState } from 'react';
 
 type Row = {
+  id?: string;
   first_name: string;
   last_name: string;
   day: string;
@@ -24,6 +25,29 @@ type Period =
   | 'next-year';
 
 
+// One entry of the server's change feed (/api-py/people/changes)
+type Change = { v: number; upserts?: Row[]; removed?: string[] };
+
+// Same rules as the server: upserts replace the row with the same id or are appended, removed ids are dropped
+function applyChange(rows: Row[], change: Change): Row[] {
+  const out = [...rows];
+  const pos = new Map<string, number>();
+  out.forEach((r, i) => {
+    if (r.id) pos.set(r.id, i);
+  });
+  for (const r of change.upserts || []) {
+    const i = r.id ? pos.get(r.id) : undefined;
+    if (i === undefined) {
+      if (r.id) pos.set(r.id, out.length);
+      out.push(r);
+    } else {
+      out[i] = r;
+    }
+  }
+  const drop = new Set(change.removed || []);
+  return drop.size ? out.filter((r) => !(r.id && drop.has(r.id))) : out;
+}
+
 const HEADER_KEYS: (keyof Row)[] = ['first_name', 'last_name', 'day', 'month', 'year'];
 
 function ensureString(v: unknown) {
@@ -196,6 +220,7 @@ export default function Page() {
   const [apiBase, setApiBase] = useState<string>('/api');
   const [backendReachable, setBackendReachable] = useState<boolean>(false);
   const [rows, setRows] = useState<Row[]>([]);
+  const [version, setVersion] = useState<number | null>(null);
   const [activePeriod, setActivePeriod] = useState<Period>('all');
   const [modulo, setModulo] = useState<'none' | '5' | '10'>('none');
   const [currentSort, setCurrentSort] = useState<{ type: SortKey; order: 'asc' | 'desc' }[]>([]);
@@ -228,10 +253,11 @@ export default function Page() {
           return;
         }
         if (!res.ok) throw new Error(`GET /people failed ${res.status}`);
-        const json = (await res.json()) as { data?: Row[] };
+        const json = (await res.json()) as { data?: Row[]; version?: number };
         if (!aborted) {
           setBackendReachable(true);
           setRows(Array.isArray(json.data) ? json.data : []);
+          setVersion(typeof json.version === 'number' ? json.version : null);
         }
         return;
       } catch {
@@ -244,6 +270,49 @@ export default function Page() {
     };
   }, [apiBase]);
 
+  // Live updates: long-poll the change feed and patch rows in place, so edits made in other
+  // browsers show up without a reload or a full refetch
+  useEffect(() => {
+    if (!backendReachable || version == null) return;
+    let stopped = false;
+    let since = version;
+    async function follow() {
+      while (!stopped) {
+        try {
+          const res = await fetch(`/api-py/people/changes?since=${since}&wait=20`, {
+            headers: { Accept: 'application/json' },
+            credentials: 'include',
+            cache: 'no-store',
+          });
+          if (!res.ok) throw new Error(`GET /people/changes failed ${res.status}`);
+          const json = (await res.json()) as { version: number; resync?: boolean; changes?: Change[] };
+          if (stopped) return;
+          if (json.resync) {
+            const full = await fetch(`${apiBase}/people`, {
+              headers: { Accept: 'application/json' },
+              credentials: 'include',
+            });
+            if (!full.ok) throw new Error(`GET /people failed ${full.status}`);
+            const body = (await full.json()) as { data?: Row[]; version?: number };
+            if (stopped) return;
+            setRows(Array.isArray(body.data) ? body.data : []);
+            since = typeof body.version === 'number' ? body.version : json.version;
+            continue;
+          }
+          const changes = json.changes || [];
+          if (changes.length) setRows((prev) => changes.reduce(applyChange, prev));
+          since = json.version;
+        } catch {
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
+      }
+    }
+    follow();
+    return () => {
+      stopped = true;
+    };
+  }, [backendReachable, version, apiBase]);
+
   // Derived filtered rows by period and modulo
   const filteredRows = useMemo(() => {
     let out = [...rows];
@@ -422,7 +491,8 @@ export default function Page() {
     if (editingIndex !== index) return;
     if (backendReachable) {
       try {
-        const res = await fetch(`/api/people_index.py?index=${index}`, {
+        const id = filteredRows[index]?.id;
+        const res = await fetch(`/api/people_index.py?index=${index}${id ? `&id=${encodeURIComponent(id)}` : ''}`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json', 'X-HTTP-Method-Override': 'PUT' },
           credentials: 'include',
@@ -453,7 +523,8 @@ export default function Page() {
   async function handleDelete(index: number) {
     if (backendReachable) {
       try {
-        const res = await fetch(`/api/people_index.py?index=${index}`, {
+        const id = filteredRows[index]?.id;
+        const res = await fetch(`/api/people_index.py?index=${index}${id ? `&id=${encodeURIComponent(id)}` : ''}`, {
           method: 'POST',
           headers: { 'X-HTTP-Method-Override': 'DELETE' },
           credentials: 'include',
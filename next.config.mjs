@@ -7,14 +7,19 @@ const nextConfig = {
   async rewrites() {
     return [
       { source: '/api-py/health', destination: '/api/health.py' },
+      { source: '/api-py/health/metrics', destination: '/api/health.py?metrics=1' },
       { source: '/api-py/people', destination: '/api/people.py' },
       { source: '/api-py/people-plain', destination: '/api/people_plain.py' },
+      { source: '/api-py/upcoming', destination: '/api/upcoming.py' },
+      { source: '/api-py/calendar.ics', destination: '/api/ics.py' },
+      { source: '/api-py/people/changes', destination: '/api/people_changes.py' },
       { source: '/api-py/people/:index', destination: '/api/people_index.py?index=:index' },
       { source: '/api-py/json', destination: '/api/json.py' },
       { source: '/api-py/auth/login', destination: '/api/auth/login.py' },
       { source: '/api-py/auth/invite', destination: '/api/auth/invite.py' },
       { source: '/api-py/auth/register', destination: '/api/auth/register.py' },
-      { source: '/api-py/sync', destination: '/api/sync.py' }
+      { source: '/api-py/sync', destination: '/api/sync.py' },
+      { source: '/api-py/reminders', destination: '/api/reminders.py' }
     ];
   }
 };
@@ -0,0 +1,122 @@
+"""
+Cold-start import budget for the Python functions under api/.
+
+Each handler module is imported in a fresh interpreter with `-X importtime`
+(what a cold serverless instance pays before the first request). We report the
+median marginal import cost on top of `json` and `http.server`, which every
+handler needs anyway, and check two budgets:
+
+  - budget_ms: marginal import time allowed for the module
+  - forbid:    modules that must NOT be loaded at import time (backend clients
+               and auth that the cheapest paths never touch)
+
+Usage:
+  python scripts/bench_imports.py            # table, exit 1 when over budget
+  python scripts/bench_imports.py --runs 9 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+BASELINE = ("json", "http.server")
+
+BUDGETS = {
+    # Unauthenticated GET path: no auth, no GitHub client, no urllib.request until a Blob call is made
+    "api.people": {"budget_ms": 20.0, "forbid": ["api._auth", "api._kv", "api._github", "urllib.request", "hmac", "secrets"]},
+    "api.health": {"budget_ms": 10.0, "forbid": ["api._auth", "api._kv", "api._github", "api._blob", "urllib.request"]},
+    "api.upcoming": {"budget_ms": 20.0, "forbid": ["api._auth", "api._kv", "api._github", "urllib.request", "zoneinfo"]},
+    "api.ics": {"budget_ms": 20.0, "forbid": ["api._auth", "api._kv", "api._github", "urllib.request"]},
+    "api.people_changes": {"budget_ms": 20.0, "forbid": ["api._auth", "api._kv", "api._github", "urllib.request"]},
+    "api.people_plain": {"budget_ms": 3.0, "forbid": ["api._auth", "api._kv", "api._github", "api._blob", "urllib.request"]},
+    # Authenticated routes: auth is loaded on the first request, GitHub only after a write
+    "api.people_index": {"budget_ms": 15.0, "forbid": ["api._auth", "api._github", "urllib.request", "secrets"]},
+    "api.json": {"budget_ms": 15.0, "forbid": ["api._auth", "api._github", "urllib.request", "secrets"]},
+    "api.sync": {"budget_ms": 15.0, "forbid": ["api._auth", "urllib.request"]},
+}
+
+
+def _import_profile(module: str) -> dict:
+    """
+    Import `module` in a fresh interpreter and return {name: cumulative_us}.
+    """
+    proc = subprocess.run(
+        # Baseline modules are imported first, so the module's own line is its marginal cost
+        # regardless of the order in which it imports its dependencies
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(BASELINE)}; import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    out = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = [p.strip() for p in line.split(":", 1)[1].split("|")]
+            out[name] = int(cumulative)
+        except ValueError:
+            continue  # header line
+    return out
+
+
+def measure(module: str, runs: int) -> dict:
+    marginal = []
+    loaded = set()
+    for _ in range(runs):
+        prof = _import_profile(module)
+        loaded |= set(prof)
+        marginal.append(prof.get(module, 0) / 1000.0)
+    return {"marginal_ms": statistics.median(marginal), "loaded": loaded}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters per module (median is reported)")
+    ap.add_argument("--json", action="store_true", help="print machine-readable results")
+    ap.add_argument("modules", nargs="*", help="subset of modules to measure")
+    args = ap.parse_args()
+
+    # Warm the bytecode cache once so we measure imports, not compilation
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "api"], cwd=ROOT, check=False)
+
+    results = []
+    failed = False
+    for module in args.modules or list(BUDGETS):
+        spec = BUDGETS.get(module, {"budget_ms": float("inf"), "forbid": []})
+        m = measure(module, args.runs)
+        violations = sorted(f for f in spec["forbid"] if f in m["loaded"])
+        over = m["marginal_ms"] > spec["budget_ms"]
+        failed = failed or over or bool(violations)
+        results.append({
+            "module": module,
+            "marginal_ms": round(m["marginal_ms"], 2),
+            "budget_ms": spec["budget_ms"],
+            "over_budget": over,
+            "forbidden_loaded": violations,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'module':<20} {'import ms':>10} {'budget':>8}  status")
+        for r in results:
+            status = "ok"
+            if r["over_budget"]:
+                status = "OVER BUDGET"
+            if r["forbidden_loaded"]:
+                status = (status + "; " if status != "ok" else "") + "loads " + ", ".join(r["forbidden_loaded"])
+            print(f"{r['module']:<20} {r['marginal_ms']:>10.2f} {r['budget_ms']:>8.1f}  {status}")
+        print(f"(median of {args.runs} fresh interpreters, marginal over {' + '.join(BASELINE)})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
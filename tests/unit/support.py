@@ -0,0 +1,140 @@
+import json
+import re
+import unittest
+from unittest import mock
+
+from api import _kv, _store
+
+
+class FakeKv:
+    """
+    In-memory stand-in for the Upstash REST endpoint (_kv._command): the strings, lists and
+    EVAL scripts the store engine uses (write lock, conditional journal append).
+    """
+
+    def __init__(self):
+        self.strings = {}
+        self.lists = {}
+        self.calls = []
+
+    def __call__(self, *args):
+        op = args[0]
+        self.calls.append(op)
+        if op == "SET":
+            key, value = args[1], args[2]
+            if "NX" in args and key in self.strings:
+                return None
+            self.strings[key] = value
+            return "OK"
+        if op == "DEL":
+            return 1 if self.strings.pop(args[1], None) is not None else 0
+        if op == "RPUSH":
+            self.lists.setdefault(args[1], []).extend(args[2:])
+            return len(self.lists[args[1]])
+        if op in ("LRANGE", "LTRIM"):
+            items = self.lists.get(args[1], [])
+            start, stop = int(args[2]), int(args[3])
+            picked = items[start:len(items) + stop + 1 if stop < 0 else stop + 1]
+            if op == "LRANGE":
+                return picked
+            self.lists[args[1]] = picked
+            return "OK"
+        if op == "EVAL":
+            script, keys = args[1], args[3:3 + int(args[2])]
+            values = args[3 + int(args[2]):]
+            if "LINDEX" in script:
+                # Journal append: only on top of the expected version
+                items = self.lists.setdefault(keys[0], [])
+                if items:
+                    v = int(re.match(r'^\{"v":(\d+)', items[-1]).group(1))
+                    if v != int(values[1]):
+                        return v
+                items.append(values[0])
+                return -1
+            # Delete-if-equal (write lock release)
+            if self.strings.get(keys[0]) == values[0]:
+                del self.strings[keys[0]]
+                return 1
+            return 0
+        raise AssertionError(f"unexpected KV command {op}")
+
+    def push_entry(self, entry: dict) -> None:
+        from api._journal import JOURNAL_KV_KEY
+        self.lists.setdefault(JOURNAL_KV_KEY, []).append(json.dumps(entry, separators=(",", ":")))
+
+    def journal(self) -> list:
+        from api._journal import JOURNAL_KV_KEY
+        return [json.loads(raw) for raw in self.lists.get(JOURNAL_KV_KEY, [])]
+
+
+class RemoteBackend:
+    """
+    A Blob-like backend (persistent, TTL-cached, shared by every instance) holding one document.
+    """
+
+    name = "blob"
+    persistent = True
+    cache_ttl = 5.0
+
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.loads = 0
+        self.saves = 0
+
+    def load(self):
+        self.loads += 1
+        return json.loads(json.dumps(self.doc)) if self.doc is not None else None
+
+    def save(self, doc: dict) -> None:
+        self.saves += 1
+        self.doc = json.loads(json.dumps(doc))
+
+
+class StoreTestCase(unittest.TestCase):
+    """
+    Runs every test against a clean store engine using `self.backend`; KV is the dev
+    fallback unless a test calls use_fake_kv().
+    """
+
+    def make_backend(self):
+        return _store.MemoryBackend()
+
+    def setUp(self):
+        self.backend = self.make_backend()
+        for name, value in (
+            ("_BACKEND", self.backend),
+            ("_ROWS", None),
+            ("_META", {}),
+            ("_LOADED_AT", 0.0),
+            ("_VERSION", 0),
+            ("_WRITES", 0),
+            ("_LOADING", None),
+            ("_JOURNAL", None),
+            ("_FLUSH_TIMER", None),
+            ("_SUBSCRIBERS", []),
+            ("STORE_STALE_SECONDS", 0.0),
+        ):
+            patcher = mock.patch.object(_store, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for patcher in (
+            mock.patch.object(_kv, "USE_DEV_KV", True),
+            mock.patch.dict(_kv._DEV_STORE, clear=True),
+            mock.patch.dict(_kv._DEV_EXPIRY, clear=True),
+            mock.patch.dict(_kv._DEV_LISTS, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self._cancel_flush)
+
+    def _cancel_flush(self):
+        timer = _store._FLUSH_TIMER
+        if timer is not None:
+            timer.cancel()
+
+    def use_fake_kv(self) -> FakeKv:
+        kv = FakeKv()
+        for patcher in (mock.patch.object(_kv, "USE_DEV_KV", False), mock.patch.object(_kv, "_command", kv)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return kv
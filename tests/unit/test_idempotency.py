@@ -0,0 +1,92 @@
+import io
+import json
+import unittest
+
+from api import _idempotency, _kv, _timing
+from api._store import store_set_rows
+
+from support import StoreTestCase
+
+USER = {"sub": "u1", "role": "admin"}
+
+
+class Request:
+    def __init__(self, key, body=b"", path="/api-py/people"):
+        self.path = path
+        self.headers = {"Content-Length": str(len(body))}
+        if key is not None:
+            self.headers["Idempotency-Key"] = key
+        self.rfile = io.BytesIO(body)
+
+
+class IdempotencyTest(StoreTestCase):
+    def _run(self, request, status=None, payload=None, route="people.post", user=USER):
+        """
+        One request: begin(), then (when it proceeds) complete() with the handler's response.
+        """
+        _timing.begin(route)
+        result = _idempotency.begin(request, route, user)
+        if result is None and status is not None:
+            _idempotency.complete(status, payload)
+        return result
+
+    def test_without_a_key_nothing_is_recorded(self):
+        self.assertIsNone(self._run(Request(None, b"{}"), 201, {"ok": True}))
+        self.assertEqual(_kv._DEV_STORE, {})
+
+    def test_retry_replays_the_stored_response(self):
+        body = json.dumps({"first_name": "Ann"}).encode("utf-8")
+        self.assertIsNone(self._run(Request("k1", body), 201, {"ok": True, "id": "a", "version": 4}))
+        request = Request("k1", body)
+        status, payload, headers = self._run(request)
+        self.assertEqual((status, payload), (201, {"ok": True, "id": "a", "version": 4}))
+        self.assertEqual(headers, {"Idempotent-Replayed": "true"})
+        # The body was put back for the handler
+        self.assertEqual(request.rfile.read(), body)
+
+    def test_same_key_other_payload_is_rejected(self):
+        self._run(Request("k1", b'{"first_name": "Ann"}'), 201, {"ok": True})
+        status, payload, _ = self._run(Request("k1", b'{"first_name": "Bob"}'))
+        self.assertEqual(status, 422)
+        self.assertIn("different request", payload["error"])
+
+    def test_method_override_hints_do_not_change_the_fingerprint(self):
+        self._run(Request("k1", b"{}", path="/api-py/people?id=a"), 200, {"ok": True})
+        status, _, _ = self._run(Request("k1", b"{}", path="/api-py/people?_method=PATCH&id=a"))
+        self.assertEqual(status, 200)
+        status, _, _ = self._run(Request("k1", b"{}", path="/api-py/people?id=b"))
+        self.assertEqual(status, 422)
+
+    def test_in_flight_key(self):
+        self.assertIsNone(self._run(Request("k1", b"{}")))
+        status, _, headers = self._run(Request("k1", b"{}"))
+        self.assertEqual(status, 409)
+        self.assertEqual(headers, {"Retry-After": "1"})
+
+    def test_error_releases_the_key(self):
+        self._run(Request("k1", b"{}"), 409, {"error": "Duplicate"})
+        self.assertEqual(_kv._DEV_STORE, {})
+        self.assertIsNone(self._run(Request("k1", b"{}"), 201, {"ok": True}))
+
+    def test_keys_are_scoped_per_route_and_user(self):
+        self._run(Request("k1", b"{}"), 201, {"ok": True})
+        self.assertIsNone(self._run(Request("k1", b"{}"), route="people.delete"))
+        self.assertIsNone(self._run(Request("k1", b"{}"), user={"sub": "u2"}))
+
+    def test_dataset_is_not_stored_and_replays_current_rows(self):
+        store_set_rows([{"id": "a"}])
+        self._run(Request("k1", b"[]"), 200, {"ok": True, "count": 1, "data": [{"id": "a"}]})
+        stored = json.loads(next(iter(_kv._DEV_STORE.values())))
+        self.assertNotIn("data", stored["payload"])
+        store_set_rows([{"id": "a"}, {"id": "b"}])
+        status, payload, _ = self._run(Request("k1", b"[]"))
+        self.assertEqual(payload["data"], [{"id": "a"}, {"id": "b"}])
+        self.assertEqual(payload["count"], 2)
+
+    def test_overlong_key(self):
+        status, _, _ = self._run(Request("k" * (_idempotency.MAX_KEY_LENGTH + 1), b"{}"))
+        self.assertEqual(status, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
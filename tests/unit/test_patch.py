@@ -0,0 +1,124 @@
+import unittest
+
+from api._patch import PatchError, apply_json_patch, apply_merge_patch
+
+
+def _rows():
+    return [
+        {"id": "a", "first_name": "Ann", "last_name": "A", "day": "1", "month": "2", "year": "1990"},
+        {"id": "b", "first_name": "Bob", "last_name": "B", "day": "3", "month": "4", "year": ""},
+        {"id": "c", "first_name": "Cid", "last_name": "C", "day": "5", "month": "6", "year": ""},
+    ]
+
+
+class JsonPatchTest(unittest.TestCase):
+    def assertRejected(self, ops, status=400, rows=None):
+        with self.assertRaises(PatchError) as cm:
+            apply_json_patch(_rows() if rows is None else rows, ops)
+        self.assertEqual(cm.exception.status, status)
+        return str(cm.exception)
+
+    def test_input_is_never_modified(self):
+        rows = _rows()
+        apply_json_patch(rows, [{"op": "replace", "path": "/0/year", "value": "1991"}, {"op": "remove", "path": "/1"}])
+        self.assertEqual(rows, _rows())
+
+    def test_test_op_passes_and_touches_nothing(self):
+        out, touched = apply_json_patch(_rows(), [
+            {"op": "test", "path": "/1/first_name", "value": "Bob"},
+            {"op": "test", "path": "/0", "value": _rows()[0]},
+        ])
+        self.assertEqual(out, _rows())
+        self.assertEqual(touched, [])
+
+    def test_failed_test_is_a_conflict_and_aborts_everything(self):
+        rows = _rows()
+        self.assertRejected([
+            {"op": "replace", "path": "/0/year", "value": "2000"},
+            {"op": "test", "path": "/1/first_name", "value": "Robert"},
+        ], status=409, rows=rows)
+        self.assertEqual(rows, _rows())
+
+    def test_test_of_a_missing_path(self):
+        self.assertRejected([{"op": "test", "path": "/1/nickname", "value": "B"}])
+        self.assertRejected([{"op": "test", "path": "/3", "value": {}}])
+
+    def test_test_requires_a_value(self):
+        self.assertIn("missing value", self.assertRejected([{"op": "test", "path": "/0/year"}]))
+
+    def test_move_row_forward(self):
+        # RFC 6902: the value is removed first, so the target index is into the shortened array
+        out, touched = apply_json_patch(_rows(), [{"op": "move", "from": "/0", "path": "/2"}])
+        self.assertEqual([r["id"] for r in out], ["b", "c", "a"])
+        self.assertEqual([r["id"] for r in touched], ["a"])
+
+    def test_move_row_to_the_end(self):
+        out, _ = apply_json_patch(_rows(), [{"op": "move", "from": "/0", "path": "/-"}])
+        self.assertEqual([r["id"] for r in out], ["b", "c", "a"])
+
+    def test_move_row_past_the_end(self):
+        self.assertRejected([{"op": "move", "from": "/0", "path": "/3"}])
+
+    def test_move_field_between_rows(self):
+        out, touched = apply_json_patch(_rows(), [{"op": "move", "from": "/0/year", "path": "/1/year"}])
+        self.assertNotIn("year", out[0])
+        self.assertEqual(out[1]["year"], "1990")
+        self.assertEqual([r["id"] for r in touched], ["a", "b"])
+
+    def test_move_from_a_missing_path(self):
+        self.assertRejected([{"op": "move", "from": "/0/nickname", "path": "/1/year"}])
+        self.assertRejected([{"op": "move", "path": "/1/year"}])
+
+    def test_move_row_into_a_field(self):
+        self.assertIn("must be a string", self.assertRejected([{"op": "move", "from": "/0", "path": "/1/first_name"}]))
+
+    def test_copy_leaving_a_duplicate_id(self):
+        self.assertIn("same id", self.assertRejected([{"op": "copy", "from": "/0", "path": "/-"}]))
+
+    def test_escaped_pointer_tokens(self):
+        self.assertIn("'a/b'", self.assertRejected([{"op": "add", "path": "/0/a~1b", "value": "x"}]))
+
+    def test_leading_zero_index(self):
+        self.assertRejected([{"op": "remove", "path": "/01"}])
+
+    def test_non_string_value(self):
+        message = self.assertRejected([{"op": "replace", "path": "/0/day", "value": 5}])
+        self.assertEqual(message, "Operation 0: Field 'day' must be a string")
+
+    def test_unknown_field(self):
+        self.assertRejected([{"op": "add", "path": "/0/role", "value": "admin"}])
+        self.assertRejected([{"op": "add", "path": "/-", "value": {"id": "d", "role": "admin"}}])
+
+    def test_whole_dataset(self):
+        self.assertRejected([{"op": "replace", "path": "", "value": []}])
+
+
+class MergePatchTest(unittest.TestCase):
+    def test_merge_remove_and_add(self):
+        out, touched, removed = apply_merge_patch(_rows(), {
+            "a": {"year": None, "last_name": "Z"},
+            "b": None,
+            "d": {"first_name": "Dee", "last_name": "D", "day": "7", "month": "8"},
+        })
+        self.assertEqual([r["id"] for r in out], ["a", "c", "d"])
+        self.assertEqual(out[0], {"id": "a", "first_name": "Ann", "last_name": "Z", "day": "1", "month": "2"})
+        self.assertEqual([r["id"] for r in touched], ["a", "d"])
+        self.assertEqual(removed, ["b"])
+
+    def test_unknown_id_removal_is_a_conflict(self):
+        with self.assertRaises(PatchError) as cm:
+            apply_merge_patch(_rows(), {"zz": None})
+        self.assertEqual(cm.exception.status, 409)
+
+    def test_non_string_value(self):
+        with self.assertRaises(PatchError) as cm:
+            apply_merge_patch(_rows(), {"a": {"day": 5}})
+        self.assertEqual((cm.exception.status, str(cm.exception)), (400, "Row a: Field 'day' must be a string"))
+
+    def test_unknown_field(self):
+        with self.assertRaises(PatchError):
+            apply_merge_patch(_rows(), {"a": {"role": "admin"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
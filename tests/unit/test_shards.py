@@ -0,0 +1,142 @@
+import json
+import unittest
+from unittest import mock
+
+from api import _blob
+from api._shards import MANIFEST_KEY, POS_STEP, ShardedBlobBackend, _positions, shard_key
+from api._store import wrap_document
+
+
+def _ids(rows):
+    return [r["id"] for r in rows]
+
+
+def _row(i, month):
+    return {"id": f"r{i}", "first_name": f"N{i}", "month": str(month), "day": "1"}
+
+
+class PositionsTest(unittest.TestCase):
+    def test_fresh_rows_are_evenly_spaced(self):
+        rows = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+        self.assertEqual(_positions(rows, {}), [POS_STEP, 2 * POS_STEP, 3 * POS_STEP])
+
+    def test_stored_rows_keep_their_positions(self):
+        previous = {"a": [1024], "b": [2048]}
+        rows = [{"id": "a"}, {"id": "new"}, {"id": "b"}, {"id": "tail"}]
+        self.assertEqual(_positions(rows, previous), [1024, 1536, 2048, 2048 + POS_STEP])
+
+    def test_inserts_in_front_take_free_positions(self):
+        previous = {"a": [1024]}
+        out = _positions([{"id": "x"}, {"id": "y"}, {"id": "a"}], previous)
+        self.assertEqual(out[-1], 1024)
+        self.assertTrue(0 < out[0] < out[1] < 1024)
+
+    def test_reorder_renumbers(self):
+        previous = {"a": [1024], "b": [2048]}
+        self.assertEqual(_positions([{"id": "b"}, {"id": "a"}], previous), [POS_STEP, 2 * POS_STEP])
+
+    def test_no_room_renumbers(self):
+        previous = {"a": [1], "b": [2]}
+        self.assertEqual(_positions([{"id": "a"}, {"id": "x"}, {"id": "b"}], previous), [1024, 2048, 3072])
+
+    def test_duplicate_ids_use_each_stored_position_once(self):
+        previous = {"a": [1024, 2048]}
+        self.assertEqual(_positions([{"id": "a"}, {"id": "a"}], previous), [1024, 2048])
+
+
+class ShardedBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.objects = {}
+        self.puts = []
+        for name, fn in (("get_json", self._get), ("set_json", self._set)):
+            patcher = mock.patch.object(_blob, name, fn)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.backend = ShardedBlobBackend()
+        self.rows = [_row(i, i % 12 + 1) for i in range(30)]
+        self.backend.save(wrap_document(self.rows, 1))
+        self.puts.clear()
+
+    def _get(self, key=None, default=None):
+        raw = self.objects.get(key or _blob.BLOB_JSON_KEY)
+        return json.loads(raw) if raw is not None else default
+
+    def _set(self, value, key=None):
+        self.puts.append(key)
+        self.objects[key] = json.dumps(value)
+
+    def test_round_trip_in_dataset_order(self):
+        doc = ShardedBlobBackend().load()
+        self.assertEqual(doc["data"], self.rows)
+        self.assertEqual(doc["meta"]["version"], 1)
+        manifest = json.loads(self.objects[MANIFEST_KEY])
+        self.assertEqual(sorted(manifest["shards"]), [f"m{m:02d}" for m in range(1, 13)])
+        self.assertNotIn("changes", manifest["meta"])
+
+    def test_a_change_uploads_only_its_shard(self):
+        rows = self.rows + [_row(99, 3)]
+        self.backend.save(wrap_document(rows, 2))
+        self.assertEqual(self.puts, [shard_key("m03"), MANIFEST_KEY])
+        self.assertEqual(_ids(ShardedBlobBackend().load()["data"]), _ids(rows))
+
+    def test_change_ring_has_its_own_object(self):
+        changes = [{"v": 2, "upserts": [_row(99, 3)], "removed": []}]
+        self.backend.save(wrap_document(self.rows + [_row(99, 3)], 2, changes))
+        self.assertEqual(sorted(self.puts[:-1]), [shard_key("changes"), shard_key("m03")])
+        self.assertEqual(self.puts[-1], MANIFEST_KEY)
+        self.assertEqual(ShardedBlobBackend().load()["meta"]["changes"], changes)
+
+    def test_insert_in_the_middle_keeps_other_positions(self):
+        rows = self.rows[:5] + [_row(99, 7)] + self.rows[5:]
+        self.backend.save(wrap_document(rows, 2))
+        self.assertNotIn(shard_key("m01"), self.puts)
+        self.assertEqual(_ids(ShardedBlobBackend().load()["data"]), _ids(rows))
+
+    def test_emptied_shard_is_rewritten(self):
+        rows = [r for r in self.rows if r["month"] != "4"]
+        self.backend.save(wrap_document(rows, 2))
+        self.assertEqual(json.loads(self.objects[shard_key("m04")]), {"pos": [], "rows": []})
+        self.assertEqual(_ids(ShardedBlobBackend().load()["data"]), _ids(rows))
+
+    def test_load_rereads_the_manifest_when_a_shard_is_newer(self):
+        stale_manifest = self.objects[MANIFEST_KEY]
+        rows = self.rows + [_row(99, 3)]
+        self.backend.save(wrap_document(rows, 2))
+        reads = []
+
+        def get(key=None, default=None):
+            if key == MANIFEST_KEY:
+                reads.append(key)
+                if len(reads) == 1:
+                    return json.loads(stale_manifest)
+            return self._get(key, default)
+
+        with mock.patch.object(_blob, "get_json", get):
+            doc = ShardedBlobBackend().load()
+        self.assertEqual(len(reads), 2)
+        self.assertEqual(_ids(doc["data"]), _ids(rows))
+        self.assertEqual(doc["meta"]["version"], 2)
+
+    def test_find_by_months_reads_only_those_shards(self):
+        reader = ShardedBlobBackend()
+        keys = []
+
+        def get(key=None, default=None):
+            keys.append(key)
+            return self._get(key, default)
+
+        with mock.patch.object(_blob, "get_json", get):
+            rows, version = reader.find_by_months([3, 5])
+        self.assertEqual(version, 1)
+        self.assertEqual(_ids(rows), [r["id"] for r in self.rows if r["month"] in ("3", "5")])
+        self.assertEqual(sorted(keys), sorted([MANIFEST_KEY, shard_key("m03"), shard_key("m05")]))
+
+    def test_single_document_before_the_first_save(self):
+        self.objects.clear()
+        self.objects[_blob.BLOB_JSON_KEY] = json.dumps(wrap_document(self.rows[:2], 4))
+        self.assertEqual(ShardedBlobBackend().load()["data"], self.rows[:2])
+        self.assertEqual(ShardedBlobBackend().find_by_months([1]), ([], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from api._sqlite import _SCHEMA, _UPSERT, SqliteBackend, _row_params
+from api._store import VersionConflict, wrap_document
+
+
+def _row(i, **extra):
+    return dict({"id": f"r{i}", "first_name": f"N{i}", "last_name": "X", "day": "1", "month": str(i % 12 + 1), "year": ""}, **extra)
+
+
+class RecordingCursor:
+    def __init__(self, cur):
+        self.cur = cur
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return self.cur.execute(sql, params)
+
+    def executemany(self, sql, seq):
+        seq = list(seq)
+        self.statements.append((sql, len(seq)))
+        return self.cur.executemany(sql, seq)
+
+
+class ApplyTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.conn.executescript(_SCHEMA)
+        self.old = [_row_params(i, _row(i)) for i in range(6)]
+        self.conn.executemany(_UPSERT, self.old)
+
+    def _apply(self, rows):
+        new = [_row_params(i, r) for i, r in enumerate(rows)]
+        cur = RecordingCursor(self.conn.cursor())
+        SqliteBackend._apply(cur, self.old, new)
+        stored = self.conn.execute("SELECT pos, id FROM people ORDER BY pos").fetchall()
+        self.assertEqual(stored, [(i, r["id"]) for i, r in enumerate(rows)])
+        return [sql.split()[0] for sql, _ in cur.statements]
+
+    def test_single_removal_is_a_delete_and_a_shift(self):
+        rows = [_row(i) for i in range(6) if i != 2]
+        self.assertEqual(self._apply(rows), ["DELETE", "UPDATE", "UPDATE"])
+
+    def test_removing_the_last_row(self):
+        self.assertEqual(self._apply([_row(i) for i in range(5)])[0], "DELETE")
+
+    def test_one_changed_row_is_one_upsert(self):
+        rows = [_row(i) for i in range(6)]
+        rows[3]["year"] = "1990"
+        cur = RecordingCursor(self.conn.cursor())
+        SqliteBackend._apply(cur, self.old, [_row_params(i, r) for i, r in enumerate(rows)])
+        self.assertEqual(cur.statements, [(_UPSERT, 1)])
+
+    def test_append_and_shrink(self):
+        self.assertEqual(self._apply([_row(i) for i in range(8)]), ["INSERT"])
+        self.old = [_row_params(i, _row(i)) for i in range(8)]
+        self.assertEqual(self._apply([_row(0), _row(7)]), ["INSERT", "DELETE"])
+
+    def test_unchanged_rows_write_nothing(self):
+        self.assertEqual(self._apply([_row(i) for i in range(6)]), [])
+
+
+class SqliteBackendTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "birthdays.sqlite3")
+        self.backend = SqliteBackend(self.path)
+        self.addCleanup(self.backend._conn.close)
+
+    def _other(self):
+        other = SqliteBackend(self.path)
+        self.addCleanup(other._conn.close)
+        return other
+
+    def test_rows_read_back_as_written(self):
+        rows = [_row(1), {"id": "b", "first_name": "Zoë", "day": 3, "month": "2", "note": {"x": 1}}]
+        self.backend.save(wrap_document(rows, 1))
+        doc = self._other().load()
+        self.assertEqual(doc["data"], rows)
+        self.assertEqual(doc["meta"]["version"], 1)
+
+    def test_indexes_and_normalized_name(self):
+        self.backend.save(wrap_document([{"id": "b", "first_name": "Zoë", "last_name": "X"}], 1))
+        conn = self.backend._conn
+        self.assertEqual(conn.execute("SELECT id, name_norm FROM people").fetchall(), [("b", "zoe x")])
+        indexes = {r[1] for r in conn.execute("PRAGMA index_list(people)")}
+        self.assertTrue({"people_id", "people_month_day", "people_name"} <= indexes)
+
+    def test_save_of_a_version_already_stored_conflicts(self):
+        self.backend.save(wrap_document([_row(1)], 1))
+        other = self._other()
+        other.load()
+        self.backend.save(wrap_document([_row(1), _row(2)], 2))
+        self.assertTrue(other.is_stale())
+        with self.assertRaises(VersionConflict) as cm:
+            other.save(wrap_document([_row(1), _row(3)], 2))
+        self.assertEqual((cm.exception.expected, cm.exception.actual), (1, 2))
+        self.assertEqual([r["id"] for r in self.backend.load()["data"]], ["r1", "r2"])
+
+    def test_save_after_another_connection_wrote(self):
+        self.backend.save(wrap_document([_row(i) for i in range(4)], 1))
+        other = self._other()
+        other.load()
+        self.backend.save(wrap_document([_row(i) for i in range(5)], 2))
+        # other's remembered rows are out of date: it re-reads them before diffing
+        other.save(wrap_document([_row(i) for i in range(5) if i != 1], 3))
+        self.assertEqual([r["id"] for r in self.backend.load()["data"]], ["r0", "r2", "r3", "r4"])
+
+    def test_find_by_months(self):
+        rows = [_row(i) for i in range(24)]
+        self.backend.save(wrap_document(rows, 5))
+        found, version = self._other().find_by_months([2, 12])
+        self.assertEqual(version, 5)
+        self.assertEqual(found, [r for r in rows if r["month"] in ("2", "12")])
+
+
+if __name__ == "__main__":
+    unittest.main()
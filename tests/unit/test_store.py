@@ -0,0 +1,164 @@
+import unittest
+from unittest import mock
+
+from api import _store
+from api._store import VersionConflict, store_get_rows, store_update, wrap_document
+
+from support import RemoteBackend, StoreTestCase
+
+
+def _ids(rows):
+    return [r["id"] for r in rows]
+
+
+class RacingBackend(RemoteBackend):
+    """
+    The first save loses to another instance that stored the next version in the meantime.
+    """
+
+    def __init__(self, doc):
+        super().__init__(doc)
+        self.races = 1
+
+    def save(self, doc):
+        if self.races:
+            self.races -= 1
+            version = self.doc["meta"]["version"] + 1
+            self.doc = wrap_document(self.doc["data"] + [{"id": "other"}], version)
+            raise VersionConflict(version - 1, version)
+        super().save(doc)
+
+
+class StoreUpdateTest(StoreTestCase):
+    def make_backend(self):
+        return RemoteBackend(wrap_document([{"id": "a"}], 3))
+
+    def test_writes_the_next_version(self):
+        rows, version = store_update(lambda rows: rows + [{"id": "b"}])
+        self.assertEqual(version, 4)
+        self.assertEqual(_ids(self.backend.doc["data"]), ["a", "b"])
+        self.assertEqual(self.backend.doc["meta"]["version"], 4)
+        self.assertEqual(_store.store_version(), 4)
+
+    def test_expected_version_mismatch(self):
+        calls = []
+        with self.assertRaises(VersionConflict) as cm:
+            store_update(lambda rows: calls.append(1) or rows, expected_version=2)
+        self.assertEqual((cm.exception.expected, cm.exception.actual), (2, 3))
+        self.assertEqual(calls, [])
+        self.assertEqual(self.backend.saves, 0)
+
+    def test_reads_the_backend_not_the_cache(self):
+        store_get_rows()
+        self.backend.doc = wrap_document([{"id": "a"}, {"id": "x"}], 7)
+        rows, version = store_update(lambda rows: rows + [{"id": "b"}], expected_version=7)
+        self.assertEqual(_ids(rows), ["a", "x", "b"])
+        self.assertEqual(version, 8)
+
+
+class StoreUpdateConflictTest(StoreTestCase):
+    def make_backend(self):
+        return RacingBackend(wrap_document([{"id": "a"}], 3))
+
+    def test_conditional_write_conflict_reruns_fn(self):
+        calls = []
+
+        def add(rows):
+            calls.append(_ids(rows))
+            return rows + [{"id": "b"}]
+
+        rows, version = store_update(add)
+        self.assertEqual(calls, [["a"], ["a", "other"]])
+        self.assertEqual(_ids(rows), ["a", "other", "b"])
+        self.assertEqual(version, 5)
+        self.assertEqual(self.backend.doc["meta"]["version"], 5)
+
+    def test_conflict_with_expected_version_is_not_retried(self):
+        with self.assertRaises(VersionConflict):
+            store_update(lambda rows: rows + [{"id": "b"}], expected_version=3)
+        self.assertEqual(_ids(self.backend.doc["data"]), ["a", "other"])
+
+    def test_gives_up_after_update_attempts(self):
+        self.backend.races = _store.UPDATE_ATTEMPTS
+        with self.assertRaises(VersionConflict):
+            store_update(lambda rows: rows + [{"id": "b"}])
+        self.assertEqual(self.backend.saves, 0)
+
+
+class WriteBehindTest(StoreTestCase):
+    def make_backend(self):
+        return RemoteBackend(wrap_document([{"id": "a"}], 3))
+
+    def setUp(self):
+        super().setUp()
+        self.kv = self.use_fake_kv()
+        for name, value in (("STORE_WRITE_BEHIND", True), ("STORE_FLUSH_INTERVAL_SECONDS", 3600.0)):
+            patcher = mock.patch.object(_store, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_acknowledges_with_a_journal_append(self):
+        store_update(lambda rows: rows + [{"id": "b"}])
+        self.assertEqual(self.backend.saves, 0)
+        loads, self.kv.calls[:] = self.backend.loads, []
+        rows, version = store_update(lambda rows: rows + [{"id": "c"}])
+        self.assertEqual(version, 5)
+        self.assertEqual(_ids(rows), ["a", "b", "c"])
+        self.assertEqual(self.backend.loads, loads)
+        self.assertEqual(self.kv.calls, ["LRANGE", "EVAL"])
+        self.assertEqual([e["v"] for e in self.kv.journal()], [4, 5])
+
+    def test_another_instance_is_replayed_from_the_journal(self):
+        store_update(lambda rows: rows + [{"id": "b"}])
+        self.kv.push_entry({"v": 5, "seq": 1, "at": 0, "upserts": [{"id": "x"}], "removed": ["a"]})
+        rows, version = store_update(lambda rows: rows + [{"id": "c"}])
+        self.assertEqual(_ids(rows), ["b", "x", "c"])
+        self.assertEqual(version, 6)
+
+    def test_racing_append_reruns_fn(self):
+        calls = []
+        real = self.kv.__call__
+
+        def racing(*args):
+            if args[0] == "EVAL" and not calls:
+                calls.append("raced")
+                self.kv.push_entry({"v": 4, "seq": 1, "at": 0, "upserts": [{"id": "x"}], "removed": []})
+            return real(*args)
+
+        with mock.patch("api._kv._command", racing):
+            rows, version = store_update(lambda rows: rows + [{"id": "b"}])
+        self.assertEqual(_ids(rows), ["a", "x", "b"])
+        self.assertEqual(version, 5)
+
+    def test_cold_start_replays_unflushed_entries(self):
+        self.kv.push_entry({"v": 4, "seq": 1, "at": 0, "upserts": [{"id": "b"}], "removed": []})
+        self.assertEqual(_ids(store_get_rows()), ["a", "b"])
+        self.assertEqual(_store.store_version(), 4)
+
+    def test_flush_writes_once_and_keeps_a_marker(self):
+        store_update(lambda rows: rows + [{"id": "b"}])
+        store_update(lambda rows: [r for r in rows if r["id"] != "a"])
+        self.assertEqual(_store.flush_pending(), 2)
+        self.assertEqual(self.backend.saves, 1)
+        self.assertEqual(_ids(self.backend.doc["data"]), ["b"])
+        self.assertEqual(self.backend.doc["meta"]["version"], 5)
+        self.assertEqual([e["v"] for e in self.kv.journal()], [5])
+        # The marker is not applied again
+        self.assertEqual(_store.flush_pending(), 0)
+        self.assertEqual(self.backend.saves, 1)
+
+    def test_gap_in_the_journal_reloads_the_backend(self):
+        store_update(lambda rows: rows + [{"id": "b"}])
+        # Another instance wrote and flushed versions 5..9 and trimmed the journal
+        self.backend.doc = wrap_document([{"id": "z"}], 9)
+        self.kv.lists.clear()
+        self.kv.push_entry({"v": 9, "seq": 1, "at": 0, "upserts": [], "removed": []})
+        loads = self.backend.loads
+        rows, version = store_update(lambda rows: rows + [{"id": "c"}])
+        self.assertEqual(_ids(rows), ["z", "c"])
+        self.assertEqual(version, 10)
+        self.assertEqual(self.backend.loads, loads + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()